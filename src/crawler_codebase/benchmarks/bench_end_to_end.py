@@ -0,0 +1,198 @@
+# bench_end_to_end.py
+# Run from src/crawler_codebase: python -m benchmarks.bench_end_to_end --site mercadolibre --pages 3
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from pathlib import Path
+
+from crawler.crawler_seed import run_crawler_seed
+from crawler.crawler_search_scraper import run_crawler_search_scraper, run_crawler_search_scraper_async
+from crawler.crawler_search_html_parser import run_crawler_search_html_parser
+from crawler.crawler_product_scraper import run_crawler_product_scraper, run_crawler_product_scraper_pool
+from crawler.crawler_product_html_parser import run_crawler_product_html_parser
+
+from benchmarks.mock_shop import MOCK_SEED_PATHS, add_mock_shop_arguments, mock_shop_from_args
+from utilities.database import db_initialization
+from utilities.html_backend import resolve_parser_backend
+from utilities.page_store import open_page_store
+from utilities.throttle import build_throttle
+from utilities.readiness import build_readiness
+from utilities.stealth import resolve_scroll_profile
+from utilities.browser_session import BrowserSession, run_async_stage
+from utilities.http_fetch import build_http_fetcher
+from utilities.metrics import build_metrics, URL_PHASES
+from utilities.specific_sites import site_registry, specific_site_setup
+from utilities.utils import setup_loggers, set_delay_scale
+
+# Pause keys of a scroll profile, in ms
+SCROLL_PAUSE_KEYS = ("min_pause", "max_pause", "min_long_pause", "max_long_pause")
+
+# (stage, SQL counting the pages it handled)
+STAGE_COUNTS = {
+    "seed": "SELECT COUNT(*) FROM Urls",
+    "search_scraper": "SELECT COUNT(*) FROM Urls WHERE status = 'fetched'",
+    "search_parser": "SELECT COUNT(*) FROM ParseManifest WHERE products > 0",
+    "product_scraper": "SELECT COUNT(*) FROM ProductPages WHERE fetch_status = 'fetched'",
+    "product_parser": "SELECT COUNT(*) FROM ProductPages WHERE parse_status = 'parsed_succeeded'",
+}
+
+def mock_site_config(site: str, base_url: str) -> tuple:
+    """The site's adapter, seeded on the mock shop instead of the live site."""
+    specific_site_config, _ = specific_site_setup(site_registry(), site)
+    specific_site_config.seed_urls = [f"{base_url}{MOCK_SEED_PATHS[site]}"]
+    return specific_site_config, specific_site_config.seed_urls[0]
+
+def scaled_settings(scale: float) -> dict:
+    """Throttle, scroll and readiness config sections with their waits multiplied by scale."""
+    scroll_profile = resolve_scroll_profile()["profile"]
+    return {
+        "throttle": {"start_delay": 30.0 * scale, "min_delay": 5.0 * scale, "max_delay": 120.0 * scale},
+        "scroll": {
+            "profile": "human",
+            "timeout": max(15.0 * scale, 1.0),
+            **{key: scroll_profile[key] * scale for key in SCROLL_PAUSE_KEYS},
+        },
+        "readiness": {"stable_ms": max(800 * scale, 100), "quiet_ms": max(500 * scale, 100)},
+    }
+
+def count(db: dict, stage: str) -> int:
+    return db["cur"].execute(STAGE_COUNTS[stage]).fetchone()[0]
+
+def phase_report(db: dict):
+    """Average seconds per fetch phase, per scraper stage, from UrlMetrics."""
+    columns = ", ".join(f"AVG({phase})" for phase in URL_PHASES)
+    rows = db["cur"].execute(
+        f"SELECT stage, COUNT(*), AVG(total), {columns} FROM UrlMetrics GROUP BY stage ORDER BY stage"
+    ).fetchall()
+    for stage, urls, total, *phases in rows:
+        detail = ", ".join(
+            f"{phase} {seconds * 1000:.0f}" for phase, seconds in zip(URL_PHASES, phases) if seconds
+        )
+        print(f"  {stage:<16} {urls:>5} URLs, {total * 1000:>7.0f} ms/URL  ({detail} ms)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end crawl of a local mock shop, from the seed to the product parser.")
+    parser.add_argument("--site", default="mercadolibre", choices=sorted(MOCK_SEED_PATHS))
+    parser.add_argument("--pages", type=int, default=3, help="listing pages to crawl")
+    parser.add_argument("--delay-scale", type=float, default=0.002,
+                        help="factor applied to the crawler's fixed sleeps and throttle delays")
+    parser.add_argument("--search-mode", choices=("sync", "async"), default="sync")
+    parser.add_argument("--product-workers", type=int, default=1)
+    parser.add_argument("--no-http-first", action="store_true", help="render every page in the browser")
+    parser.add_argument("--headful", action="store_true")
+    parser.add_argument("--page-store", default="files", help="page store backend")
+    parser.add_argument("--output", type=Path, default=None, help="also write the report as JSON")
+    parser.add_argument("--keep-data", action="store_true", help="keep the run's database and pages")
+    add_mock_shop_arguments(parser)
+    parser.set_defaults(items=12)
+    args = parser.parse_args()
+
+    logger, error_logger = setup_loggers()
+    set_delay_scale(args.delay_scale)
+    settings = scaled_settings(args.delay_scale)
+
+    shop = mock_shop_from_args(args, args.pages)
+    base_url = shop.start()
+    specific_site_config, seed_url = mock_site_config(args.site, base_url)
+    parser_backend = resolve_parser_backend("auto")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="crawler_e2e_"))
+    paths_dict = {"base_dir": work_dir, "data_dir": work_dir / "data", "output_dir": work_dir / "data" / "output"}
+    paths_dict["output_dir"].mkdir(parents=True)
+
+    db = db_initialization(work_dir / "e2e.sqlite")
+    page_store = open_page_store(db, paths_dict, {"backend": args.page_store})
+    browser_session = BrowserSession(paths_dict, headless=not args.headful)
+    http_fetcher = None if args.no_http_first else build_http_fetcher(specific_site_config, {}, parser_backend)
+    metrics = build_metrics(paths_dict, args.site, {})
+    stage_options = {
+        "page_store": page_store,
+        "throttle": build_throttle(settings["throttle"]),
+        "readiness": build_readiness(settings["readiness"]),
+        "scroll_settings": resolve_scroll_profile(settings["scroll"]),
+        "browser_session": browser_session,
+        "http_fetcher": http_fetcher,
+        "metrics": metrics,
+    }
+
+    def seed():
+        run_crawler_seed(specific_site_config, seed_url, args.site, logger, error_logger, args.pages, db,
+                         browser_session=browser_session)
+
+    def search_scraper():
+        if args.search_mode == "async":
+            # The throttle spaces the requests, so the per-host scheduler only caps concurrency here
+            run_async_stage(run_crawler_search_scraper_async(
+                db, specific_site_config, logger, error_logger, paths_dict,
+                per_host_min_interval=0, per_host_jitter=0, **stage_options))
+        else:
+            run_crawler_search_scraper(db, specific_site_config, logger, error_logger, paths_dict, **stage_options)
+
+    def search_parser():
+        run_crawler_search_html_parser(db, paths_dict, specific_site_config, logger, error_logger,
+                                       parser_backend=parser_backend, page_store=page_store, metrics=metrics)
+
+    def product_scraper():
+        if args.product_workers > 1:
+            run_async_stage(run_crawler_product_scraper_pool(
+                db, paths_dict, logger, error_logger, workers=args.product_workers, **stage_options))
+        else:
+            run_crawler_product_scraper(db, paths_dict, logger, error_logger, **stage_options)
+
+    def product_parser():
+        run_crawler_product_html_parser(db, paths_dict, specific_site_config, logger, error_logger,
+                                        parser_backend=parser_backend, page_store=page_store, metrics=metrics)
+
+    stages = [("seed", seed), ("search_scraper", search_scraper)]
+    # Adapters without product links and product parsing (Amazon) stop after the search pages
+    if getattr(specific_site_config, "individual_product_data_extraction", None) is not None:
+        stages += [("search_parser", search_parser), ("product_scraper", product_scraper), ("product_parser", product_parser)]
+
+    client = "browser only" if http_fetcher is None else "HTTP first"
+    print(f"{args.site} mock shop at {base_url}: {args.pages} pages x {args.items} items, "
+          f"{args.latency_ms:.0f} ms latency, {args.js_ratio:.0%} client-rendered, {args.error_rate:.0%} errors, "
+          f"{args.rate_limit_rate:.0%} 429s; delays x{args.delay_scale:g}, {client}")
+
+    report = {"site": args.site, "options": vars(args) | {"output": str(args.output)}, "stages": {}}
+    started_at = time.perf_counter()
+    try:
+        for name, run in stages:
+            stage_started_at = time.perf_counter()
+            try:
+                run()
+            except Exception:
+                error_logger.error(f"End-to-end stage {name} failed", exc_info=True)
+                print(f"  {name} failed, see the error log")
+                break
+            seconds = time.perf_counter() - stage_started_at
+            pages = count(db, name)
+            report["stages"][name] = {"seconds": seconds, "pages": pages, "pages_per_minute": pages / seconds * 60}
+            print(f"  {name:<16} {pages:>6} pages in {seconds:>7.2f}s  {pages / seconds * 60:>9.1f} pages/min")
+
+        elapsed = time.perf_counter() - started_at
+        fetched = sum(report["stages"].get(name, {}).get("pages", 0) for name in ("search_scraper", "product_scraper"))
+        report["total"] = {"seconds": elapsed, "pages_fetched": fetched, "pages_per_minute": fetched / elapsed * 60}
+        report["server"] = shop.stats()
+        print(f"Total: {fetched} pages fetched in {elapsed:.2f}s, {fetched / elapsed * 60:.1f} pages/min end to end")
+        print(f"Server: {', '.join(f'{key} {value}' for key, value in sorted(report['server'].items()))}")
+        if metrics is not None:
+            phase_report(db)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            print(f"Report written to {args.output}")
+    finally:
+        browser_session.close()
+        if http_fetcher is not None:
+            http_fetcher.close()
+        page_store.close()
+        db["cur"].close()
+        db["conn"].close()
+        shop.stop()
+        if args.keep_data:
+            print(f"Run data kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
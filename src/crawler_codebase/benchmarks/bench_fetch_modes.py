@@ -0,0 +1,160 @@
+# bench_fetch_modes.py
+# Run from src/crawler_codebase: python -m benchmarks.bench_fetch_modes
+import time
+import random
+import argparse
+import threading
+import urllib.request
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utilities.http_fetch import HttpFetcher, HTTPX_AVAILABLE, HTTP2_AVAILABLE
+from utilities.html_backend import has_selector, resolve_parser_backend
+from utilities.specific_sites import site_registry, specific_site_setup
+
+ITEM_TEMPLATE = (
+    '<li class="ui-search-layout__item"><div class="poly-card">'
+    '<h3 class="poly-component__title-wrapper"><a class="poly-component__title" href="/p/{i}">Producto {i}</a></h3>'
+    '<span class="andes-money-amount__fraction">{price}</span>'
+    '<img class="poly-component__image-overlay" src="/img/{i}.webp">'
+    '<p>{filler}</p></div></li>'
+)
+
+def listing_page(items: int, rendered: bool) -> bytes:
+    """
+    A search page of `items` products. Server-rendered pages carry the items
+    in the HTML; the other kind only builds them from a script, like a
+    client-rendered page, so a plain HTTP fetch must escalate.
+    """
+    body = "".join(
+        ITEM_TEMPLATE.format(i=i, price=random.randint(1000, 99999), filler="x" * 2000)
+        for i in range(items)
+    )
+    if rendered:
+        return f'<html><body><ol>{body}</ol></body></html>'.encode("utf-8")
+    return (
+        '<html><body><ol id="results"></ol><script>'
+        f'document.getElementById("results").innerHTML = {body!r};'
+        '</script></body></html>'
+    ).encode("utf-8")
+
+def start_server(items: int, latency_ms: float) -> tuple[ThreadingHTTPServer, str]:
+    """Local keep-alive test server: /rendered/<n> and /client/<n> pages."""
+    pages = {"rendered": listing_page(items, True), "client": listing_page(items, False)}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            kind = self.path.strip("/").split("/")[0]
+            body = pages.get(kind)
+            if body is None:
+                self.send_error(404)
+                return
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def page_urls(base_url: str, pages: int, client_ratio: float) -> list[str]:
+    client_pages = int(pages * client_ratio)
+    return [
+        f"{base_url}/{'client' if i < client_pages else 'rendered'}/{i}"
+        for i in range(pages)
+    ]
+
+def bench(label: str, urls: list[str], fetch) -> dict:
+    """Runs fetch(url) -> transport name over urls and prints pages/s and CPU time."""
+    transports = {}
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for url in urls:
+        transport = fetch(url)
+        transports[transport] = transports.get(transport, 0) + 1
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    split = ", ".join(f"{name}: {count}" for name, count in sorted(transports.items()))
+    print(f"  {label:<22} {len(urls) / wall:>8.1f} pages/s  {wall / len(urls) * 1000:>8.1f} ms/page  "
+          f"{cpu:>6.2f}s CPU (crawler process)  [{split}]")
+    return {"pages_per_second": len(urls) / wall, "cpu": cpu}
+
+def run_browser_modes(urls: list[str], selector: str, fetcher: HttpFetcher):
+    """Browser-only and HTTP-first modes. Skipped when Chromium cannot start."""
+    try:
+        from playwright.sync_api import sync_playwright
+        playwright = sync_playwright().start()
+        browser = playwright.chromium.launch(headless=True)
+    except Exception as e:
+        print(f"  browser modes skipped: {type(e).__name__}: {str(e).splitlines()[0]}")
+        return
+
+    try:
+        page = browser.new_page()
+
+        def browser_fetch(url: str) -> str:
+            page.goto(url)
+            page.wait_for_selector(selector, timeout=10000)
+            page.content()
+            return "browser"
+
+        def http_first_fetch(url: str) -> str:
+            if fetcher.fetch_page(url, "search") is not None:
+                return "http"
+            return browser_fetch(url)
+
+        bench("browser", urls, browser_fetch)
+        fetcher.escalation_streak = 0
+        bench("http_first + fallback", urls, http_first_fetch)
+        print("  (Chromium runs in its own processes: its CPU is not in the CPU column)")
+    finally:
+        browser.close()
+        playwright.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTTP-first fetching against the browser on a local server.")
+    parser.add_argument("--site", default="mercadolibre")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--items", type=int, default=48)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--client-ratio", type=float, default=0.1,
+                        help="share of client-rendered pages that must fall back to the browser")
+    parser.add_argument("--skip-browser", action="store_true")
+    args = parser.parse_args()
+
+    specific_site_config, _ = specific_site_setup(site_registry(), args.site)
+    selector = specific_site_config.selector_to_start_process
+    backend = resolve_parser_backend("auto")
+
+    server, base_url = start_server(args.items, args.latency_ms)
+    urls = page_urls(base_url, args.pages, args.client_ratio)
+    # Never give up on HTTP here: the client-rendered share is fixed
+    fetcher = HttpFetcher({"search": selector}, give_up_after=0)
+    client = "httpx" + (" (HTTP/2)" if HTTP2_AVAILABLE else "") if HTTPX_AVAILABLE else "stdlib (HTTP/1.1)"
+    print(f"{args.pages} pages ({args.client_ratio:.0%} client-rendered), {args.items} items each, "
+          f"{args.latency_ms:.0f} ms server latency, {client} client, {backend} selector check")
+
+    def pooled_fetch(url: str) -> str:
+        return "http" if fetcher.fetch_page(url, "search") is not None else "escalate"
+
+    def unpooled_fetch(url: str) -> str:
+        with urllib.request.urlopen(url) as response:
+            html = response.read().decode("utf-8")
+        return "http" if has_selector(html, selector, backend) else "escalate"
+
+    try:
+        bench("http, new connection", urls, unpooled_fetch)
+        bench("http, pooled", urls, pooled_fetch)
+        if not args.skip_browser:
+            run_browser_modes(urls, selector, fetcher)
+    finally:
+        fetcher.close()
+        server.shutdown()
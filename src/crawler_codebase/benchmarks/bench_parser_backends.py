@@ -0,0 +1,118 @@
+# bench_parser_backends.py
+# Run from src/crawler_codebase: python -m benchmarks.bench_parser_backends
+import json
+import time
+import argparse
+
+from pathlib import Path
+
+from utilities.database import db_initialization
+from utilities.html_backend import available_parser_backends, parse_html
+from utilities.page_store import open_page_store
+from utilities.specific_sites import site_registry, specific_site_setup
+from utilities.utils import setup_directories_pathlib
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+def open_configured_store(paths_dict: dict, config_path: Path) -> tuple:
+    """
+    The page store selected in config.json, and its database (None when the
+    database does not exist yet: only the "files" backend can be read then).
+    """
+    config = json.loads(config_path.read_text(encoding="utf-8"))
+    store_config = config.get("page_store", {})
+    db_path = paths_dict["data_dir"] / config.get("database_path", "mini.sqlite")
+    db = db_initialization(db_path) if db_path.exists() else None
+    if db is None and store_config.get("backend", "files") != "files":
+        return None, None
+    return open_page_store(db, paths_dict, store_config), db
+
+def load_pages(page_store, namespace: str, limit: int) -> list[str]:
+    """Reads up to `limit` saved pages of namespace into memory, through the page store."""
+    pages = []
+    if page_store is None:
+        return pages
+    for _, html in page_store.iter_pages(namespace):
+        if html:
+            pages.append(html)
+        if len(pages) >= limit:
+            break
+    return pages
+
+def load_fixture(site: str, kind: str) -> list[str]:
+    """The checked-in fixture page of site and kind ("search" or "product"), if any."""
+    path = FIXTURES_DIR / f"{site}_{kind}.html"
+    return [path.read_text(encoding="utf-8")] if path.exists() else []
+
+def bench_backend(pages: list[str], backend: str, extract, repeat: int, only=None) -> float:
+    """Returns pages per second for parse + adapter extraction."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(parse_html(html, backend, only=only))
+    elapsed = time.perf_counter() - start
+    return len(pages) * repeat / elapsed
+
+def report(label: str, pages: list[str], extract, repeat: int, only=None):
+    if not pages:
+        print(f"{label}: no saved pages found, skipping")
+        return
+    print(f"{label}: {len(pages)} pages x {repeat} repeats")
+    baseline = None
+    for backend in reversed(available_parser_backends()):
+        runs = [("full", None)]
+        if only and backend != "selectolax":
+            runs.append(("partial", only))
+        for mode, container in runs:
+            pages_per_second = bench_backend(pages, backend, extract, repeat, only=container)
+            if baseline is None:
+                baseline = pages_per_second
+            speedup = f"{pages_per_second / baseline:.2f}x"
+            print(f"  {backend:<11} {mode:<8} {pages_per_second:>9.1f} pages/s  {speedup} vs bs4 full")
+
+if __name__ == "__main__":
+    paths_dict = setup_directories_pathlib()
+
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends on saved pages.")
+    parser.add_argument("--site", default="mercadolibre")
+    parser.add_argument("--source", choices=("store", "fixtures"), default="store",
+                        help="pages saved in the configured page store (falls back to the fixtures when empty), or the fixtures")
+    parser.add_argument("--config", type=Path, default=paths_dict["base_dir"] / "config.json")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    specific_site_config, _ = specific_site_setup(site_registry(), args.site)
+    page_store, db = open_configured_store(paths_dict, args.config) if args.source == "store" else (None, None)
+
+    def pages_of(kind: str) -> list[str]:
+        pages = load_pages(page_store, kind, args.limit)
+        if not pages:
+            if args.source == "store":
+                print(f"No saved {kind} pages in the page store, using the fixtures")
+            pages = load_fixture(args.site, kind)
+        return pages
+
+    search_pages = pages_of("search")
+    report(
+        "Search pages",
+        search_pages,
+        specific_site_config.product_extraction,
+        args.repeat,
+        only=specific_site_config.search_results_container
+    )
+
+    if hasattr(specific_site_config, "individual_product_data_extraction"):
+        product_pages = pages_of("product")
+        report(
+            "Product pages",
+            product_pages,
+            specific_site_config.individual_product_data_extraction,
+            args.repeat,
+            only=specific_site_config.product_page_container
+        )
+
+    if page_store is not None:
+        page_store.close()
+    if db is not None:
+        db["conn"].close()
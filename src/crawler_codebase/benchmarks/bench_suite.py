@@ -0,0 +1,282 @@
+# bench_suite.py
+# Run from src/crawler_codebase: python -m benchmarks.bench_suite
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+
+from pathlib import Path
+
+from crawler.crawler_search_html_parser import insert_product_url, insert_product_urls
+from crawler.crawler_product_html_parser import update_product_data
+from utilities.database import db_initialization
+from utilities.html_backend import parse_html, resolve_parser_backend
+from utilities.specific_sites import site_registry, specific_site_setup
+from utilities.utils import setup_directories_pathlib, slugify, now_with_hours
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# (site, adapter method, fixture, adapter container attribute)
+ADAPTER_CASES = [
+    ("amazon", "product_extraction", "amazon_search.html", "search_results_container"),
+    ("amazon", "individual_product_data_extraction", "amazon_product.html", "product_page_container"),
+    ("mercadolibre", "product_extraction", "mercadolibre_search.html", "search_results_container"),
+    ("mercadolibre", "individual_product_data_extraction", "mercadolibre_product.html", "product_page_container"),
+]
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+def parse_size(text: str) -> int:
+    """10k -> 10000, 1M -> 1000000."""
+    text = text.strip().lower()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def size_label(rows: int) -> str:
+    for suffix, factor in (("M", 1_000_000), ("k", 1_000)):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+def measure(run, ops: int, repeat: int) -> dict:
+    """
+    Times run() (which performs ops operations) repeat times and keeps the
+    best run, the one least disturbed by the rest of the machine.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"ops": ops, "seconds": best, "ops_per_second": ops / best if best else 0.0}
+
+def record(results: dict, name: str, result: dict, unit: str):
+    results[name] = {**result, "unit": unit}
+    print(f"  {name:<84} {result['ops_per_second']:>12,.1f} {unit}/s")
+
+# ---------------------------
+# Adapters
+# ---------------------------
+
+def bench_adapters(backend: str, repeat: int, rounds: int, results: dict) -> list[str]:
+    """
+    Parse + extraction and extraction alone (on an already built tree) for
+    every adapter method with a fixture. Returns the extracted product names.
+    """
+    registry = site_registry()
+    names = []
+    print(f"Site adapters ({backend}, {rounds} pages per run, best of {repeat})")
+    for site, method, fixture, container_attr in ADAPTER_CASES:
+        specific_site_config, _ = specific_site_setup(registry, site)
+        extract = getattr(specific_site_config, method, None)
+        path = FIXTURES_DIR / fixture
+        if extract is None or not path.exists():
+            print(f"  {site}.{method}: skipped ({'no adapter method' if extract is None else 'no fixture'})")
+            continue
+
+        html = path.read_text(encoding="utf-8")
+        only = getattr(specific_site_config, container_attr, None)
+        tree = parse_html(html, backend, only=only)
+        extracted = extract(tree)
+        for product in extracted if isinstance(extracted, list) else [extracted]:
+            if product.get("name"):
+                names.append(product["name"])
+
+        def parse_and_extract():
+            for _ in range(rounds):
+                extract(parse_html(html, backend, only=only))
+
+        def extract_only():
+            for _ in range(rounds):
+                extract(tree)
+
+        record(results, f"adapter.{site}.{method}.parse_and_extract[{backend}]",
+               measure(parse_and_extract, rounds, repeat), "pages")
+        record(results, f"adapter.{site}.{method}.extract[{backend}]",
+               measure(extract_only, rounds, repeat), "pages")
+    return names
+
+def bench_slugify(names: list[str], repeat: int, ops: int, results: dict):
+    if not names:
+        return
+    names = (names * (ops // len(names) + 1))[:ops]
+
+    def run():
+        for name in names:
+            slugify(name)
+
+    print(f"slugify ({ops} fixture product names per run)")
+    record(results, "utils.slugify", measure(run, ops, repeat), "names")
+
+# ---------------------------
+# Database
+# ---------------------------
+
+def synthetic_db(work_dir: Path, rows: int) -> dict:
+    """
+    A database holding rows fetched ProductPages (and one Urls row per 48
+    products), built once in work_dir and reused while its row count matches.
+    """
+    path = work_dir / f"synthetic_{size_label(rows)}.sqlite"
+    if path.exists():
+        db = db_initialization(path)
+        if db["cur"].execute("SELECT COUNT(*) FROM ProductPages").fetchone()[0] == rows:
+            return db
+        db["conn"].close()
+        path.unlink()
+
+    start = time.perf_counter()
+    db = db_initialization(path)
+    chunk = 50_000
+    for first in range(0, rows, chunk):
+        ids = range(first, min(first + chunk, rows))
+        db["cur"].executemany(
+            '''
+            INSERT INTO ProductPages (product_url, product_name, fetch_status, filename)
+            VALUES (?, ?, 'fetched', ?)
+            ''',
+            [(f"https://www.mercadolibre.com.ar/p/MLA{1_000_000_000 + i}", f"product_{i}", f"product_{i}.html") for i in ids]
+        )
+        db["conn"].commit()
+    db["cur"].executemany(
+        "INSERT INTO Urls (url_name, date, filename, status) VALUES (?, ?, ?, 'fetched')",
+        [(f"https://listado.mercadolibre.com.ar/notebook_Desde_{i * 49 + 1}", now_with_hours(), f"page_{i + 1}.html")
+         for i in range(rows // 48)]
+    )
+    db["conn"].commit()
+    print(f"  built {path.name} in {time.perf_counter() - start:.1f}s")
+    return db
+
+def bench_db(db: dict, rows: int, ops: int, repeat: int, product: dict, results: dict):
+    """insert_product_url (one commit per row), insert_product_urls (one batch) and update_product_data."""
+    label = size_label(rows)
+    rng = random.Random(rows)
+    new_ids = iter(range(10**9))
+
+    def new_products() -> list[dict]:
+        return [
+            {"link": f"https://www.mercadolibre.com.ar/p/NEW{next(new_ids)}", "slug": "synthetic_product"}
+            for _ in range(ops)
+        ]
+
+    def single_inserts():
+        for new_product in new_products():
+            insert_product_url(db, new_product, 0)
+
+    def batch_insert():
+        insert_product_urls(db, new_products())
+
+    def updates():
+        date = now_with_hours()
+        for row_id in rng.sample(range(1, rows + 1), min(ops, rows)):
+            update_product_data(db, row_id, product, date)
+
+    print(f"Database, {label} rows ({ops} operations per run, best of {repeat})")
+    try:
+        record(results, f"db.insert_product_url[{label}]", measure(single_inserts, ops, repeat), "rows")
+        record(results, f"db.insert_product_urls[{label}]", measure(batch_insert, ops, repeat), "rows")
+        record(results, f"db.update_product_data[{label}]", measure(updates, min(ops, rows), repeat), "rows")
+    finally:
+        # Keep the synthetic database at its size for the next run
+        db["cur"].execute("DELETE FROM ProductPages WHERE id > ?", (rows,))
+        db["conn"].commit()
+
+# ---------------------------
+# Results
+# ---------------------------
+
+def environment(backend: str) -> dict:
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "parser_backend": backend,
+        "recorded_at": now_with_hours(),
+    }
+
+def compare(results: dict, run_environment: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Prints each result against the baseline. Returns the names slower by more than tolerance."""
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    for key in ("parser_backend", "python", "sqlite", "platform"):
+        if baseline.get("environment", {}).get(key) != run_environment.get(key):
+            print(f"  note: baseline {key} differs ({baseline.get('environment', {}).get(key)})")
+    print(f"  {'benchmark':<84} {'ops/s':>12} {'baseline':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline_results.get(name)
+        if not before or not before.get("ops_per_second"):
+            print(f"  {name:<84} {result['ops_per_second']:>12,.1f} {'-':>12} {'new':>8}")
+            continue
+        change = result["ops_per_second"] / before["ops_per_second"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<84} {result['ops_per_second']:>12,.1f} {before['ops_per_second']:>12,.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+def write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    paths_dict = setup_directories_pathlib()
+    bench_dir = paths_dict["data_dir"] / "benchmarks"
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the site adapters and the database stages.")
+    parser.add_argument("--backend", default="auto", help="HTML parser backend for the adapter benchmarks")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="synthetic database sizes, comma separated")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the best one is kept")
+    parser.add_argument("--rounds", type=int, default=20, help="fixture pages parsed per adapter run")
+    parser.add_argument("--slugify-ops", type=int, default=20_000)
+    parser.add_argument("--db-ops", type=int, default=2_000, help="rows inserted or updated per database run")
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--work-dir", type=Path, default=bench_dir, help="where synthetic databases are kept")
+    parser.add_argument("--output", type=Path, default=bench_dir / "results.json")
+    parser.add_argument("--baseline", type=Path, default=bench_dir / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown against the baseline reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    backend = resolve_parser_backend(args.backend)
+    environment_of_run = environment(backend)
+    results: dict = {}
+
+    names = bench_adapters(backend, args.repeat, args.rounds, results)
+    bench_slugify(names, args.repeat, args.slugify_ops, results)
+
+    if not args.skip_db:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        specific_site_config, _ = specific_site_setup(site_registry(), "mercadolibre")
+        product_html = (FIXTURES_DIR / "mercadolibre_product.html").read_text(encoding="utf-8")
+        product = specific_site_config.individual_product_data_extraction(
+            parse_html(product_html, backend, only=specific_site_config.product_page_container))
+        for rows in (parse_size(size) for size in args.sizes.split(",")):
+            db = synthetic_db(args.work_dir, rows)
+            try:
+                bench_db(db, rows, args.db_ops, args.repeat, product, results)
+            finally:
+                db["cur"].close()
+                db["conn"].close()
+
+    run = {"environment": environment_of_run, "results": results}
+    write_json(args.output, run)
+    print(f"Results written to {args.output}")
+
+    regressions = []
+    if args.baseline.exists():
+        print(f"Against baseline {args.baseline} (tolerance {args.tolerance:.0%})")
+        regressions = compare(results, environment_of_run, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        print(f"{len(regressions)} regressions" if regressions else "No regressions")
+    if args.save_baseline:
+        write_json(args.baseline, run)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
@@ -0,0 +1,346 @@
+# mock_shop.py
+# Run from src/crawler_codebase: python -m benchmarks.mock_shop --port 8800
+import json
+import time
+import random
+import argparse
+import threading
+
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Seed URL of each site on the mock shop; the adapters paginate from there
+MOCK_SEED_PATHS = {
+    "mercadolibre": "/ml/notebook",
+    "amazon": "/amz/s?k=laptop",
+}
+
+# MercadoLibreConfig.build_pagination_url steps offsets by 49
+ML_OFFSET_STEP = 49
+
+WORDS = [
+    "Notebook", "Lenovo", "IdeaPad", "Slim", "15.6", "Intel", "Core", "i5", "i7", "16GB", "512GB",
+    "SSD", "Ryzen", "Asus", "Vivobook", "HP", "Pavilion", "Acer", "Aspire", "Gamer", "RTX", "Full",
+    "HD", "Táctil", "Edición", "Plata", "Negro",
+]
+
+class MockShop:
+    """
+    Local e-commerce fixture server with MercadoLibre (/ml/...) and Amazon
+    (/amz/...) style search listings and MercadoLibre product pages, built
+    to match the selectors of MercadoLibreConfig and AmazonConfig.
+    Products are derived from their ids, so listings and product pages agree
+    across requests and runs.
+    Server behaviour:
+      - latency_ms (+ up to latency_jitter_ms) before each answer;
+      - js_ratio of the pages ship their results in a script that renders
+        them after render_delay_ms, like a client-rendered page (plain HTTP
+        fetches must escalate to the browser, which waits for the selector);
+      - error_rate of the requests fail with a 500;
+      - rate_limit_rate of the requests, and any request above
+        max_requests_per_second, get a 429 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        pages: int = 20,
+        items_per_page: int = 48,
+        latency_ms: float = 50.0,
+        latency_jitter_ms: float = 0.0,
+        js_ratio: float = 0.0,
+        render_delay_ms: float = 300.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_requests_per_second: float | None = None,
+        seed: int = 7):
+
+        self.pages = pages
+        self.items_per_page = items_per_page
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.js_ratio = js_ratio
+        self.render_delay_ms = render_delay_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_requests_per_second = max_requests_per_second
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = max_requests_per_second or 0.0
+        self._tokens_at = time.monotonic()
+        self._stats: dict[str, int] = {}
+        self._server: ThreadingHTTPServer | None = None
+        self.base_url: str | None = None
+
+    # ---------------------------
+    # Catalog
+    # ---------------------------
+
+    def _product(self, product_id: int) -> dict:
+        rng = random.Random(product_id)
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 10)))
+        return {
+            "id": product_id,
+            "name": f"{name} {product_id % 10_000}",
+            "price": rng.randint(150_000, 3_500_000),
+            "reviews": f"Calificación 4.{rng.randint(0, 9)} de 5. {rng.randint(1, 5000)} opiniones.",
+        }
+
+    def _is_js_rendered(self, path: str) -> bool:
+        # Stable per page, so a retry of a client-rendered page stays client-rendered
+        return random.Random(f"{self.seed}:{path}").random() < self.js_ratio
+
+    def _render(self, path: str, title: str, container: str, body: str) -> str:
+        """Full page whose results are in the HTML, or added by a script after render_delay_ms."""
+        if self._is_js_rendered(path):
+            script_body = json.dumps(body).replace("</", "<\\/")
+            content = (
+                f'<div id="mock-root"></div><script>setTimeout(function () {{'
+                f'document.getElementById("mock-root").innerHTML = {script_body};'
+                f'}}, {self.render_delay_ms:g});</script>'
+            )
+            self._count("js_rendered")
+        else:
+            content = body
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body><header><nav>' + "".join(f'<a href="/c/{i}">Categoría {i}</a>' for i in range(20)) +
+            f'</nav></header><main class="{container}">{content}</main></body></html>'
+        )
+
+    def _ml_search(self, base_url: str, path: str, query: str, offset: int) -> str | None:
+        page_number = offset // ML_OFFSET_STEP + 1
+        if page_number > self.pages:
+            return None
+        first_id = 1_000_000_000 + (page_number - 1) * self.items_per_page
+        items = []
+        for product_id in range(first_id, first_id + self.items_per_page):
+            product = self._product(product_id)
+            price = f"{product['price']:,}".replace(",", ".")
+            items.append(
+                f'<li class="ui-search-layout__item"><div class="poly-card">'
+                f'<img class="poly-component__picture lazy-loadable" data-src="{base_url}/img/D_Q_NP_{product_id}-MLA{product_id}_1.webp" '
+                f'src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP">'
+                f'<h3 class="poly-component__title-wrapper"><a class="poly-component__title" '
+                f'href="{base_url}/ml/p/MLA{product_id}">{product["name"]}</a></h3>'
+                f'<span class="andes-money-amount"><span class="andes-money-amount__currency-symbol">$</span>'
+                f'<span class="andes-money-amount__fraction">{price}</span></span></div></li>'
+            )
+        pagination = ""
+        if page_number < self.pages:
+            pagination = (
+                f'<ul class="andes-pagination"><li class="andes-pagination__button andes-pagination__button--next">'
+                f'<a href="/ml/{query}_Desde_{page_number * ML_OFFSET_STEP}_NoIndex_True">Siguiente</a></li></ul>'
+            )
+        body = f'<ol class="ui-search-layout">{"".join(items)}</ol>{pagination}'
+        return self._render(path, f"{query} | MercadoLibre", "ui-search-results", body)
+
+    def _ml_product(self, base_url: str, path: str, product_id: int) -> str:
+        product = self._product(product_id)
+        price = f"{product['price']:,}".replace(",", ".")
+        related = "".join(
+            f'<li><a class="poly-component__title" href="{base_url}/ml/p/MLA{product_id + i}">'
+            f'{self._product(product_id + i)["name"]}</a></li>'
+            for i in range(1, 7)
+        )
+        body = (
+            f'<img class="ui-pdp-image" data-src="{base_url}/img/D_NQ_NP_{product_id}-MLA{product_id}_1-F.webp" '
+            f'src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP">'
+            f'<h1 class="ui-pdp-title">{product["name"]}</h1>'
+            f'<p class="andes-visually-hidden">{product["reviews"]}</p>'
+            f'<span class="andes-money-amount"><span class="andes-money-amount__currency-symbol">$</span>'
+            f'<span class="andes-money-amount__fraction">{price}</span></span>'
+            f'<div class="ui-pdp-description">' + "".join(f"<p>Característica {i}.</p>" for i in range(20)) + "</div>"
+            f'<section class="ui-recommendations"><ol>{related}</ol></section>'
+        )
+        return self._render(path, f"{product['name']} | MercadoLibre", "ui-pdp-container", body)
+
+    def _amazon_search(self, path: str, page_number: int) -> str | None:
+        if page_number > self.pages:
+            return None
+        first_id = 2_000_000_000 + (page_number - 1) * self.items_per_page
+        results = []
+        for product_id in range(first_id, first_id + self.items_per_page):
+            product = self._product(product_id)
+            dollars = product["price"] // 1000
+            results.append(
+                f'<div data-asin="B{product_id}" data-component-type="s-search-result" class="s-result-item">'
+                f'<h2 class="a-size-medium a-spacing-none a-color-base a-text-normal"><span>{product["name"]}</span></h2>'
+                f'<span class="a-price"><span class="a-price-symbol">$</span>'
+                f'<span class="a-price-whole">{dollars}<span class="a-price-decimal">.</span></span>'
+                f'<span class="a-price-fraction">99</span></span></div>'
+            )
+        body = f'<div class="s-main-slot s-result-list">{"".join(results)}</div>'
+        return self._render(path, "Amazon.com : laptop", "s-search-results", body)
+
+    @staticmethod
+    def route(raw_path: str) -> str:
+        """Kind of page a request path asks for: ml_search, ml_product, amazon_search or other."""
+        path = urlsplit(raw_path).path
+        if path.startswith("/ml/p/MLA"):
+            return "ml_product"
+        if path.startswith("/ml/"):
+            return "ml_search"
+        if path == "/amz/s":
+            return "amazon_search"
+        return "other"
+
+    def page(self, base_url: str, raw_path: str) -> str | None:
+        """HTML of a request path, or None for a 404."""
+        parts = urlsplit(raw_path)
+        kind = self.route(raw_path)
+        try:
+            if kind == "ml_product":
+                return self._ml_product(base_url, raw_path, int(parts.path[len("/ml/p/MLA"):]))
+            if kind == "ml_search":
+                query, _, rest = parts.path[len("/ml/"):].partition("_Desde_")
+                offset = int(rest.split("_")[0]) if rest else 0
+                return self._ml_search(base_url, raw_path, query, offset)
+            if kind == "amazon_search":
+                page_number = int(parse_qs(parts.query).get("page", ["1"])[0])
+                return self._amazon_search(raw_path, page_number)
+        except ValueError:
+            pass
+        return None
+
+    # ---------------------------
+    # Faults and stats
+    # ---------------------------
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def fault(self) -> int | None:
+        """Status code of an injected fault for the next request, or None."""
+        with self._lock:
+            if self.max_requests_per_second:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.max_requests_per_second,
+                    self._tokens + (now - self._tokens_at) * self.max_requests_per_second)
+                self._tokens_at = now
+                if self._tokens < 1:
+                    return 429
+                self._tokens -= 1
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def latency(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.latency_jitter_ms)
+        return (self.latency_ms + jitter) / 1000
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    # ---------------------------
+    # Server
+    # ---------------------------
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serves in a background thread. Returns the base URL."""
+        shop = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8", headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/img/"):
+                    # Tiny placeholder image, served without faults or latency
+                    self._send(200, b"RIFF\x1a\x00\x00\x00WEBPVP8L", "image/webp")
+                    return
+                kind = shop.route(self.path)
+                status = shop.fault() if kind != "other" else None
+                time.sleep(shop.latency())
+                if status == 429:
+                    shop._count(f"{kind}:429")
+                    self._send(429, b"Too Many Requests", "text/plain", {"Retry-After": "1"})
+                    return
+                if status is not None:
+                    shop._count(f"{kind}:{status}")
+                    self._send(status, b"Internal Server Error", "text/plain")
+                    return
+                base_url = f"http://{self.headers.get('Host') or shop.base_url.split('://')[1]}"
+                html = shop.page(base_url, self.path)
+                if html is None:
+                    shop._count(f"{kind}:404")
+                    self._send(404, b"Not Found", "text/plain")
+                else:
+                    shop._count(f"{kind}:200")
+                    self._send(200, html.encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.base_url = f"http://{host}:{self._server.server_address[1]}"
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def add_mock_shop_arguments(parser: argparse.ArgumentParser):
+    """Command line options of the mock shop, shared with the end-to-end harness."""
+    parser.add_argument("--items", type=int, default=48, help="products per listing page")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--js-ratio", type=float, default=0.0, help="share of client-rendered pages")
+    parser.add_argument("--render-delay-ms", type=float, default=300.0, help="script delay of client-rendered pages")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--max-rps", type=float, default=None, help="requests per second above which the shop answers 429")
+    parser.add_argument("--seed", type=int, default=7)
+
+def mock_shop_from_args(args: argparse.Namespace, pages: int) -> MockShop:
+    return MockShop(
+        pages=pages,
+        items_per_page=args.items,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        js_ratio=args.js_ratio,
+        render_delay_ms=args.render_delay_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_requests_per_second=args.max_rps,
+        seed=args.seed,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock e-commerce server for end-to-end crawls.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--pages", type=int, default=20, help="listing pages per site")
+    add_mock_shop_arguments(parser)
+    args = parser.parse_args()
+
+    shop = mock_shop_from_args(args, args.pages)
+    base_url = shop.start(args.host, args.port)
+    for site, seed_path in MOCK_SEED_PATHS.items():
+        print(f"{site}: {base_url}{seed_path}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Requests served: {shop.stats()}")
+    finally:
+        shop.stop()
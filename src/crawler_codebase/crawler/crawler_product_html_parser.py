@@ -1,42 +1,40 @@
+import os
+import time
 import logging
+import multiprocessing
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from utilities.utils import now_with_hours
+from utilities.html_backend import parse_html
+from utilities.page_store import FilePageStore, read_page
+from utilities.response_capture import JSON_NAMESPACES, json_page_name, load_payloads
+from utilities.job_queue import DEFAULT_LEASE_SECONDS, LeaseHeartbeat, claim_jobs, make_worker_id
 
 def update_parse_status(row_id: int, db: dict, status: str):
     db["cur"].execute(
-        'UPDATE ProductPages SET parse_status = ? WHERE id = ?',
+        '''
+        UPDATE ProductPages
+        SET parse_status = ?, parse_lease_owner = NULL, parse_lease_expires_at = NULL
+        WHERE id = ?
+        ''',
         (status, row_id)
     )
     db["conn"].commit()
 
-def get_fetched_product(db: dict) -> tuple[int, str, str, str] | tuple[None, None, None, None]:
-
-    db["cur"].execute(
-        '''
-        SELECT id, product_url, product_name, filename
-        FROM ProductPages
-        WHERE fetch_status = ?
-        AND parse_status IS NULL
-        ORDER BY id
-        LIMIT 1
-        ''',
-        ('fetched',)
-    )
-    row = db["cur"].fetchone()
-    if row is None:
+def get_fetched_product(
+    db: dict,
+    worker_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> tuple[int, str, str, str] | tuple[None, None, None, None]:
+    """
+    Atomically claims the next fetched, unparsed product page (or one whose
+    parse lease expired) for worker_id.
+    """
+    rows = claim_jobs(db, "product_parse", worker_id, batch_size=1, lease_seconds=lease_seconds)
+    if not rows:
         return None, None, None, None
 
-    row_id, product_url, product_name, filename = row
-
-    # Lock immediately
-    db["cur"].execute(
-        'UPDATE ProductPages SET parse_status = ? WHERE id = ?',
-        ('parsing', row_id)
-    )
-
-    db["conn"].commit()
-
+    row_id, product_url, product_name, filename = rows[0]
     return row_id, product_url, product_name, filename
 
 def update_product_data(db: dict, row_id: int, product: dict, date: str) -> bool:
@@ -67,6 +65,114 @@ def update_product_data(db: dict, row_id: int, product: dict, date: str) -> bool
     db["conn"].commit()
     return True
 
+def claim_fetched_products(
+    db: dict,
+    batch_size: int,
+    worker_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> list[tuple[int, str, str, str]]:
+    """
+    Atomically claims up to batch_size fetched, unparsed rows for worker_id
+    with a single UPDATE ... RETURNING.
+    """
+    return claim_jobs(db, "product_parse", worker_id, batch_size=batch_size, lease_seconds=lease_seconds)
+
+def bulk_update_product_data(db: dict, parsed: list[tuple[int, dict]], failed_ids: list[int], date: str):
+    """
+    Writes a batch of parsed products and their parse statuses in one transaction.
+    """
+    with db["conn"]:
+        db["cur"].executemany(
+            '''
+            UPDATE ProductPages
+            SET
+                product_name = ?,
+                currency = ?,
+                price = ?,
+                product_code = ?,
+                reviews = ?,
+                images = ?,
+                fetched_at = ?,
+                parse_status = 'parsed_succeeded',
+                parse_lease_owner = NULL,
+                parse_lease_expires_at = NULL
+            WHERE id = ?
+            ''',
+            [
+                (
+                    product["slug"],
+                    product["currency"],
+                    product["price"],
+                    product["product_code"],
+                    product['reviews'],
+                    product['images'][0],
+                    date,
+                    row_id
+                )
+                for row_id, product in parsed
+            ]
+        )
+        db["cur"].executemany(
+            '''
+            UPDATE ProductPages
+            SET parse_status = ?, parse_lease_owner = NULL, parse_lease_expires_at = NULL
+            WHERE id = ?
+            ''',
+            [('parsing_failed', row_id) for row_id in failed_ids]
+        )
+
+def locate_product_page(page_store, row_id: int, filename: str | None) -> tuple[tuple | None, tuple | None]:
+    """Page store locators of a product's HTML and of its captured JSON payloads."""
+    locator = page_store.locate("product", filename) if filename else None
+    json_locator = page_store.locate(JSON_NAMESPACES["product"], json_page_name("product", row_id))
+    return locator, json_locator
+
+def fill_missing_fields(product: dict, html_product: dict | None) -> dict:
+    """Fields the captured JSON left empty (reviews, images, product_url), taken from the HTML extraction."""
+    if not html_product:
+        return product
+    for key in ("reviews", "product_url"):
+        if product.get(key) is None and html_product.get(key) is not None:
+            product[key] = html_product[key]
+    if not any(product.get("images") or []) and any(html_product.get("images") or []):
+        product["images"] = html_product["images"]
+    return product
+
+def parse_product(specific_site_config, parser_backend: str, product_url: str | None, locator: tuple | None, json_locator: tuple | None) -> dict | None:
+    """
+    Product data of one fetched page: decoded from the captured JSON item
+    matching product_url when the adapter can, with the fields the JSON lacks
+    filled from the HTML; else parsed from the HTML alone. None if neither
+    yields a product.
+    """
+    product = None
+    json_extraction = getattr(specific_site_config, "json_individual_product_extraction", None)
+    if json_locator is not None and json_extraction is not None:
+        product = json_extraction(load_payloads(read_page(json_locator)), product_url)
+    if locator is None:
+        return product or None
+    soup = parse_html(read_page(locator), parser_backend, only=specific_site_config.product_page_container)
+    html_product = specific_site_config.individual_product_data_extraction(soup)
+    if product:
+        return fill_missing_fields(product, html_product)
+    return html_product
+
+def parse_product_file(job: tuple[int, str | None, tuple | None, tuple | None, object, str]) -> tuple[int, dict | None, str | None, float]:
+    """
+    Process pool task: parses one saved product page from its page store locators.
+    Returns (row_id, product or None, error message or None, parse seconds).
+    """
+    row_id, product_url, locator, json_locator, specific_site_config, parser_backend = job
+    started_at = time.monotonic()
+    try:
+        if locator is None and json_locator is None:
+            return row_id, None, f"Missing HTML for id {row_id}", 0.0
+        product = parse_product(specific_site_config, parser_backend, product_url, locator, json_locator)
+        if not product:
+            return row_id, None, f"No product data extracted for id {row_id}", time.monotonic() - started_at
+        return row_id, product, None, time.monotonic() - started_at
+    except Exception as e:
+        return row_id, None, f"Parsing error for id {row_id}: {e!r}", time.monotonic() - started_at
+
     
 ###################################################
 
@@ -76,45 +182,46 @@ def run_crawler_product_html_parser(
         specific_site_config, 
         logger: logging.Logger, 
         error_logger: logging.Logger,
-        counter_of_products=1
+        counter_of_products=1,
+        parser_backend: str = "bs4",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        page_store = None,
+        metrics = None,
+        stop_event = None
     ):
 
-    def reset_stuck_parsing_jobs(db: dict):
-        db["cur"].execute(
-            '''
-            UPDATE ProductPages
-            SET parse_status = NULL
-            WHERE parse_status = "parsing"
-            '''
-        )
-        db["conn"].commit()
-    
-    # Reset stuck parsing jobs
-    reset_stuck_parsing_jobs(db)
+    # Leases replace the old blind reset of parsing rows
+    worker_id = make_worker_id("product_parser")
+    page_store = page_store or FilePageStore(paths_dict)
 
     # Main logic
     while True:
         
+        #Stop requested by the pipeline: leave between jobs
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Crawler_product_html_parser: stop requested, leaving")
+            break
         row_id = None
         filename = None
 
         try:
             # Get fetched search result product page
-            row_id, _, product_name, filename = get_fetched_product(db)
+            row_id, product_url, product_name, filename = get_fetched_product(db, worker_id, lease_seconds)
             if row_id is None:
                 break
 
-            # Filepath creation
-            file_path = paths_dict['output_dir'] / filename
-            if not file_path.exists():
+            # Page lookup: HTML and captured JSON
+            locator, json_locator = locate_product_page(page_store, row_id, filename)
+            if locator is None and json_locator is None:
                 error_logger.error(f"Missing HTML for id {row_id}")
                 update_parse_status(row_id, db, status='parsing_failed')
                 continue
 
-            # Soup extraction
-            with open(file_path, "r", encoding="utf-8") as f:
-                soup = BeautifulSoup(f, 'html.parser')
-            product = specific_site_config.individual_product_data_extraction(soup)
+            # JSON decoding or soup extraction
+            started_at = time.monotonic()
+            product = parse_product(specific_site_config, parser_backend, product_url, locator, json_locator)
+            if metrics is not None:
+                metrics.record_parse("product_parser", "page", time.monotonic() - started_at, ok=bool(product))
             if not product:
                 update_parse_status(row_id, db, status='parsing_failed')
                 continue
@@ -122,8 +229,11 @@ def run_crawler_product_html_parser(
             # DB insertion
             try:
                 date = now_with_hours()
+                started_at = time.monotonic()
                 update_product_data(db, row_id, product, date)
                 update_parse_status(row_id, db, status='parsed_succeeded')
+                if metrics is not None:
+                    metrics.observe("crawler_db_commit_seconds", time.monotonic() - started_at, stage="product_parser")
                 logger.info(f"Product {counter_of_products} parsed: {product_name}")
                 counter_of_products += 1
             except Exception:
@@ -135,14 +245,86 @@ def run_crawler_product_html_parser(
             if row_id is not None:
                 update_parse_status(row_id, db, status='parsing_failed')
 
+###################################################
 
+def run_crawler_product_html_parser_parallel(
+        db: dict,
+        paths_dict: dict,
+        specific_site_config,
+        logger: logging.Logger,
+        error_logger: logging.Logger,
+        workers: int | None = None,
+        batch_size: int = 200,
+        parser_backend: str = "bs4",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        page_store = None,
+        metrics = None,
+        stop_event = None
+    ):
+    """
+    Parallel mode of the product parser.
+    Claims rows in batches, parses them across a process pool and writes
+    each batch back in a single transaction.
+    """
+    page_store = page_store or FilePageStore(paths_dict)
 
+    workers = workers or os.cpu_count() or 1
+    counter_of_products = 0
+    worker_id = make_worker_id("product_parser")
 
+    # Main logic
+    # Spawned, not forked: a fork copies locks (page store mmaps, logging)
+    # that other threads of a pipelined run may be holding at that moment
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool, \
+            LeaseHeartbeat(db["path"], "product_parse", lease_seconds) as heartbeat:
+        while True:
+            #Stop requested by the pipeline: leave between jobs
+            if stop_event is not None and stop_event.is_set():
+                logger.info("Crawler_product_html_parser: stop requested, leaving")
+                break
+            batch = claim_fetched_products(db, batch_size, worker_id, lease_seconds)
+            if not batch:
+                break
+            batch_ids = [row[0] for row in batch]
+            heartbeat.hold(worker_id, batch_ids)
 
+            jobs = [
+                (
+                    row_id,
+                    product_url,
+                    *locate_product_page(page_store, row_id, filename),
+                    specific_site_config,
+                    parser_backend
+                )
+                for row_id, product_url, _, filename in batch
+            ]
+            chunksize = max(1, len(jobs) // (workers * 4))
 
+            parsed: list[tuple[int, dict]] = []
+            failed_ids: list[int] = []
+            try:
+                for row_id, product, error, seconds in pool.map(parse_product_file, jobs, chunksize=chunksize):
+                    if metrics is not None:
+                        metrics.record_parse("product_parser", "page", seconds, ok=product is not None)
+                    if product is None:
+                        error_logger.error(error)
+                        failed_ids.append(row_id)
+                    else:
+                        parsed.append((row_id, product))
 
+                # Bulk DB update
+                started_at = time.monotonic()
+                bulk_update_product_data(db, parsed, failed_ids, now_with_hours())
+                if metrics is not None:
+                    metrics.observe("crawler_db_commit_seconds", time.monotonic() - started_at, stage="product_parser")
+                counter_of_products += len(parsed)
+                logger.info(
+                    f"Parsed batch of {len(batch)} products: {len(parsed)} succeeded, "
+                    f"{len(failed_ids)} failed ({counter_of_products} total)"
+                )
+            except Exception:
+                error_logger.error("Batch parsing failed", exc_info=True)
+                bulk_update_product_data(db, [], batch_ids, now_with_hours())
 
-
-
-
-
+            finally:
+                heartbeat.release(worker_id, batch_ids)
@@ -1,45 +1,83 @@
+import time
 import random
+import asyncio
 import logging
 
 from typing import Optional
-from playwright.sync_api import sync_playwright
-from utilities.stealth import stealth_context
-from utilities.utils import countdown_sleep_timer, process_single_url, write_html
+from utilities.stealth import stealth_context, async_stealth_context
+from utilities.browser_session import stage_browser, async_stage_browser
+from utilities.utils import countdown_sleep_timer, process_single_url, process_single_url_structured, new_fetch_stats, now_with_hours, timed_phase, scaled_delay
+from utilities.page_store import FilePageStore
+from utilities.job_queue import DEFAULT_LEASE_SECONDS, LeaseHeartbeat, claim_jobs, make_worker_id
+from utilities import async_utils
+from utilities.response_capture import json_page_name
+from crawler.crawler_product_html_parser import update_product_data, update_parse_status
 
 def update_fetch_status_in_product_pages(row_id: int, db: dict, filename: str | None, status: str):
     db["cur"].execute(
-        "UPDATE ProductPages SET fetch_status = ?, filename = ? WHERE id = ?",
+        '''
+        UPDATE ProductPages
+        SET fetch_status = ?, filename = ?, fetch_lease_owner = NULL, fetch_lease_expires_at = NULL
+        WHERE id = ?
+        ''',
         (status, filename, row_id)
     )
     db["conn"].commit()
 
-def get_pending_product_url(db: dict) -> tuple[int, str, str] | tuple[None, None, None]:
-    db["cur"].execute(
-        '''
-        SELECT id, product_url, product_name
-        FROM ProductPages
-        WHERE fetch_status = ?
-        ORDER BY id
-        LIMIT 1
-        ''',
-        ('pending',)
-    )
-    row = db["cur"].fetchone()
-    if row is None:
+def get_pending_product_url(
+    db: dict,
+    worker_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> tuple[int, str, str] | tuple[None, None, None]:
+    """
+    Atomically claims the next pending product page (or one whose lease
+    expired) for worker_id.
+    """
+    rows = claim_jobs(db, "product_fetch", worker_id, batch_size=1, lease_seconds=lease_seconds)
+    if not rows:
         return None, None, None
-    
-    row_id, product_url, name = row
 
-    # Lock
-    db["cur"].execute(
-        'UPDATE ProductPages SET fetch_status = ? WHERE id = ?',
-        ('fetching', row_id)
-    )
-
-    db["conn"].commit()
-    
+    row_id, product_url, name = rows[0]
     return row_id, product_url, name
 
+def store_extracted_product(db: dict, extraction: dict, row_id: int, data: dict):
+    """Writes a product extracted in the browser straight to its ProductPages row, as parsed."""
+    product = extraction["site"].product_from_extractor(data)
+    update_product_data(db, row_id, product, now_with_hours())
+    update_parse_status(row_id, db, status='parsed_succeeded')
+
+def save_product_page(
+    db: dict,
+    page_store,
+    row_id: int,
+    product_url: str,
+    product_name: str,
+    html: str | None,
+    product_data: dict | None,
+    extraction: dict | None,
+    payloads: list | None = None,
+    response_capture = None) -> bool:
+    """
+    Stores the outcome of one product fetch: the extracted product (extraction
+    mode "browser"), the captured JSON payloads and/or the HTML in the page
+    store. Returns True if the page counts as fetched.
+    """
+    if product_data is not None:
+        store_extracted_product(db, extraction, row_id, product_data)
+
+    captured = bool(payloads) and response_capture.store(
+        page_store, "product", json_page_name("product", row_id), payloads, url=product_url, row_id=row_id)
+    if captured and not response_capture.keep_html:
+        html = None
+
+    #Product_name is already slugified
+    filename = f'{product_name}.html' if html else None
+    archived = bool(html) and page_store.write("product", filename, html, url=product_url, row_id=row_id)
+    if archived or captured or product_data is not None:
+        update_fetch_status_in_product_pages(row_id, db, filename if archived else None, status='fetched')
+        return True
+    update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
+    return False
+
 ##########################################################
 
 def run_crawler_product_scraper(
@@ -47,80 +85,362 @@ def run_crawler_product_scraper(
     paths_dict: dict,
     logger: logging.Logger,
     error_logger: logging.Logger,
-    page_counter=1):
-
-    def reset_stuck_jobs(db: dict):
-        db["cur"].execute(
-            '''
-            UPDATE ProductPages
-            SET fetch_status = 'pending'
-            WHERE fetch_status = 'fetching'
-            '''
-        )
-        db["conn"].commit()
-    
-    #Reset stuck parsing jobs
-    reset_stuck_jobs(db)
+    page_counter=1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    page_store = None,
+    resource_blocker = None,
+    asset_cache = None,
+    throttle = None,
+    readiness = None,
+    scroll_settings = None,
+    browser_session = None,
+    session_states = None,
+    http_fetcher = None,
+    extraction = None,
+    response_capture = None,
+    metrics = None,
+    stop_event = None):
+
+    # Leases replace the old blind reset of fetching rows
+    worker_id = make_worker_id("product_scraper")
+    page_store = page_store or FilePageStore(paths_dict)
 
     #Main logic
-    with sync_playwright() as p:
+    with stage_browser(browser_session) as browser, \
+            LeaseHeartbeat(db["path"], "product_fetch", lease_seconds) as heartbeat:
 
-        browser = p.chromium.launch(
-        headless=False
-        )
-        context = stealth_context(browser)
-        page = context.new_page()
-
-        #Main crawling loop
-        while True:
-            row_id: Optional[int] = None 
-            filename: Optional[str] = None 
-            try:
-                # Get each product URL, name and row_id
-                row_id, product_url, product_name = get_pending_product_url(db)
-                if row_id is None:
-                    logger.info("No more URLs found. Exiting program")
+        #Saved session (cookies + localStorage) for this site, when enabled
+        session = session_states.checkout() if session_states is not None else None
+        context = stealth_context(browser, resource_blocker, asset_cache, session=session)
+        try:
+            page = context.new_page()
+
+            #Main crawling loop
+            while True:
+                #Stop requested by the pipeline: leave between jobs
+                if stop_event is not None and stop_event.is_set():
+                    logger.info("Crawler_product_scraper: stop requested, leaving")
                     break
-                if product_url is None:
-                    update_fetch_status_in_product_pages(row_id, db, filename, status='failed_unfetchable')
-                    logger.info(f"URL not found for {row_id}. Continuing program")
-                    continue
+                row_id: Optional[int] = None 
+                filename: Optional[str] = None 
+                try:
+                    # Get each product URL, name and row_id
+                    row_id, product_url, product_name = get_pending_product_url(db, worker_id, lease_seconds)
+                    if row_id is None:
+                        logger.info("No more URLs found. Exiting program")
+                        break
+                    heartbeat.hold(worker_id, [row_id])
+                    if product_url is None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed_unfetchable')
+                        logger.info(f"URL not found for {row_id}. Continuing program")
+                        continue
                 
-                #Occasional long pause to simulate browsing
-                if (page_counter % 5 == 0) and (page_counter != 0):
-                    special_wait_time = random.uniform(50, 90)
-                    countdown_sleep_timer(special_wait_time)
-
-                #Process a single URL
-                html = process_single_url(
-                    page, 
-                    product_url, 
-                    logger, 
-                    wait_selector="a.poly-component__title")
-                if not html:
-                    error_logger.error(f"HTML not fetched for URL: {product_url}")
-                    continue
+                    #Occasional long pause to simulate browsing (the throttle stretches its own delay instead)
+                    if throttle is None and (page_counter % 5 == 0) and (page_counter != 0):
+                        special_wait_time = scaled_delay(random.uniform(50, 90))
+                        countdown_sleep_timer(special_wait_time)
+
+                    #Process a single URL, over plain HTTP first when the site allows it
+                    #In extraction mode "browser", the product is read in the page itself
+                    fetch_stats = new_fetch_stats()
+                    html = None
+                    product_data = None
+                    payloads = None
+                    if http_fetcher is not None:
+                        with timed_phase(fetch_stats, "http_fetch"):
+                            html = http_fetcher.fetch_page(product_url, "product", stats=fetch_stats)
+                    #A block status over HTTP skips the browser: the throttle backs off instead
+                    if html is None and not fetch_stats["blocked"]:
+                        #JSON responses and embedded state captured while the page loads
+                        capture = response_capture.attach(page) if response_capture is not None else None
+                        if extraction is not None:
+                            product_data, html = process_single_url_structured(
+                                page,
+                                product_url,
+                                logger,
+                                wait_selector="a.poly-component__title",
+                                extractor_js=extraction["product_js"],
+                                keep_html=extraction["archive_html"],
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings)
+                        else:
+                            html = process_single_url(
+                                page, 
+                                product_url, 
+                                logger, 
+                                wait_selector="a.poly-component__title",
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings)
+                        if capture is not None:
+                            with timed_phase(fetch_stats, "capture"):
+                                payloads = response_capture.collect(capture)
+                    fetched = bool(html) or product_data is not None
+                    if throttle is not None:
+                        throttle.record(product_url, fetch_stats)
+                    if session is not None and fetch_stats["transport"] == "browser":
+                        session_states.record(session, fetch_stats, ok=fetched)
+                    if not fetched:
+                        error_logger.error(f"HTML not fetched for URL: {product_url}")
+                        #Release the claim, or the expired lease would requeue the URL again and again
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
+                        if throttle is not None:
+                            with timed_phase(fetch_stats, "delay"):
+                                countdown_sleep_timer(throttle.delay_for(product_url))
+                        if metrics is not None:
+                            metrics.record_fetch(db, "product_scraper", product_url, row_id, fetch_stats, ok=False)
+                        continue
                 
-                #Write HTML to disk
-                #Product_name is already slugified
-                filename = f'{product_name}.html'
-                if write_html(paths_dict['output_dir'], filename, html):
-                    update_fetch_status_in_product_pages(row_id, db, filename, status='fetched')
-                    page_counter += 1
-                else:
-                    update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
-
-                #Normal safe delay
-                wait_time = random.uniform(30, 55)
-                countdown_sleep_timer(wait_time)
-
-            except KeyboardInterrupt:
-                if row_id is not None:
-                    update_fetch_status_in_product_pages(row_id, db, filename, status='pending')
-                raise
-
-            except Exception:
-                if row_id is not None:
-                    update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
-                error_logger.error("Unhandled error in product scraper", exc_info=True)
+                    #Write the extracted product, captured JSON and/or the HTML
+                    with timed_phase(fetch_stats, "write"):
+                        saved = save_product_page(
+                            db, page_store, row_id, product_url, product_name, html, product_data, extraction,
+                            payloads, response_capture)
+                    if saved:
+                        page_counter += 1
+
+                    #Normal safe delay, adaptive when a throttle is configured
+                    if throttle is not None:
+                        wait_time = throttle.delay_for(product_url, page_counter)
+                    else:
+                        wait_time = scaled_delay(random.uniform(30, 55))
+                    with timed_phase(fetch_stats, "delay"):
+                        countdown_sleep_timer(wait_time)
+                    if metrics is not None:
+                        metrics.record_fetch(db, "product_scraper", product_url, row_id, fetch_stats, ok=saved)
+
+                except KeyboardInterrupt:
+                    if row_id is not None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='pending')
+                    raise
+
+                except Exception:
+                    if row_id is not None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
+                    error_logger.error("Unhandled error in product scraper", exc_info=True)
+
+                finally:
+                    if row_id is not None:
+                        heartbeat.release(worker_id, [row_id])
+        finally:
+            if session is not None:
+                session_states.save(session, context)
+                session_states.log_summary(logger, "Crawler_product_scraper")
+            context.close()
+        if http_fetcher is not None:
+            http_fetcher.log_summary(logger, "Crawler_product_scraper")
+        if response_capture is not None:
+            response_capture.log_summary(logger, "Crawler_product_scraper")
+        if resource_blocker is not None:
+            resource_blocker.log_summary(logger, "Crawler_product_scraper")
+        if asset_cache is not None:
+            asset_cache.log_summary(logger, "Crawler_product_scraper")
 
+##########################################################
+
+def log_worker_throughput(worker_stats: list[dict], logger: logging.Logger):
+    """Logs fetched/failed pages and pages per minute for each worker and the pool."""
+    total_fetched = 0
+    total_elapsed = 0.0
+    for stats in worker_stats:
+        elapsed = max(time.monotonic() - stats["started_at"], 1e-9)
+        total_fetched += stats["fetched"]
+        total_elapsed = max(total_elapsed, elapsed)
+        logger.info(
+            f"Product worker {stats['worker_number']}: {stats['fetched']} fetched, "
+            f"{stats['failed']} failed, {stats['fetched'] / elapsed * 60:.2f} pages/min"
+        )
+    if total_elapsed:
+        logger.info(
+            f"Product worker pool: {total_fetched} fetched, "
+            f"{total_fetched / total_elapsed * 60:.2f} pages/min"
+        )
+
+async def run_crawler_product_scraper_pool(
+    db: dict,
+    paths_dict: dict,
+    logger: logging.Logger,
+    error_logger: logging.Logger,
+    workers: int = 2,
+    report_every: int = 10,
+    wait_selector: str = "a.poly-component__title",
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    page_store = None,
+    resource_blocker = None,
+    asset_cache = None,
+    throttle = None,
+    readiness = None,
+    scroll_settings = None,
+    browser_session = None,
+    session_states = None,
+    http_fetcher = None,
+    extraction = None,
+    response_capture = None,
+    metrics = None,
+    stop_event = None):
+    """
+    Worker pool mode of the product scraper.
+    Runs `workers` isolated browser contexts, each with its own stealth
+    fingerprint, all pulling from the same ProductPages pending queue.
+    With an AdaptiveThrottle, workers share per-host delay and in-flight
+    limits tuned from each fetch instead of sleeping a fixed 30-55 s.
+    With session_states, each worker checks out its own saved session.
+    """
+    page_store = page_store or FilePageStore(paths_dict)
+
+    worker_stats = [
+        {"worker_number": i, "fetched": 0, "failed": 0, "started_at": time.monotonic()}
+        for i in range(1, workers + 1)
+    ]
+
+    #Renders the page; in extraction mode "browser" also extracts the product in it
+    async def browser_fetch(page, product_url: str, fetch_stats: dict) -> tuple[dict | None, str | None]:
+        if extraction is not None:
+            return await async_utils.process_single_url_structured(
+                page,
+                product_url,
+                logger,
+                wait_selector=wait_selector,
+                extractor_js=extraction["product_js"],
+                keep_html=extraction["archive_html"],
+                stats=fetch_stats,
+                readiness=readiness,
+                scroll_settings=scroll_settings)
+        html = await async_utils.process_single_url(
+            page,
+            product_url,
+            logger,
+            wait_selector=wait_selector,
+            stats=fetch_stats,
+            readiness=readiness,
+            scroll_settings=scroll_settings)
+        return None, html
+
+    #Plain HTTP first when the site allows it, else (or on a miss) the browser.
+    #Returns (product data extracted in the browser or None, html or None, captured payloads or None)
+    async def fetch_page(page, product_url: str, fetch_stats: dict) -> tuple[dict | None, str | None, list | None]:
+        if http_fetcher is not None:
+            with timed_phase(fetch_stats, "http_fetch"):
+                html = await http_fetcher.async_fetch_page(product_url, "product", stats=fetch_stats)
+            #A block status over HTTP skips the browser: the throttle backs off instead
+            if html is not None or fetch_stats["blocked"]:
+                return None, html, None
+        capture = response_capture.attach(page) if response_capture is not None else None
+        product_data, html = await browser_fetch(page, product_url, fetch_stats)
+        payloads = None
+        if capture is not None:
+            with timed_phase(fetch_stats, "capture"):
+                payloads = await response_capture.async_collect(capture)
+        return product_data, html, payloads
+
+    #Single context worker
+    async def worker(browser, stats: dict, heartbeat: LeaseHeartbeat):
+        worker_id = make_worker_id(f"product_scraper_{stats['worker_number']}")
+        session = session_states.checkout() if session_states is not None else None
+        context = await async_stealth_context(browser, resource_blocker, asset_cache, session=session)
+        page = await context.new_page()
+        page_counter = 1
+
+        try:
+            while True:
+                #Stop requested by the pipeline: leave between jobs
+                if stop_event is not None and stop_event.is_set():
+                    logger.info(f"Product worker {stats['worker_number']}: stop requested, leaving")
+                    break
+                row_id: Optional[int] = None
+                filename: Optional[str] = None
+                try:
+                    row_id, product_url, product_name = get_pending_product_url(db, worker_id, lease_seconds)
+                    if row_id is None:
+                        logger.info(f"Product worker {stats['worker_number']}: no more URLs found")
+                        break
+                    heartbeat.hold(worker_id, [row_id])
+                    if product_url is None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed_unfetchable')
+                        logger.info(f"URL not found for {row_id}. Continuing program")
+                        continue
+
+                    #Occasional long pause to simulate browsing (the throttle stretches its own delay instead)
+                    if throttle is None and (page_counter % 5 == 0) and (page_counter != 0):
+                        await asyncio.sleep(scaled_delay(random.uniform(50, 90)))
+
+                    #Process a single URL
+                    fetch_stats = new_fetch_stats()
+                    if throttle is not None:
+                        async with throttle.slot(product_url):
+                            #Time waited for the host's slot
+                            fetch_stats["phases"]["delay"] = time.monotonic() - fetch_stats["started_at"]
+                            product_data, html, payloads = await fetch_page(page, product_url, fetch_stats)
+                        throttle.record(product_url, fetch_stats)
+                    else:
+                        product_data, html, payloads = await fetch_page(page, product_url, fetch_stats)
+                    fetched = bool(html) or product_data is not None
+                    if session is not None and fetch_stats["transport"] == "browser":
+                        session_states.record(session, fetch_stats, ok=fetched)
+                    if not fetched:
+                        error_logger.error(f"HTML not fetched for URL: {product_url}")
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
+                        stats["failed"] += 1
+                        if metrics is not None:
+                            metrics.record_fetch(db, "product_scraper", product_url, row_id, fetch_stats, ok=False)
+                        continue
+
+                    #Write the extracted product, captured JSON and/or the HTML
+                    with timed_phase(fetch_stats, "write"):
+                        saved = save_product_page(
+                            db, page_store, row_id, product_url, product_name, html, product_data, extraction,
+                            payloads, response_capture)
+                    if metrics is not None:
+                        metrics.record_fetch(db, "product_scraper", product_url, row_id, fetch_stats, ok=saved)
+                    if saved:
+                        page_counter += 1
+                        stats["fetched"] += 1
+                        if stats["fetched"] % report_every == 0:
+                            log_worker_throughput(worker_stats, logger)
+                    else:
+                        stats["failed"] += 1
+
+                    #Normal safe delay (the throttle spaces requests in its slots)
+                    if throttle is None:
+                        await asyncio.sleep(scaled_delay(random.uniform(30, 55)))
+
+                except asyncio.CancelledError:
+                    if row_id is not None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='pending')
+                    raise
+
+                except Exception:
+                    if row_id is not None:
+                        update_fetch_status_in_product_pages(row_id, db, filename, status='failed')
+                        stats["failed"] += 1
+                    error_logger.error(
+                        f"Unhandled error in product worker {stats['worker_number']}", exc_info=True)
+
+                finally:
+                    if row_id is not None:
+                        heartbeat.release(worker_id, [row_id])
+        finally:
+            if session is not None:
+                await session_states.async_save(session, context)
+            await context.close()
+
+    #Main logic
+    async with async_stage_browser(browser_session) as browser:
+        try:
+            with LeaseHeartbeat(db["path"], "product_fetch", lease_seconds) as heartbeat:
+                await asyncio.gather(*(worker(browser, stats, heartbeat) for stats in worker_stats))
+        finally:
+            log_worker_throughput(worker_stats, logger)
+            if http_fetcher is not None:
+                http_fetcher.log_summary(logger, "Crawler_product_scraper")
+            if response_capture is not None:
+                response_capture.log_summary(logger, "Crawler_product_scraper")
+            if session_states is not None:
+                session_states.log_summary(logger, "Crawler_product_scraper")
+            if throttle is not None:
+                logger.info(f"Throttle state: {throttle.snapshot()}")
+            if resource_blocker is not None:
+                resource_blocker.log_summary(logger, "Crawler_product_scraper")
+            if asset_cache is not None:
+                asset_cache.log_summary(logger, "Crawler_product_scraper")
@@ -1,9 +1,13 @@
+import time
 import logging
 
-from bs4 import BeautifulSoup
 from pathlib import Path
 
-from utilities.utils import list_of_html_files_compiler
+from utilities.html_backend import parse_html
+from utilities.page_store import FilePageStore
+from utilities.response_capture import JSON_NAMESPACES, json_page_name, load_payloads
+from utilities.parse_manifest import parser_version, changed_pages, record_parsed_pages
+from utilities.job_queue import DEFAULT_LEASE_SECONDS, LeaseHeartbeat, claim_jobs, make_worker_id
 
 def insert_product_url(db: dict, individual_product: dict, url_id: int) -> bool:
     """Stores product information related to a product URL in the database.
@@ -19,6 +23,75 @@ def insert_product_url(db: dict, individual_product: dict, url_id: int) -> bool:
         print(f"Unknown DB error for {url_id}: {e}")
         return False
 
+def insert_product_urls(db: dict, products: list[dict]) -> tuple[int, int]:
+    """
+    Stores a batch of product URLs with one executemany in a single transaction.
+    Returns (inserted, ignored) row counts.
+    """
+    if not products:
+        return 0, 0
+
+    changes_before = db["conn"].total_changes
+    with db["conn"]:
+        db["cur"].executemany('''
+        INSERT OR IGNORE INTO ProductPages (product_url, product_name, fetch_status)
+        VALUES ( ?, ?, ? )
+        ''', [(product["link"], product["slug"], "pending") for product in products])
+    inserted = db["conn"].total_changes - changes_before
+
+    return inserted, len(products) - inserted
+
+def update_search_parse_status(db: dict, url_ids: list[int], status: str):
+    """Sets the parse status of search pages: parsed / parsing_failed."""
+    if not url_ids:
+        return
+    db["cur"].executemany(
+        '''
+        UPDATE Urls
+        SET parse_status = ?, parse_lease_owner = NULL, parse_lease_expires_at = NULL
+        WHERE id = ?
+        ''',
+        [(status, url_id) for url_id in url_ids]
+    )
+    db["conn"].commit()
+
+def requeue_search_pages(db: dict) -> int:
+    """Puts every fetched search page back in the search_parse queue (--reparse in pipelined runs)."""
+    with db["conn"]:
+        db["cur"].execute(
+            '''
+            UPDATE Urls
+            SET parse_status = NULL, parse_lease_owner = NULL, parse_lease_expires_at = NULL
+            WHERE status = 'fetched' AND parse_status IN ('parsed', 'parsing_failed')
+            '''
+        )
+    return db["cur"].rowcount
+
+def search_page_products(
+    specific_site_config,
+    parser_backend: str,
+    page_store,
+    url_id: int) -> tuple[list[dict] | None, tuple[str, str] | None]:
+    """
+    Products of one fetched search page: decoded from its captured JSON when
+    the adapter finds any there, else parsed from its HTML.
+    Returns (products, (namespace, name) of the page they came from),
+    or (None, None) if neither is in the page store.
+    """
+    json_extraction = getattr(specific_site_config, "json_product_extraction", None)
+    if json_extraction is not None:
+        source = (JSON_NAMESPACES["search"], json_page_name("search", url_id))
+        text = page_store.read(*source)
+        products_of_page = json_extraction(load_payloads(text)) if text else None
+        if products_of_page:
+            return products_of_page, source
+    source = ("search", f"page_{url_id}.html")
+    html = page_store.read(*source)
+    if html is None:
+        return None, None
+    soup = parse_html(html, parser_backend, only=specific_site_config.search_results_container)
+    return specific_site_config.product_extraction(soup), source
+
 
 ########################################################
 
@@ -27,51 +100,222 @@ def run_crawler_search_html_parser(
         paths_dict: dict, 
         specific_site_config, 
         logger: logging.Logger, 
-        error_logger: logging.Logger
+        error_logger: logging.Logger,
+        parser_backend: str = "bs4",
+        batch_pages: int = 1,
+        page_store = None,
+        reparse: bool = False,
+        metrics = None
     ):
+    """
+    Parses the search pages of the page store that are new or changed since
+    the last run (see utilities/parse_manifest.py), or every page with reparse.
+    """
 
-    list_of_html_files = list_of_html_files_compiler(paths_dict['data_dir'])
-    if not list_of_html_files:
-        logger.info("Failed to create list of html files in data dir")
-        return
-
-    #Main logic
-    for file in list_of_html_files:
-        try:
-            file = Path(file)
-            url_id = int(file.stem.split("_")[1])
-            file_path = paths_dict['data_dir'] / file
-
-            with open(file_path, "r", encoding="utf-8") as f:
+    page_store = page_store or FilePageStore(paths_dict)
+    version = parser_version(specific_site_config)
 
-                #2. Extract soup
-                soup = BeautifulSoup(f, 'html.parser')
+    # Products waiting to be written, the pages they came from and their manifest entries
+    pending_products: list[dict] = []
+    pending_url_ids: list[int] = []
+    pending_manifest: list[tuple[str, str, str, int]] = []
+    totals = {"pages": 0, "unchanged": 0, "inserted": 0, "ignored": 0}
 
-                #3. Extract product data from search results into a list of dict objects
-                products_of_page = specific_site_config.product_extraction(soup)
+    def flush_pending_products():
+        if not pending_url_ids and not pending_manifest:
+            return
+        started_at = time.monotonic()
+        try:
+            inserted, ignored = insert_product_urls(db, pending_products)
+            totals["inserted"] += inserted
+            totals["ignored"] += ignored
+            if pending_url_ids:
+                logger.info(
+                    f"Inserted {inserted} product URLs, ignored {ignored} already known, "
+                    f"for URL ids {pending_url_ids}")
+            update_search_parse_status(db, pending_url_ids, 'parsed')
+            record_parsed_pages(db, pending_manifest, version)
+            if metrics is not None:
+                metrics.observe("crawler_db_commit_seconds", time.monotonic() - started_at, stage="search_parser")
+        except Exception:
+            error_logger.error(f"Bulk insert failed for URL ids {pending_url_ids}", exc_info=True)
+        pending_products.clear()
+        pending_url_ids.clear()
+        pending_manifest.clear()
 
-                # DB Product insertion
-                total_number_of_products_in_page = len(products_of_page)
+    def queue_page(namespace: str, name: str, fingerprint: str, url_id: int, products_of_page: list[dict]):
+        totals["pages"] += 1
+        pending_products.extend(products_of_page)
+        pending_url_ids.append(url_id)
+        pending_manifest.append((namespace, name, fingerprint, len(products_of_page)))
+        if len(pending_url_ids) >= batch_pages:
+            flush_pending_products()
 
-                for idx, individual_product in enumerate(products_of_page, start=1):
+    #JSON path: pages with captured payloads the adapter can decode skip the HTML parse
+    pages_found = 0
+    json_url_ids = set()
+    json_extraction = getattr(specific_site_config, "json_product_extraction", None)
+    if json_extraction is not None:
+        namespace = JSON_NAMESPACES["search"]
+        fingerprints = page_store.fingerprints(namespace)
+        to_parse, unchanged = changed_pages(db, namespace, fingerprints, version, reparse)
+        pages_found += len(fingerprints)
+        totals["unchanged"] += len(unchanged)
+        json_url_ids.update(int(Path(name).stem.split("_")[1]) for name, products in unchanged.items() if products)
 
-                    if insert_product_url(db, individual_product, url_id):
-                        logger.info(
-                            f"Inserted product {idx} of {total_number_of_products_in_page} for URL {url_id}")
-                    else:
-                        logger.info(
-                            f"Failed to insert product {idx} of {total_number_of_products_in_page} for URL {url_id}")
-        except Exception:
-            error_logger.error(f"Unhandled exception for {file}", exc_info=True)
+        for file, text in page_store.iter_pages(namespace, names=to_parse):
+            started_at = time.monotonic()
+            try:
+                url_id = int(Path(file).stem.split("_")[1])
+                products_of_page = json_extraction(load_payloads(text))
+                if not products_of_page:
+                    # Recorded as empty, so the HTML of the page is parsed instead
+                    pending_manifest.append((namespace, file, fingerprints[file], 0))
+                    continue
+                logger.info(f"Extracted {len(products_of_page)} products from JSON for URL {url_id}")
+                json_url_ids.add(url_id)
+                if metrics is not None:
+                    metrics.record_parse("search_parser", "json", time.monotonic() - started_at)
+                queue_page(namespace, file, fingerprints[file], url_id, products_of_page)
+            except Exception:
+                error_logger.error(f"Unhandled exception for {file}", exc_info=True)
+                if metrics is not None:
+                    metrics.record_parse("search_parser", "json", 0.0, ok=False)
 
+    #Main logic: only new or changed pages are read
+    #Pages come back in storage order, so segmented stores are replayed sequentially
+    fingerprints = page_store.fingerprints("search")
+    to_parse, unchanged = changed_pages(db, "search", fingerprints, version, reparse)
+    pages_found += len(fingerprints)
+    totals["unchanged"] += len(unchanged)
+    to_parse = {name for name in to_parse if int(Path(name).stem.split("_")[1]) not in json_url_ids}
 
+    for file, html in page_store.iter_pages("search", names=to_parse):
+        started_at = time.monotonic()
+        try:
+            fingerprint = fingerprints[file]
+            file = Path(file)
+            url_id = int(file.stem.split("_")[1])
+            #1. Page read by the page store
+            if html is None:
+                error_logger.error(f"Missing HTML for {file}")
+                continue
 
+            #2. Extract soup
+            soup = parse_html(
+                html,
+                parser_backend,
+                only=specific_site_config.search_results_container
+            )
 
+            #3. Extract product data from search results into a list of dict objects
+            products_of_page = specific_site_config.product_extraction(soup)
 
+            # Queue products for the next bulk DB insertion
+            logger.info(f"Extracted {len(products_of_page)} products for URL {url_id}")
+            if metrics is not None:
+                metrics.record_parse("search_parser", "html", time.monotonic() - started_at)
+            queue_page("search", file.name, fingerprint, url_id, products_of_page)
 
+        except Exception:
+            error_logger.error(f"Unhandled exception for {file}", exc_info=True)
+            if metrics is not None:
+                metrics.record_parse("search_parser", "html", 0.0, ok=False)
 
+    flush_pending_products()
+    if not pages_found:
+        logger.info("No search pages found in page store")
+        return
+    logger.info(
+        f"Crawler_search_html_parser finished: {totals['pages']} pages parsed, "
+        f"{totals['unchanged']} unchanged pages skipped, {totals['inserted']} product URLs inserted, "
+        f"{totals['ignored']} ignored")
 
+def run_crawler_search_html_parser_queue(
+        db: dict,
+        paths_dict: dict,
+        specific_site_config,
+        logger: logging.Logger,
+        error_logger: logging.Logger,
+        parser_backend: str = "bs4",
+        batch_pages: int = 1,
+        page_store = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        metrics = None,
+        stop_event = None
+    ):
+    """
+    Queue-driven search parser: claims fetched, unparsed search pages
+    (search_parse queue) batch_pages at a time and reads each one by id, so
+    pages are parsed as soon as they land instead of by a full page store
+    replay. Used by the pipelined run mode.
+    """
+    page_store = page_store or FilePageStore(paths_dict)
+    version = parser_version(specific_site_config)
+    worker_id = make_worker_id("search_parser")
+    totals = {"pages": 0, "inserted": 0, "ignored": 0, "failed": 0}
 
+    with LeaseHeartbeat(db["path"], "search_parse", lease_seconds) as heartbeat:
+        while True:
+            #Stop requested by the pipeline: leave between jobs
+            if stop_event is not None and stop_event.is_set():
+                logger.info("Crawler_search_html_parser: stop requested, leaving")
+                break
+            rows = claim_jobs(db, "search_parse", worker_id, batch_size=batch_pages, lease_seconds=lease_seconds)
+            if not rows:
+                break
+            url_ids = [url_id for url_id, _ in rows]
+            heartbeat.hold(worker_id, url_ids)
 
+            products: list[dict] = []
+            parsed_ids: list[int] = []
+            failed_ids: list[int] = []
+            manifest_entries: list[tuple[str, str, str, int]] = []
+            try:
+                for url_id, url in rows:
+                    started_at = time.monotonic()
+                    try:
+                        products_of_page, source = search_page_products(specific_site_config, parser_backend, page_store, url_id)
+                    except Exception:
+                        error_logger.error(f"Unhandled exception for URL {url_id}", exc_info=True)
+                        products_of_page = None
+                    else:
+                        if products_of_page is None:
+                            error_logger.error(f"Missing page for URL {url_id} ({url})")
+                    if products_of_page is None:
+                        failed_ids.append(url_id)
+                        if metrics is not None:
+                            metrics.record_parse("search_parser", "html", 0.0, ok=False)
+                        continue
+                    if metrics is not None:
+                        source_kind = "json" if source[0] == JSON_NAMESPACES["search"] else "html"
+                        metrics.record_parse("search_parser", source_kind, time.monotonic() - started_at)
+                    logger.info(f"Extracted {len(products_of_page)} products for URL {url_id}")
+                    products.extend(products_of_page)
+                    parsed_ids.append(url_id)
+                    # Recorded in the manifest too, so a sequential run skips the page
+                    namespace, name = source
+                    fingerprint = page_store.fingerprints(namespace, [name]).get(name)
+                    if fingerprint is not None:
+                        manifest_entries.append((namespace, name, fingerprint, len(products_of_page)))
 
+                # Rows of a failed insert keep their lease and are retried once it expires
+                started_at = time.monotonic()
+                inserted, ignored = insert_product_urls(db, products)
+                update_search_parse_status(db, parsed_ids, 'parsed')
+                update_search_parse_status(db, failed_ids, 'parsing_failed')
+                record_parsed_pages(db, manifest_entries, version)
+                if metrics is not None:
+                    metrics.observe("crawler_db_commit_seconds", time.monotonic() - started_at, stage="search_parser")
+                totals["pages"] += len(parsed_ids)
+                totals["inserted"] += inserted
+                totals["ignored"] += ignored
+                totals["failed"] += len(failed_ids)
+            except Exception:
+                error_logger.error(f"Bulk insert failed for URL ids {url_ids}", exc_info=True)
+            finally:
+                heartbeat.release(worker_id, url_ids)
 
+    logger.info(
+        f"Crawler_search_html_parser finished: {totals['pages']} pages parsed, {totals['failed']} failed, "
+        f"{totals['inserted']} product URLs inserted, {totals['ignored']} ignored")
\ No newline at end of file
@@ -1,21 +1,26 @@
+import time
 import random
+import asyncio
 
-from playwright.sync_api import sync_playwright
-from utilities.stealth import stealth_context
-from utilities.utils import countdown_sleep_timer, process_single_url, write_html
+from utilities.stealth import stealth_context, async_stealth_context
+from utilities.browser_session import stage_browser, async_stage_browser
+from utilities.utils import countdown_sleep_timer, process_single_url, process_single_url_structured, new_fetch_stats, timed_phase, scaled_delay
+from utilities.page_store import FilePageStore
+from utilities.scheduler import HostScheduler
+from utilities.job_queue import DEFAULT_LEASE_SECONDS, LeaseHeartbeat, claim_jobs, make_worker_id
+from utilities import async_utils
+from utilities.response_capture import json_page_name
+from crawler.crawler_search_html_parser import insert_product_urls, update_search_parse_status
 
-def get_pending_url_and_update (db, status="in_progress"):
+def get_pending_url_and_update (db, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
     """
-    Retrieves URLs and their IDs marked as pending, and stamps them as in progress.
+    Atomically claims the next pending URL (or one whose lease expired) for
+    worker_id, stamping it as in progress under a lease.
     """
-    db["cur"].execute('SELECT id, url_name FROM Urls WHERE status=? ORDER BY id LIMIT 1', ("pending",))
-    row = db["cur"].fetchone()
-    if row is None:
+    rows = claim_jobs(db, "search_fetch", worker_id, batch_size=1, lease_seconds=lease_seconds)
+    if not rows:
         return None, None
-    url_id = row[0]
-    url = row[1]
-    db["cur"].execute('UPDATE Urls SET status=? WHERE id=?', (status, url_id))
-    db["conn"].commit()
+    url_id, url = rows[0]
     return url_id, url
 
 def update_filename_for_url(url, db, filename):
@@ -29,11 +34,34 @@ def update_filename_for_url(url, db, filename):
 def update_url_status(url, db: dict, status: str):
     """Sets the crawling status of an URL: pending / fetched / failed."""
     db["cur"].execute(
-        'UPDATE Urls SET status = ? WHERE url_name = ?',
+        'UPDATE Urls SET status = ?, lease_owner = NULL, lease_expires_at = NULL WHERE url_name = ?',
         (status, url)
     )
     db["conn"].commit()
 
+def store_extracted_products(db: dict, extraction: dict, rows: list[dict], url_id: int, logger):
+    """Writes products extracted in the browser straight to ProductPages."""
+    products = extraction["site"].products_from_extractor(rows)
+    inserted, ignored = insert_product_urls(db, products)
+    update_search_parse_status(db, [url_id], 'parsed')
+    logger.info(
+        f"Extracted {len(products)} products in the browser for URL {url_id}: "
+        f"{inserted} inserted, {ignored} already known")
+
+def save_search_page(db: dict, page_store, url: str, url_id: int, html: str | None, payloads: list | None, response_capture):
+    """
+    Writes a fetched search page: its captured JSON payloads, and its HTML
+    unless there is none (extraction without archiving) or the capture is
+    configured to replace it.
+    """
+    if payloads:
+        response_capture.store(page_store, "search", json_page_name("search", url_id), payloads, url=url, row_id=url_id)
+    if html and (not payloads or response_capture.keep_html):
+        filename = f"page_{url_id}.html"
+        page_store.write("search", filename, html, url=url, row_id=url_id)
+        update_filename_for_url(url, db, filename)
+    update_url_status(url, db, status='fetched')
+
 #########################################################
 
 def run_crawler_search_scraper(
@@ -42,75 +70,316 @@ def run_crawler_search_scraper(
     logger,
     error_logger,
     paths_dict,
-    page_counter = 1):
-
-    #Reset jobs
-    def reset_stuck_fetch_jobs(db):
-        db["cur"].execute(
-            '''
-            UPDATE Urls
-            SET status = 'pending'
-            WHERE status = 'in_progress'
-            '''
-        )
-        db["conn"].commit()
-        
-    reset_stuck_fetch_jobs(db)
+    page_counter = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    page_store = None,
+    resource_blocker = None,
+    asset_cache = None,
+    throttle = None,
+    readiness = None,
+    scroll_settings = None,
+    browser_session = None,
+    session_states = None,
+    http_fetcher = None,
+    extraction = None,
+    response_capture = None,
+    metrics = None,
+    stop_event = None):
+
+    # Leases replace the old blind reset of in_progress rows: only expired
+    # claims are taken back, so concurrent processes keep their work
+    worker_id = make_worker_id("search_scraper")
+    page_store = page_store or FilePageStore(paths_dict)
 
     #Main logic
-    with sync_playwright() as p:
+    with stage_browser(browser_session) as browser, \
+            LeaseHeartbeat(db["path"], "search_fetch", lease_seconds) as heartbeat:
 
-        browser = p.chromium.launch(
-        headless=False
-        )
-        context = stealth_context(browser)
-        page = context.new_page()
+        #Saved session (cookies + localStorage) for this site, when enabled
+        session = session_states.checkout() if session_states is not None else None
+        context = stealth_context(browser, resource_blocker, asset_cache, session=session)
+        try:
+            page = context.new_page()
 
-        #Main crawling loop
-        while True:
+            #Main crawling loop
+            while True:
 
-            try:
-                #Query the db, get one url, starting from the top, and mark them as in_progress
-                url_id, url = get_pending_url_and_update(db, status='in_progress')
-                logger.info(f'Retrieved {url} from DB')
-                if url is None:
-                    logger.info("Crawler_search_scraper program. URL not found. Exiting program")
+                #Stop requested by the pipeline: leave between jobs
+                if stop_event is not None and stop_event.is_set():
+                    logger.info("Crawler_search_scraper: stop requested, leaving")
                     break
+                url_id = None
+                try:
+                    #Query the db, claim one url, starting from the top, under a lease
+                    url_id, url = get_pending_url_and_update(db, worker_id, lease_seconds)
+                    logger.info(f'Retrieved {url} from DB')
+                    if url is None:
+                        logger.info("Crawler_search_scraper program. URL not found. Exiting program")
+                        break
+                    heartbeat.hold(worker_id, [url_id])
             
-                #Occasional long pause to simulate browsing
-                if (page_counter % 5 == 0) and (page_counter != 0):
-                    special_wait_time = random.uniform(50, 90)
-                    countdown_sleep_timer(special_wait_time)
-
-                #Process a single URL
-                html = process_single_url(
-                    page, 
-                    url, 
-                    logger,
-                    wait_selector="li.ui-search-layout__item"
-                )
+                    #Occasional long pause to simulate browsing (the throttle stretches its own delay instead)
+                    if throttle is None and (page_counter % 5 == 0) and (page_counter != 0):
+                        special_wait_time = scaled_delay(random.uniform(50, 90))
+                        countdown_sleep_timer(special_wait_time)
+
+                    #Process a single URL, over plain HTTP first when the site allows it
+                    #In extraction mode "browser", products are read in the page itself
+                    fetch_stats = new_fetch_stats()
+                    html = None
+                    products = None
+                    payloads = None
+                    if http_fetcher is not None:
+                        with timed_phase(fetch_stats, "http_fetch"):
+                            html = http_fetcher.fetch_page(url, "search", stats=fetch_stats)
+                    #A block status over HTTP skips the browser: the throttle backs off instead
+                    if html is None and not fetch_stats["blocked"]:
+                        #JSON responses and embedded state captured while the page loads
+                        capture = response_capture.attach(page) if response_capture is not None else None
+                        if extraction is not None:
+                            products, html = process_single_url_structured(
+                                page,
+                                url,
+                                logger,
+                                wait_selector=specific_site_config.selector_to_start_process,
+                                extractor_js=extraction["search_js"],
+                                keep_html=extraction["archive_html"],
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings
+                            )
+                        else:
+                            html = process_single_url(
+                                page, 
+                                url, 
+                                logger,
+                                wait_selector=specific_site_config.selector_to_start_process,
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings
+                            )
+                        if capture is not None:
+                            with timed_phase(fetch_stats, "capture"):
+                                payloads = response_capture.collect(capture)
+                    fetched = bool(html) or products is not None
+                    if throttle is not None:
+                        throttle.record(url, fetch_stats)
+                    if session is not None and fetch_stats["transport"] == "browser":
+                        session_states.record(session, fetch_stats, ok=fetched)
+                
+                    #CHECK INFINITE LOOP POSSIBILITIES HERE
+                    if not fetched:
+                        error_logger.error(f"No HTML found for {url}")
+                        update_url_status(url, db, status='failed')
+                        if throttle is not None:
+                            with timed_phase(fetch_stats, "delay"):
+                                countdown_sleep_timer(throttle.delay_for(url))
+                        if metrics is not None:
+                            metrics.record_fetch(db, "search_scraper", url, url_id, fetch_stats, ok=False)
+                        continue
+
+                    #Products extracted in the browser skip the search parser
+                    if products is not None:
+                        store_extracted_products(db, extraction, products, url_id, logger)
                 
-                #CHECK INFINITE LOOP POSSIBILITIES HERE
-                if not html:
+                    #Write captured JSON and the HTML to the page store
+                    with timed_phase(fetch_stats, "write"):
+                        save_search_page(db, page_store, url, url_id, html, payloads, response_capture)
+
+                    #Increase page counter
+                    page_counter += 1
+
+                    #Normal safe delay, adaptive when a throttle is configured
+                    if throttle is not None:
+                        wait_time = throttle.delay_for(url, page_counter)
+                    else:
+                        wait_time = scaled_delay(random.uniform(30, 55))
+                    with timed_phase(fetch_stats, "delay"):
+                        countdown_sleep_timer(wait_time)
+                    if metrics is not None:
+                        metrics.record_fetch(db, "search_scraper", url, url_id, fetch_stats, ok=True)
+
+                except KeyboardInterrupt:
+                    logger.info("Program interrupted with KeyboardInterrupt")
+                    raise
+
+                finally:
+                    if url_id is not None:
+                        heartbeat.release(worker_id, [url_id])
+        finally:
+            if session is not None:
+                session_states.save(session, context)
+                session_states.log_summary(logger, "Crawler_search_scraper")
+            context.close()
+        if http_fetcher is not None:
+            http_fetcher.log_summary(logger, "Crawler_search_scraper")
+        if response_capture is not None:
+            response_capture.log_summary(logger, "Crawler_search_scraper")
+        if resource_blocker is not None:
+            resource_blocker.log_summary(logger, "Crawler_search_scraper")
+        if asset_cache is not None:
+            asset_cache.log_summary(logger, "Crawler_search_scraper")
+
+#########################################################
+
+async def run_crawler_search_scraper_async(
+    db,
+    specific_site_config,
+    logger,
+    error_logger,
+    paths_dict,
+    concurrency: int = 4,
+    per_host_min_interval: float = 30.0,
+    per_host_max_in_flight: int = 1,
+    per_host_jitter: float = 25.0,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    page_store = None,
+    resource_blocker = None,
+    asset_cache = None,
+    throttle = None,
+    readiness = None,
+    scroll_settings = None,
+    browser_session = None,
+    session_states = None,
+    http_fetcher = None,
+    extraction = None,
+    response_capture = None,
+    metrics = None,
+    stop_event = None):
+    """
+    Asyncio mode of the search scraper.
+    Runs `concurrency` pages at once; the HostScheduler spaces and caps
+    requests per host, so throughput grows with the number of hosts.
+    With an AdaptiveThrottle, per-host spacing and in-flight limits follow
+    observed latency and block signals instead of the fixed per_host_* values.
+    """
+    page_store = page_store or FilePageStore(paths_dict)
+    scheduler = throttle or HostScheduler(
+        min_interval=per_host_min_interval,
+        max_in_flight=per_host_max_in_flight,
+        jitter=per_host_jitter
+    )
+
+    #Single page worker
+    async def worker(worker_number: int, page, heartbeat: LeaseHeartbeat):
+        worker_id = make_worker_id(f"search_scraper_{worker_number}")
+        fetched_pages = 0
+        while True:
+            #Stop requested by the pipeline: leave between jobs
+            if stop_event is not None and stop_event.is_set():
+                logger.info(f"Search worker {worker_number}: stop requested, leaving")
+                break
+            url_id = None
+            url = None
+            try:
+                url_id, url = get_pending_url_and_update(db, worker_id, lease_seconds)
+                if url is None:
+                    logger.info(f"Search worker {worker_number}: no pending URLs left")
+                    break
+                heartbeat.hold(worker_id, [url_id])
+                logger.info(f"Search worker {worker_number} retrieved {url} from DB")
+
+                fetch_stats = new_fetch_stats()
+                async with scheduler.slot(url):
+                    #Time waited for the host's slot
+                    fetch_stats["phases"]["delay"] = time.monotonic() - fetch_stats["started_at"]
+                    html = None
+                    products = None
+                    payloads = None
+                    if http_fetcher is not None:
+                        with timed_phase(fetch_stats, "http_fetch"):
+                            html = await http_fetcher.async_fetch_page(url, "search", stats=fetch_stats)
+                    #A block status over HTTP skips the browser: the throttle backs off instead
+                    if html is None and not fetch_stats["blocked"]:
+                        capture = response_capture.attach(page) if response_capture is not None else None
+                        if extraction is not None:
+                            products, html = await async_utils.process_single_url_structured(
+                                page,
+                                url,
+                                logger,
+                                wait_selector=specific_site_config.selector_to_start_process,
+                                extractor_js=extraction["search_js"],
+                                keep_html=extraction["archive_html"],
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings
+                            )
+                        else:
+                            html = await async_utils.process_single_url(
+                                page,
+                                url,
+                                logger,
+                                wait_selector=specific_site_config.selector_to_start_process,
+                                stats=fetch_stats,
+                                readiness=readiness,
+                                scroll_settings=scroll_settings
+                            )
+                        if capture is not None:
+                            with timed_phase(fetch_stats, "capture"):
+                                payloads = await response_capture.async_collect(capture)
+                fetched = bool(html) or products is not None
+                if throttle is not None:
+                    throttle.record(url, fetch_stats)
+                if session is not None and fetch_stats["transport"] == "browser":
+                    session_states.record(session, fetch_stats, ok=fetched)
+
+                if not fetched:
                     error_logger.error(f"No HTML found for {url}")
                     update_url_status(url, db, status='failed')
+                    if metrics is not None:
+                        metrics.record_fetch(db, "search_scraper", url, url_id, fetch_stats, ok=False)
                     continue
-                
-                #Write HTML to disk
-                filename = f"page_{url_id}.html"
-                write_html(paths_dict['data_dir'], filename, html)
-                update_filename_for_url(url, db, filename)
-                update_url_status(url, db, status='fetched')
 
-                #Increase page counter
-                page_counter += 1
+                #Products extracted in the browser skip the search parser
+                if products is not None:
+                    store_extracted_products(db, extraction, products, url_id, logger)
 
-                #Normal safe delay
-                wait_time = random.uniform(30, 55)
-                countdown_sleep_timer(wait_time)
+                #Write captured JSON and the HTML to the page store
+                with timed_phase(fetch_stats, "write"):
+                    save_search_page(db, page_store, url, url_id, html, payloads, response_capture)
+                fetched_pages += 1
+                if metrics is not None:
+                    metrics.record_fetch(db, "search_scraper", url, url_id, fetch_stats, ok=True)
 
-            except KeyboardInterrupt:
-                logger.info("Program interrupted with KeyboardInterrupt")
+            except asyncio.CancelledError:
+                if url is not None:
+                    update_url_status(url, db, status='pending')
                 raise
 
+            except Exception:
+                error_logger.error(f"Unhandled error in search worker {worker_number} for {url}", exc_info=True)
+                if url is not None:
+                    update_url_status(url, db, status='failed')
+
+            finally:
+                if url_id is not None:
+                    heartbeat.release(worker_id, [url_id])
+
+        return fetched_pages
 
+    #Main logic
+    async with async_stage_browser(browser_session) as browser:
+        session = session_states.checkout() if session_states is not None else None
+        try:
+            context = await async_stealth_context(browser, resource_blocker, asset_cache, session=session)
+            pages = [await context.new_page() for _ in range(concurrency)]
+
+            with LeaseHeartbeat(db["path"], "search_fetch", lease_seconds) as heartbeat:
+                results = await asyncio.gather(
+                    *(worker(i, page, heartbeat) for i, page in enumerate(pages, start=1))
+                )
+            logger.info(f"Crawler_search_scraper async run finished. Fetched {sum(results)} pages")
+            if session is not None:
+                await session_states.async_save(session, context)
+                session_states.log_summary(logger, "Crawler_search_scraper")
+            if throttle is not None:
+                logger.info(f"Throttle state: {throttle.snapshot()}")
+        finally:
+            if http_fetcher is not None:
+                http_fetcher.log_summary(logger, "Crawler_search_scraper")
+            if response_capture is not None:
+                response_capture.log_summary(logger, "Crawler_search_scraper")
+            if resource_blocker is not None:
+                resource_blocker.log_summary(logger, "Crawler_search_scraper")
+            if asset_cache is not None:
+                asset_cache.log_summary(logger, "Crawler_search_scraper")
@@ -15,7 +15,8 @@ def resolve_pagination(
     specific_site_config, 
     seed_url: str, 
     site_name: str, 
-    error_logger: logging.Logger) -> str | None:
+    error_logger: logging.Logger,
+    browser_session = None) -> str | None:
     
     canonical_url = None
 
@@ -25,7 +26,9 @@ def resolve_pagination(
     # If pagination is read from config as dynamic:
     if pagination_mode == "dynamic":
         try:
-            canonical_url = specific_site_config.discover_first_paginated_url(seed_url)
+            # Shared session browser, launched only when discovery needs it
+            browser = browser_session.browser() if browser_session is not None else None
+            canonical_url = specific_site_config.discover_first_paginated_url(seed_url, browser=browser)
         except Exception as e:
             error_logger.error(
                 f"[{site_name}] Dynamic pagination discovery failed for seed URL: {seed_url}",
@@ -34,8 +37,8 @@ def resolve_pagination(
             raise RuntimeError(
                 f"[{site_name}] Cannot determine canonical pagination base. Aborting."
             ) from e
-    ##If it is read as static:
-    elif pagination_mode == "static":
+    ##If it is read as static, or built from the seed URL alone (algorithmic):
+    elif pagination_mode in ("static", "algorithmic"):
         canonical_url = seed_url
 
     return canonical_url
@@ -89,14 +92,16 @@ def run_crawler_seed(
     logger: logging.Logger,
     error_logger: logging.Logger,
     pages_to_crawl: int,
-    db: dict
+    db: dict,
+    browser_session = None
     ):
 
     canonical_url = resolve_pagination(
     specific_site_config, 
     seed_url, 
     site_name, 
-    error_logger
+    error_logger,
+    browser_session=browser_session
     )
 
     list_of_urls = alrogithmic_paginator(
@@ -1,11 +1,27 @@
 # main.py
+import sys
 import json
+import time
+import argparse
 
 from crawler.crawler_seed import run_crawler_seed
-from crawler.crawler_search_scraper import run_crawler_search_scraper
-from crawler.crawler_search_html_parser import run_crawler_search_html_parser
-from crawler.crawler_product_scraper import run_crawler_product_scraper
-from crawler.crawler_product_html_parser import run_crawler_product_html_parser
+from crawler.crawler_search_scraper import (
+    run_crawler_search_scraper,
+    run_crawler_search_scraper_async
+)
+from crawler.crawler_search_html_parser import (
+    run_crawler_search_html_parser,
+    run_crawler_search_html_parser_queue,
+    requeue_search_pages
+)
+from crawler.crawler_product_scraper import (
+    run_crawler_product_scraper,
+    run_crawler_product_scraper_pool
+)
+from crawler.crawler_product_html_parser import (
+    run_crawler_product_html_parser,
+    run_crawler_product_html_parser_parallel
+)
 
 from utilities.utils import (
     setup_loggers,
@@ -14,13 +30,36 @@ from utilities.utils import (
 )
 from utilities.specific_sites import (
     site_registry, 
-    specific_site_setup
+    specific_site_setup,
+    resolve_extraction
 )
 from utilities.database import db_initialization
+from utilities.html_backend import resolve_parser_backend
+from utilities.page_store import open_page_store, close_segment_maps
+from utilities.resource_blocking import build_resource_blocker
+from utilities.asset_cache import open_asset_cache
+from utilities.throttle import build_throttle
+from utilities.readiness import build_readiness
+from utilities.stealth import resolve_scroll_profile
+from utilities.browser_session import BrowserSession, run_async_stage
+from utilities.session_state import open_session_state_store
+from utilities.http_fetch import build_http_fetcher
+from utilities.response_capture import build_response_capture
+from utilities.pipeline import PipelineStage, run_pipeline
+from utilities.metrics import build_metrics
 
 # Entry point
 if __name__ == "__main__":
 
+    # Command line options
+    arg_parser = argparse.ArgumentParser(description="E-commerce crawler")
+    arg_parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="parse every saved search page again, ignoring the parse manifest"
+    )
+    args = arg_parser.parse_args()
+
     #Run flags
     STAGES = {
         "seed": True,
@@ -43,6 +82,26 @@ if __name__ == "__main__":
         db_path = config.get("database_path", "mini.sqlite")
         site_name = config["site"]
         pages_to_crawl = config["pages_to_crawl"]
+        search_scraper_config = config.get("search_scraper", {})
+        search_parser_config = config.get("search_parser", {})
+        product_scraper_config = config.get("product_scraper", {})
+        product_parser_config = config.get("product_parser", {})
+        sqlite_performance_profile = config.get("sqlite_performance_profile", True)
+        lease_seconds = config.get("job_queue", {}).get("lease_seconds", 600)
+        parser_backend = resolve_parser_backend(config.get("html_parser_backend", "auto"))
+        page_store_config = config.get("page_store", {})
+        resource_blocking_config = config.get("resource_blocking", {})
+        asset_cache_config = config.get("asset_cache", {})
+        throttle_config = config.get("throttle", {})
+        readiness_config = config.get("readiness", {})
+        scroll_config = config.get("scroll", {})
+        browser_config = config.get("browser", {})
+        session_state_config = config.get("session_state", {})
+        http_fetch_config = config.get("http_fetch", {})
+        extraction_config = config.get("extraction", {})
+        response_capture_config = config.get("response_capture", {})
+        pipeline_config = config.get("pipeline", {})
+        metrics_config = config.get("metrics", {})
 
     # Initialize logging
     logger, error_logger = setup_loggers()
@@ -51,13 +110,62 @@ if __name__ == "__main__":
     SITE_REGISTRY = site_registry()
     specific_site_config, seed_url = specific_site_setup(SITE_REGISTRY, site_name)
 
+    # Heavy resource blocking for the scrapers' browser contexts
+    resource_blocker = build_resource_blocker(specific_site_config, resource_blocking_config)
+
+    # Adaptive rate limiting shared by the scrapers
+    throttle = build_throttle(throttle_config)
+
+    # Event-driven page readiness instead of fixed post-scroll sleeps
+    readiness = build_readiness(readiness_config)
+
+    # In-page scroll profile
+    scroll_settings = resolve_scroll_profile(scroll_config)
+
+    # In-browser structured extraction (mode "browser") instead of HTML + parsers
+    extraction = resolve_extraction(specific_site_config, extraction_config)
+
+    # Plain HTTP first for sites whose pages are server-rendered
+    http_fetcher = build_http_fetcher(specific_site_config, http_fetch_config, parser_backend)
+
+    # JSON responses and embedded state captured during browser loads
+    response_capture = build_response_capture(specific_site_config, response_capture_config)
+
+    # Stage and per-URL timings, exported in the Prometheus text format
+    metrics = build_metrics(paths_dict, site_name, metrics_config)
+
+    # Pipelined run mode: stages overlap instead of running one after another
+    pipelined = pipeline_config.get("enabled", False)
+
+    # One browser shared by every stage (and by later runs in server mode)
+    browser_session = BrowserSession(
+        paths_dict,
+        headless=browser_config.get("headless", False),
+        server=browser_config.get("server")
+    )
+
+    # Set when the run ends on an error, so it exits with a failure status
+    run_failed = False
+
     # DB variables setup
     db = None
+    page_store = None
+    asset_cache = None
+    session_states = None
     db_path = paths_dict['data_dir'] / db_path
 
     try:
         # DB init
-        db = db_initialization(db_path)
+        db = db_initialization(db_path, performance_profile=sqlite_performance_profile)
+
+        # Page store shared by scrapers (writes) and parsers (reads)
+        page_store = open_page_store(db, paths_dict, page_store_config)
+
+        # Static asset cache shared by every browser session
+        asset_cache = open_asset_cache(paths_dict, asset_cache_config)
+
+        # Saved cookies/localStorage per site and fingerprint, reused across stages and runs
+        session_states = open_session_state_store(db, paths_dict, site_name, session_state_config)
 
         # Run Crawler_seed
         if STAGES['seed']:
@@ -70,56 +178,269 @@ if __name__ == "__main__":
             logger,
             error_logger,
             pages_to_crawl,
-            db
+            db,
+            browser_session=browser_session
         )
 
-        # Run Crawler_search_scraper
-        if STAGES["search_scraper"]:
+        # Stage runners. resources holds what may not cross threads: the DB
+        # connection, the page store, the browser session and the session states
+        def search_scraper_stage(resources: dict):
             logger.info("Started crawler_search_scraper")
-            run_crawler_search_scraper(
-                db, 
-                specific_site_config,
-                logger,
-                error_logger,
-                paths_dict
-            )
-            
-        # Run Crawler_search_html_parser
-        if STAGES["search_parser"]:
+            if search_scraper_config.get("mode", "sync") == "async":
+                run_async_stage(run_crawler_search_scraper_async(
+                    resources["db"],
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    paths_dict,
+                    concurrency=search_scraper_config.get("concurrency", 4),
+                    per_host_min_interval=search_scraper_config.get("per_host_min_interval", 30),
+                    per_host_max_in_flight=search_scraper_config.get("per_host_max_in_flight", 1),
+                    per_host_jitter=search_scraper_config.get("per_host_jitter", 25),
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    resource_blocker=resource_blocker,
+                    asset_cache=asset_cache,
+                    throttle=throttle,
+                    readiness=readiness,
+                    scroll_settings=scroll_settings,
+                    browser_session=resources["browser_session"],
+                    session_states=resources["session_states"],
+                    http_fetcher=http_fetcher,
+                    extraction=extraction,
+                    response_capture=response_capture,
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                ))
+            else:
+                run_crawler_search_scraper(
+                    resources["db"],
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    paths_dict,
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    resource_blocker=resource_blocker,
+                    asset_cache=asset_cache,
+                    throttle=throttle,
+                    readiness=readiness,
+                    scroll_settings=scroll_settings,
+                    browser_session=resources["browser_session"],
+                    session_states=resources["session_states"],
+                    http_fetcher=http_fetcher,
+                    extraction=extraction,
+                    response_capture=response_capture,
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                )
+
+        def search_parser_stage(resources: dict):
             logger.info("Started crawler_search_html_parser")
-            run_crawler_search_html_parser(
-                db, 
-                paths_dict, 
-                specific_site_config, 
-                logger, 
-                error_logger,
-            )
-        
-        # Run Crawler_product_scraper
-        if STAGES["product_scraper"]:
+            # Pipelined runs parse pages by id as they land; sequential runs replay the page store
+            if pipelined:
+                run_crawler_search_html_parser_queue(
+                    resources["db"],
+                    paths_dict,
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    parser_backend=parser_backend,
+                    batch_pages=search_parser_config.get("batch_pages", 1),
+                    page_store=resources["page_store"],
+                    lease_seconds=lease_seconds,
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                )
+            else:
+                # Only new or changed pages, unless --reparse
+                run_crawler_search_html_parser(
+                    resources["db"],
+                    paths_dict,
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    parser_backend=parser_backend,
+                    batch_pages=search_parser_config.get("batch_pages", 1),
+                    page_store=resources["page_store"],
+                    reparse=args.reparse,
+                    metrics=metrics
+                )
+
+        def product_scraper_stage(resources: dict):
             logger.info("Started crawler_product_scraper")
-            run_crawler_product_scraper(
-                db,
-                paths_dict, 
-                logger,
-                error_logger
-            )
+            if product_scraper_config.get("workers", 1) > 1:
+                run_async_stage(run_crawler_product_scraper_pool(
+                    resources["db"],
+                    paths_dict,
+                    logger,
+                    error_logger,
+                    workers=product_scraper_config["workers"],
+                    report_every=product_scraper_config.get("report_every", 10),
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    resource_blocker=resource_blocker,
+                    asset_cache=asset_cache,
+                    throttle=throttle,
+                    readiness=readiness,
+                    scroll_settings=scroll_settings,
+                    browser_session=resources["browser_session"],
+                    session_states=resources["session_states"],
+                    http_fetcher=http_fetcher,
+                    extraction=extraction,
+                    response_capture=response_capture,
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                ))
+            else:
+                run_crawler_product_scraper(
+                    resources["db"],
+                    paths_dict,
+                    logger,
+                    error_logger,
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    resource_blocker=resource_blocker,
+                    asset_cache=asset_cache,
+                    throttle=throttle,
+                    readiness=readiness,
+                    scroll_settings=scroll_settings,
+                    browser_session=resources["browser_session"],
+                    session_states=resources["session_states"],
+                    http_fetcher=http_fetcher,
+                    extraction=extraction,
+                    response_capture=response_capture,
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                )
 
-        # Run Crawler_product_html_parser
-        if STAGES["product_parser"]:
+        def product_parser_stage(resources: dict):
             logger.info("Started crawler_product_html_parser")
-            run_crawler_product_html_parser(
-                db, 
-                paths_dict, 
-                specific_site_config, 
-                logger, 
-                error_logger
+            if product_parser_config.get("mode", "serial") == "parallel":
+                run_crawler_product_html_parser_parallel(
+                    resources["db"],
+                    paths_dict,
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    workers=product_parser_config.get("workers"),
+                    batch_size=product_parser_config.get("batch_size", 200),
+                    parser_backend=parser_backend,
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                )
+            else:
+                run_crawler_product_html_parser(
+                    resources["db"],
+                    paths_dict,
+                    specific_site_config,
+                    logger,
+                    error_logger,
+                    parser_backend=parser_backend,
+                    lease_seconds=lease_seconds,
+                    page_store=resources["page_store"],
+                    metrics=metrics,
+                    stop_event=resources.get("stop_event")
+                )
+
+        # Stage name, runner and the job queue it consumes, in pipeline order
+        stage_runners = [
+            ("search_scraper", search_scraper_stage, "search_fetch"),
+            ("search_parser", search_parser_stage, "search_parse"),
+            ("product_scraper", product_scraper_stage, "product_fetch"),
+            ("product_parser", product_parser_stage, "product_parse"),
+        ]
+
+        def timed_stage(name: str, runner):
+            # Adds each run (or pipeline drain) of the stage to its wall time and refreshes the export
+            def run(resources: dict):
+                started_at = time.monotonic()
+                try:
+                    runner(resources)
+                finally:
+                    metrics.inc("crawler_stage_seconds_total", time.monotonic() - started_at, stage=name)
+                    metrics.export()
+            return run
+
+        if metrics is not None:
+            stage_runners = [(name, timed_stage(name, runner), queue_name) for name, runner, queue_name in stage_runners]
+
+        if pipelined:
+            # Every stage runs at once as a consumer of its queue, fed by the previous enabled stage
+            def open_stage_resources(stage_name: str) -> dict:
+                stage_db = db_initialization(db_path, performance_profile=sqlite_performance_profile)
+                return {
+                    "db": stage_db,
+                    "page_store": open_page_store(stage_db, paths_dict, page_store_config),
+                    "browser_session": BrowserSession(
+                        paths_dict,
+                        headless=browser_config.get("headless", False),
+                        server=browser_config.get("server")
+                    ) if stage_name.endswith("_scraper") else None,
+                    "session_states": open_session_state_store(stage_db, paths_dict, site_name, session_state_config),
+                }
+
+            def close_stage_resources(resources: dict):
+                if resources["browser_session"] is not None:
+                    resources["browser_session"].close()
+                resources["page_store"].close()
+                resources["db"]["cur"].close()
+                resources["db"]["conn"].close()
+
+            pipeline_stages = []
+            for name, runner, queue_name in stage_runners:
+                if not STAGES[name]:
+                    continue
+                upstream = pipeline_stages[-1].name if pipeline_stages else None
+                pipeline_stages.append(PipelineStage(name, runner, queue_name, upstream=upstream))
+
+            if args.reparse and STAGES["search_parser"]:
+                logger.info(f"Requeued {requeue_search_pages(db)} search pages for parsing (--reparse)")
+
+            logger.info(f"Started pipelined run: {', '.join(stage.name for stage in pipeline_stages)}")
+            run_pipeline(
+                pipeline_stages,
+                open_stage_resources,
+                close_stage_resources,
+                logger,
+                poll_interval=pipeline_config.get("poll_interval", 2.0)
             )
+        else:
+            shared_resources = {
+                "db": db,
+                "page_store": page_store,
+                "browser_session": browser_session,
+                "session_states": session_states,
+            }
+            for name, runner, _ in stage_runners:
+                if STAGES[name]:
+                    runner(shared_resources)
+
+        if metrics is not None:
+            for name, _, _ in stage_runners:
+                if STAGES[name]:
+                    metrics.log_summary(logger, name)
     
     except Exception:
+        run_failed = True
         error_logger.error("The following error ocurred when running main module: ", exc_info=True)
             
     finally:
+        if metrics is not None:
+            metrics.export()
+        browser_session.close()
+        if http_fetcher is not None:
+            http_fetcher.close()
+        if page_store is not None:
+            page_store.close()
+        close_segment_maps()
+        if asset_cache is not None:
+            asset_cache.close()
         if db:
             db["cur"].close()
-            db["conn"].close()
\ No newline at end of file
+            db["conn"].close()
+
+    if run_failed:
+        sys.exit(1)
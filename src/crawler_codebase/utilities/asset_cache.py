@@ -0,0 +1,292 @@
+import re
+import time
+import json
+import logging
+import sqlite3
+import hashlib
+import threading
+
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+from playwright.sync_api import BrowserContext, Route
+from playwright.async_api import BrowserContext as AsyncBrowserContext
+from playwright.async_api import Route as AsyncRoute
+
+# Static assets worth keeping across sessions. Documents are never cached,
+# so the HTML written to the page store always comes from the site.
+DEFAULT_CACHED_RESOURCE_TYPES = ["script", "stylesheet", "font", "image"]
+
+# Response headers that describe the transfer, not the asset
+HOP_BY_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+def _freshness_seconds(headers: dict, now: float) -> float:
+    """
+    Freshness lifetime from Cache-Control max-age or Expires, else the usual
+    10% of the time since Last-Modified. 0 means revalidate before reuse.
+    """
+    cache_control = headers.get("cache-control", "").lower()
+    match = re.search(r"(?:s-maxage|max-age)=(\d+)", cache_control)
+    if match:
+        return float(match.group(1))
+    try:
+        if "expires" in headers:
+            return max(0.0, parsedate_to_datetime(headers["expires"]).timestamp() - now)
+        if "last-modified" in headers:
+            return max(0.0, (now - parsedate_to_datetime(headers["last-modified"]).timestamp()) * 0.1)
+    except (TypeError, ValueError):
+        pass
+    return 0.0
+
+def _is_storable(status: int, headers: dict) -> bool:
+    cache_control = headers.get("cache-control", "").lower()
+    if status != 200 or "no-store" in cache_control or "private" in cache_control:
+        return False
+    return "vary" not in headers or headers["vary"].strip().lower() in ("accept-encoding", "origin")
+
+class AssetCache:
+    """
+    Persistent on-disk cache for static assets, served through context.route.
+    Entries are keyed by URL with their ETag/Last-Modified validators; stale
+    entries are revalidated with a conditional request. Total size is bounded
+    by max_bytes with least-recently-used eviction.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        resource_types: list[str] | None = None):
+
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.resource_types = set(DEFAULT_CACHED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.cache_dir / "index.sqlite", check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS Assets (
+                url TEXT PRIMARY KEY,
+                object TEXT NOT NULL,
+                status INTEGER,
+                headers TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL,
+                size INTEGER,
+                last_used REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_assets_last_used ON Assets (last_used);
+        ''')
+        self.conn.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.bytes_served = 0
+
+    def close(self):
+        self.conn.close()
+
+    # ---------------------------
+    # Storage
+    # ---------------------------
+
+    def _object_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.objects_dir / digest[:2] / digest
+
+    def lookup(self, url: str) -> dict | None:
+        """Returns the cached entry of url with its body, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT object, status, headers, etag, last_modified, expires_at FROM Assets WHERE url = ?',
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        object_name, status, headers, etag, last_modified, expires_at = row
+        try:
+            body = (self.objects_dir / object_name).read_bytes()
+        except FileNotFoundError:
+            return None
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires_at": expires_at,
+            "body": body,
+        }
+
+    def store(self, url: str, status: int, headers: dict, body: bytes):
+        """Saves a response and evicts least recently used entries if over budget."""
+        now = time.time()
+        headers = {name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+        object_path = self._object_path(url)
+        object_path.parent.mkdir(exist_ok=True)
+        object_path.write_bytes(body)
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                '''
+                INSERT OR REPLACE INTO Assets
+                    (url, object, status, headers, etag, last_modified, expires_at, size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (url, str(object_path.relative_to(self.objects_dir)), status, json.dumps(headers),
+                 headers.get("etag"), headers.get("last-modified"),
+                 now + _freshness_seconds(headers, now), len(body), now)
+            )
+            self._evict()
+
+    def touch(self, url: str, headers: dict | None = None):
+        """Marks an entry as used; with revalidation headers, also extends its freshness."""
+        now = time.time()
+        with self._lock, self.conn:
+            if headers is None:
+                self.conn.execute('UPDATE Assets SET last_used = ? WHERE url = ?', (now, url))
+            else:
+                self.conn.execute(
+                    'UPDATE Assets SET last_used = ?, expires_at = ? WHERE url = ?',
+                    (now, now + _freshness_seconds(headers, now), url)
+                )
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits max_bytes."""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM Assets').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, object_name, size in self.conn.execute(
+                'SELECT url, object, size FROM Assets ORDER BY last_used').fetchall():
+            (self.objects_dir / object_name).unlink(missing_ok=True)
+            self.conn.execute('DELETE FROM Assets WHERE url = ?', (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ---------------------------
+    # Route handlers
+    # ---------------------------
+
+    def _cacheable_request(self, request) -> bool:
+        return request.method == "GET" and request.resource_type in self.resource_types
+
+    @staticmethod
+    def _conditional_headers(request, entry: dict) -> dict:
+        headers = dict(request.headers)
+        if entry["etag"]:
+            headers["if-none-match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["if-modified-since"] = entry["last_modified"]
+        return headers
+
+    def _serve(self, entry: dict) -> dict:
+        self.bytes_served += len(entry["body"])
+        return {"status": entry["status"], "headers": entry["headers"], "body": entry["body"]}
+
+    def _handle(self, route: Route):
+        request = route.request
+        if not self._cacheable_request(request):
+            route.fallback()
+            return
+        try:
+            url = request.url
+            entry = self.lookup(url)
+
+            if entry is not None and entry["expires_at"] > time.time():
+                self.hits += 1
+                self.touch(url)
+                route.fulfill(**self._serve(entry))
+                return
+
+            if entry is not None and (entry["etag"] or entry["last_modified"]):
+                response = route.fetch(headers=self._conditional_headers(request, entry))
+                if response.status == 304:
+                    self.revalidated += 1
+                    self.touch(url, response.headers)
+                    route.fulfill(**self._serve(entry))
+                    return
+            else:
+                response = route.fetch()
+
+            self.misses += 1
+            body = response.body()
+            if _is_storable(response.status, response.headers):
+                self.store(url, response.status, response.headers, body)
+            route.fulfill(response=response, body=body)
+        except Exception:
+            # Never break the page load because of the cache
+            self.bypassed += 1
+            route.fallback()
+
+    async def _async_handle(self, route: AsyncRoute):
+        request = route.request
+        if not self._cacheable_request(request):
+            await route.fallback()
+            return
+        try:
+            url = request.url
+            entry = self.lookup(url)
+
+            if entry is not None and entry["expires_at"] > time.time():
+                self.hits += 1
+                self.touch(url)
+                await route.fulfill(**self._serve(entry))
+                return
+
+            if entry is not None and (entry["etag"] or entry["last_modified"]):
+                response = await route.fetch(headers=self._conditional_headers(request, entry))
+                if response.status == 304:
+                    self.revalidated += 1
+                    self.touch(url, response.headers)
+                    await route.fulfill(**self._serve(entry))
+                    return
+            else:
+                response = await route.fetch()
+
+            self.misses += 1
+            body = await response.body()
+            if _is_storable(response.status, response.headers):
+                self.store(url, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+        except Exception:
+            self.bypassed += 1
+            await route.fallback()
+
+    def install(self, context: BrowserContext):
+        """Serves cacheable requests of a sync context from the cache."""
+        context.route("**/*", self._handle)
+
+    async def async_install(self, context: AsyncBrowserContext):
+        """Async API counterpart of install."""
+        await context.route("**/*", self._async_handle)
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs and resets the counters of one stage run."""
+        lookups = self.hits + self.revalidated + self.misses
+        hit_rate = (self.hits + self.revalidated) / lookups * 100 if lookups else 0.0
+        logger.info(
+            f"{stage}: asset cache {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.misses} misses ({hit_rate:.0f}% hit rate), "
+            f"{self.bytes_served / 1_048_576:.1f} MB served locally, {self.bypassed} bypassed")
+        self.reset_stats()
+
+def open_asset_cache(paths_dict: dict, cache_config: dict | None = None) -> AssetCache | None:
+    """
+    Builds the asset cache from the "asset_cache" config section.
+    Returns None when the cache is disabled.
+    """
+    cache_config = cache_config or {}
+    if not cache_config.get("enabled", True):
+        return None
+    return AssetCache(
+        paths_dict["data_dir"] / "asset_cache",
+        max_bytes=int(cache_config.get("max_mb", 512) * 1024 * 1024),
+        resource_types=cache_config.get("resource_types"),
+    )
@@ -0,0 +1,199 @@
+import time
+import asyncio
+import logging
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Page
+from utilities.stealth import async_in_page_scroll
+from utilities.utils import (
+    setup_loggers, new_fetch_stats, record_readiness, timed_phase, BLOCK_SIGNAL_SELECTORS,
+    note_response, note_loaded, note_timeout, note_block_signal, retry_delay, settle_delay,
+    log_scroll, scroll_needed)
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+async def block_signal_detected(page: Page) -> bool:
+    """Async API counterpart of utils.block_signal_detected."""
+    try:
+        for selector in BLOCK_SIGNAL_SELECTORS:
+            if await page.query_selector(selector):
+                return True
+        return False
+    except Exception:
+        return False
+
+async def load_page(page: Page, url: str, wait_selector: str, max_attempts: int=2, stats: dict | None = None) -> bool:
+    """
+    Async API counterpart of utils.load_page.
+    Returns True if the page is ready for processing.
+    """
+    stats = stats if stats is not None else new_fetch_stats()
+    #Navigation block
+    success = False
+    for attempt in range(1, max_attempts + 3):
+        stats["attempts"] = attempt
+        try:
+            #1st try
+            if attempt == 1:
+                started_at = time.monotonic()
+                with timed_phase(stats, "navigation"):
+                    response = await page.goto(url, timeout=30000)
+            #2nd (or n) retries
+            else:
+                with timed_phase(stats, "retry_sleep"):
+                    await asyncio.sleep(retry_delay())
+                started_at = time.monotonic()
+                with timed_phase(stats, "navigation"):
+                    response = await page.reload(timeout=30000)
+            if note_response(stats, response, url):
+                break
+            #Page loaded, wait for selector
+            with timed_phase(stats, "selector_wait"):
+                await page.wait_for_selector(wait_selector, timeout=8000)
+            note_loaded(stats, started_at, url, attempt)
+            success = True
+            break
+        except PlaywrightTimeoutError:
+            note_timeout(stats, url, attempt)
+            if await block_signal_detected(page):
+                note_block_signal(stats, url)
+                break
+            continue
+        except Exception:
+            error_logger.error(f"Navigation failure on {url} on attempt {attempt}", exc_info=True)
+            continue
+    #Final check
+    return success
+
+async def perform_scroll(page: Page, url: str, item_selector: str | None = None, scroll_settings: dict | None = None) -> dict | None:
+    """
+    Scrolls the page to trigger JS loading, in a single in-page call.
+    Returns the scroll stats, or None if scrolling fails or times out.
+    """
+    try:
+        logger.info(f"Scrolling for {url}")
+        scroll_stats = await async_in_page_scroll(page, item_selector, scroll_settings)
+        log_scroll(url, scroll_stats)
+        return scroll_stats
+    except PlaywrightTimeoutError:
+        error_logger.warning(f"Scroll timeout on {url}")
+        return None
+    except Exception:
+        error_logger.error(
+            f"Unexpected scroll error on {url}",
+            exc_info=True
+        )
+        return None
+
+async def extract_html(page: Page, url: str) -> str | None:
+    """
+    Returns page HTML or None if extraction fails.
+    """
+    #Fetch HTML
+    logger.info(f"Fetching HTML for: {url}")
+    try:
+        html = await page.content()
+        logger.info(f"Fetched HTML content for {url}")
+        return html
+    except Exception:
+        error_logger.error(
+            f"HTML fetching error for {url}",
+            exc_info=True)
+        return None
+
+async def extract_structured(page: Page, url: str, extractor_js: str):
+    """Async API counterpart of utils.extract_structured."""
+    try:
+        data = await page.evaluate(extractor_js)
+        logger.info(f"Extracted structured data in the browser for {url}")
+        return data
+    except Exception:
+        error_logger.error(
+            f"In-browser extraction error for {url}",
+            exc_info=True)
+        return None
+
+async def prepare_page(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        stats: dict,
+        readiness = None,
+        scroll_settings: dict | None = None) -> bool:
+    """Async API counterpart of utils.prepare_page."""
+    #Navigation phase
+    if not await load_page(page, url, wait_selector, max_attempts=2, stats=stats):
+        return False
+    logger.info(f"Target JavaScript selector detected in URL: {url}")
+
+    if readiness is None:
+        #Scrolling phase
+        with timed_phase(stats, "scroll"):
+            stats["scroll"] = await perform_scroll(page, url, wait_selector, scroll_settings)
+        if not stats["scroll"]:
+            return False
+
+        #Extra delay to let JS finish loading
+        with timed_phase(stats, "settle_sleep"):
+            await asyncio.sleep(settle_delay())
+    else:
+        #Readiness phase: scroll only when the containers are still changing
+        ready_started_at = time.monotonic()
+        with timed_phase(stats, "readiness"):
+            result = await readiness.async_wait(page, wait_selector)
+        if scroll_needed(readiness, result):
+            with timed_phase(stats, "scroll"):
+                stats["scroll"] = await perform_scroll(page, url, wait_selector, scroll_settings)
+            if not stats["scroll"]:
+                return False
+            with timed_phase(stats, "readiness"):
+                result = await readiness.async_wait(page, wait_selector)
+            if not result["ready"]:
+                #Fallback to the fixed delay
+                with timed_phase(stats, "settle_sleep"):
+                    await asyncio.sleep(settle_delay())
+        record_readiness(stats, result, ready_started_at, url)
+
+    return True
+
+async def process_single_url(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        stats: dict | None = None,
+        readiness = None,
+        scroll_settings: dict | None = None) -> str | None:
+    """Async API counterpart of utils.process_single_url."""
+    stats = stats if stats is not None else new_fetch_stats()
+    if not await prepare_page(page, url, logger, wait_selector, stats, readiness, scroll_settings):
+        return None
+
+    #HTML extraction phase
+    with timed_phase(stats, "content"):
+        return await extract_html(page, url)
+
+async def process_single_url_structured(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        extractor_js: str,
+        keep_html: bool = True,
+        stats: dict | None = None,
+        readiness = None,
+        scroll_settings: dict | None = None) -> tuple:
+    """Async API counterpart of utils.process_single_url_structured."""
+    stats = stats if stats is not None else new_fetch_stats()
+    if not await prepare_page(page, url, logger, wait_selector, stats, readiness, scroll_settings):
+        return None, None
+
+    #Structured extraction phase
+    with timed_phase(stats, "content"):
+        data = await extract_structured(page, url, extractor_js)
+        html = await extract_html(page, url) if keep_html and data is not None else None
+    if data is None:
+        return None, None
+    return data, html
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import threading
+import subprocess
+import urllib.request
+
+from pathlib import Path
+from contextlib import contextmanager, asynccontextmanager
+from playwright.sync_api import sync_playwright, Browser
+from playwright.async_api import async_playwright, Browser as AsyncBrowser
+from utilities.utils import setup_loggers
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+DEFAULT_SERVER_PORT = 9222
+
+def _cdp_ready(cdp_url: str) -> bool:
+    """True if a browser answers on the DevTools endpoint."""
+    try:
+        with urllib.request.urlopen(f"{cdp_url}/json/version", timeout=2) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+def start_browser_server(
+    executable_path: str,
+    state_file: Path,
+    user_data_dir: Path,
+    port: int = DEFAULT_SERVER_PORT,
+    headless: bool = False,
+    startup_timeout: float = 20.0) -> str:
+    """
+    Starts a detached Chromium with remote debugging enabled, so later runs
+    (and asyncio stages) can connect to it over CDP. Returns the CDP URL.
+    """
+    cdp_url = f"http://127.0.0.1:{port}"
+    if _cdp_ready(cdp_url):
+        return cdp_url
+
+    args = [
+        executable_path,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+    ]
+    if headless:
+        args.append("--headless=new")
+    args.append("about:blank")
+
+    process = subprocess.Popen(
+        args,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+    deadline = time.monotonic() + startup_timeout
+    while not _cdp_ready(cdp_url):
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            raise RuntimeError(f"Browser server did not start on {cdp_url}")
+        time.sleep(0.25)
+
+    state_file.write_text(json.dumps({"pid": process.pid, "cdp_url": cdp_url}))
+    logger.info(f"Started browser server (pid {process.pid}) on {cdp_url}")
+    return cdp_url
+
+def stop_browser_server(state_file: Path) -> bool:
+    """Stops the browser server recorded in state_file. Returns False if none was running."""
+    if not state_file.exists():
+        return False
+    state = json.loads(state_file.read_text())
+    state_file.unlink()
+    try:
+        os.kill(state["pid"], signal.SIGTERM)
+    except ProcessLookupError:
+        return False
+    logger.info(f"Stopped browser server (pid {state['pid']})")
+    return True
+
+class BrowserSession:
+    """
+    One long-lived browser shared by every stage of a run.
+    - Local mode: the first sync stage launches Chromium and later sync
+      stages reuse it; it is closed by close().
+    - Server mode: stages connect over CDP to a persistent Chromium started
+      by start_browser_server (autostarted if needed), which outlives the run,
+      so later runs skip the launch too.
+    asyncio stages cannot use the sync browser; in server mode they connect
+    to the same server, in local mode they launch their own browser.
+    """
+
+    def __init__(
+        self,
+        paths_dict: dict,
+        headless: bool = False,
+        server: dict | None = None):
+
+        server = server or {}
+        self.headless = headless
+        self.server_enabled = server.get("enabled", False)
+        self.server_port = server.get("port", DEFAULT_SERVER_PORT)
+        self.server_autostart = server.get("autostart", True)
+        self.cdp_url = server.get("cdp_url") or f"http://127.0.0.1:{self.server_port}"
+        self.state_file = paths_dict["data_dir"] / "browser_server.json"
+        self.user_data_dir = paths_dict["data_dir"] / "browser_profile"
+        self._playwright = None
+        self._browser: Browser | None = None
+
+    def _ensure_server(self, executable_path: str):
+        if _cdp_ready(self.cdp_url):
+            return
+        if not self.server_autostart:
+            raise RuntimeError(f"No browser server on {self.cdp_url}")
+        self.cdp_url = start_browser_server(
+            executable_path,
+            self.state_file,
+            self.user_data_dir,
+            port=self.server_port,
+            headless=self.headless
+        )
+
+    def browser(self) -> Browser:
+        """Returns the shared sync browser, launching or connecting on first use."""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        chromium = self._playwright.chromium
+        started_at = time.monotonic()
+        if self.server_enabled:
+            self._ensure_server(chromium.executable_path)
+            self._browser = chromium.connect_over_cdp(self.cdp_url)
+        else:
+            self._browser = chromium.launch(headless=self.headless)
+        logger.info(
+            f"Browser session ready in {time.monotonic() - started_at:.2f}s "
+            f"({'server ' + self.cdp_url if self.server_enabled else 'local'}, headless={self.headless})")
+        return self._browser
+
+    @asynccontextmanager
+    async def async_browser(self):
+        """Browser for asyncio stages: the server in server mode, else a local launch."""
+        async with async_playwright() as p:
+            if self.server_enabled:
+                self._ensure_server(p.chromium.executable_path)
+                browser = await p.chromium.connect_over_cdp(self.cdp_url)
+            else:
+                browser = await p.chromium.launch(headless=self.headless)
+            try:
+                yield browser
+            finally:
+                # On a CDP connection this only disconnects; the server keeps running
+                await browser.close()
+
+    def close(self):
+        """Closes (or disconnects from) the shared browser. A server keeps running."""
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                error_logger.error("Error closing browser session", exc_info=True)
+            self._browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+@contextmanager
+def stage_browser(browser_session: BrowserSession | None = None):
+    """
+    Browser for a sync stage: the shared session browser when given
+    (left open for later stages), else a headful browser of its own.
+    """
+    if browser_session is not None:
+        yield browser_session.browser()
+        return
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=False)
+        try:
+            yield browser
+        finally:
+            browser.close()
+
+@asynccontextmanager
+async def async_stage_browser(browser_session: BrowserSession | None = None):
+    """Async API counterpart of stage_browser."""
+    if browser_session is not None:
+        async with browser_session.async_browser() as browser:
+            yield browser
+        return
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+def run_async_stage(coroutine):
+    """
+    Runs an asyncio stage in its own thread. A started sync Playwright owns
+    the main thread's event loop, so asyncio.run() cannot be called there
+    while the shared sync browser is alive.
+    """
+    outcome = {}
+
+    def runner():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=runner, name="async-stage")
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+def browser_server_cli(argv: list[str] | None = None):
+    """python -m utilities.browser_session {start,stop,status}"""
+    from utilities.utils import setup_directories_pathlib
+
+    parser = argparse.ArgumentParser(description="Persistent browser server for the crawler")
+    parser.add_argument("command", choices=["start", "stop", "status"])
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args(argv)
+
+    paths_dict = setup_directories_pathlib()
+    state_file = paths_dict["data_dir"] / "browser_server.json"
+    cdp_url = f"http://127.0.0.1:{args.port}"
+
+    if args.command == "start":
+        with sync_playwright() as p:
+            executable_path = p.chromium.executable_path
+        print(start_browser_server(
+            executable_path,
+            state_file,
+            paths_dict["data_dir"] / "browser_profile",
+            port=args.port,
+            headless=args.headless
+        ))
+    elif args.command == "stop":
+        print("stopped" if stop_browser_server(state_file) else "not running")
+    else:
+        print(f"running on {cdp_url}" if _cdp_ready(cdp_url) else "not running")
+
+if __name__ == "__main__":
+    browser_server_cli(sys.argv[1:])
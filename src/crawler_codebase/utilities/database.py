@@ -1,15 +1,251 @@
 import sqlite3
 
-def db_initialization(path: str) -> dict:
+# Connection pragmas of the tuned profile
+PERFORMANCE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Never edit an applied migration: append a new one instead.
+SCHEMA_MIGRATIONS = [
+    # 1. Covering partial indexes for the job queue claims and stuck-job resets.
+    #    Status columns are included so the claim queries never touch the table.
+    '''
+    CREATE INDEX IF NOT EXISTS idx_urls_pending
+        ON Urls (id, url_name, status)
+        WHERE status = 'pending';
+    CREATE INDEX IF NOT EXISTS idx_urls_in_progress
+        ON Urls (status)
+        WHERE status = 'in_progress';
+
+    CREATE INDEX IF NOT EXISTS idx_productpages_fetch_pending
+        ON ProductPages (id, product_url, product_name, fetch_status)
+        WHERE fetch_status = 'pending';
+    CREATE INDEX IF NOT EXISTS idx_productpages_fetching
+        ON ProductPages (fetch_status)
+        WHERE fetch_status = 'fetching';
+
+    CREATE INDEX IF NOT EXISTS idx_productpages_parse_ready
+        ON ProductPages (id, product_url, product_name, filename, fetch_status, parse_status)
+        WHERE fetch_status = 'fetched' AND parse_status IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_productpages_parsing
+        ON ProductPages (parse_status)
+        WHERE parse_status = 'parsing';
+    ''',
+
+    # 2. Job queue leases (see utilities/job_queue.py)
+    '''
+    ALTER TABLE Urls ADD COLUMN lease_owner TEXT;
+    ALTER TABLE Urls ADD COLUMN lease_expires_at REAL;
+    ALTER TABLE ProductPages ADD COLUMN fetch_lease_owner TEXT;
+    ALTER TABLE ProductPages ADD COLUMN fetch_lease_expires_at REAL;
+    ALTER TABLE ProductPages ADD COLUMN parse_lease_owner TEXT;
+    ALTER TABLE ProductPages ADD COLUMN parse_lease_expires_at REAL;
+
+    DROP INDEX IF EXISTS idx_urls_in_progress;
+    DROP INDEX IF EXISTS idx_productpages_fetching;
+    DROP INDEX IF EXISTS idx_productpages_parsing;
+
+    CREATE INDEX IF NOT EXISTS idx_urls_leased
+        ON Urls (status, lease_expires_at)
+        WHERE status = 'in_progress';
+    CREATE INDEX IF NOT EXISTS idx_productpages_fetch_leased
+        ON ProductPages (fetch_status, fetch_lease_expires_at)
+        WHERE fetch_status = 'fetching';
+    CREATE INDEX IF NOT EXISTS idx_productpages_parse_leased
+        ON ProductPages (parse_status, parse_lease_expires_at)
+        WHERE parse_status = 'parsing';
+    ''',
+
+    # 3. Content-addressed page store index (see utilities/page_store.py)
+    '''
+    CREATE TABLE IF NOT EXISTS PageObjects (
+        namespace TEXT NOT NULL,
+        name TEXT NOT NULL,
+        digest TEXT NOT NULL,
+        codec TEXT NOT NULL,
+        size INTEGER,
+        stored_size INTEGER,
+        stored_at TEXT,
+        PRIMARY KEY (namespace, name)
+    );
+    CREATE INDEX IF NOT EXISTS idx_pageobjects_digest
+        ON PageObjects (digest);
+    ''',
+
+    # 4. Segmented page archive offset index (see utilities/page_store.py)
+    '''
+    CREATE TABLE IF NOT EXISTS PageSegments (
+        namespace TEXT NOT NULL,
+        name TEXT NOT NULL,
+        row_id INTEGER,
+        url TEXT,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        codec TEXT NOT NULL,
+        size INTEGER,
+        status TEXT,
+        fetched_at TEXT,
+        PRIMARY KEY (namespace, name)
+    );
+    CREATE INDEX IF NOT EXISTS idx_pagesegments_replay
+        ON PageSegments (namespace, segment, offset);
+    CREATE INDEX IF NOT EXISTS idx_pagesegments_row
+        ON PageSegments (namespace, row_id);
+    ''',
+
+    # 5. Saved browser sessions per site and fingerprint (see utilities/session_state.py)
+    '''
+    CREATE TABLE IF NOT EXISTS SessionStates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        site TEXT NOT NULL,
+        fingerprint_id TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        state_path TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        saved_at REAL,
+        last_used_at REAL,
+        uses INTEGER NOT NULL DEFAULT 0,
+        pages INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        latency_total REAL NOT NULL DEFAULT 0,
+        retired_at REAL,
+        retired_reason TEXT,
+        UNIQUE (site, fingerprint_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessionstates_active
+        ON SessionStates (site, last_used_at)
+        WHERE retired_at IS NULL;
+    ''',
+
+    # 6. Search page parse queue, so search pages can be parsed as they land
+    '''
+    ALTER TABLE Urls ADD COLUMN parse_status TEXT;
+    ALTER TABLE Urls ADD COLUMN parse_lease_owner TEXT;
+    ALTER TABLE Urls ADD COLUMN parse_lease_expires_at REAL;
+
+    CREATE INDEX IF NOT EXISTS idx_urls_parse_ready
+        ON Urls (id, url_name, status, parse_status)
+        WHERE status = 'fetched' AND parse_status IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_urls_parse_leased
+        ON Urls (parse_status, parse_lease_expires_at)
+        WHERE parse_status = 'parsing';
+    ''',
+
+    # 7. Parse manifest: pages already parsed, by fingerprint and parser version (see utilities/parse_manifest.py)
+    '''
+    CREATE TABLE IF NOT EXISTS ParseManifest (
+        namespace TEXT NOT NULL,
+        name TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        parser_version TEXT NOT NULL,
+        products INTEGER NOT NULL,
+        parsed_at TEXT NOT NULL,
+        PRIMARY KEY (namespace, name)
+    );
+    ''',
+
+    # 8. Per-URL fetch timings, one column per phase in seconds (see utilities/metrics.py)
+    '''
+    CREATE TABLE IF NOT EXISTS UrlMetrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stage TEXT NOT NULL,
+        site TEXT NOT NULL,
+        row_id INTEGER,
+        url TEXT NOT NULL,
+        transport TEXT,
+        status INTEGER,
+        outcome TEXT NOT NULL,
+        attempts INTEGER,
+        http_fetch REAL,
+        navigation REAL,
+        selector_wait REAL,
+        retry_sleep REAL,
+        scroll REAL,
+        readiness REAL,
+        settle_sleep REAL,
+        content REAL,
+        capture REAL,
+        write REAL,
+        delay REAL,
+        total REAL NOT NULL,
+        recorded_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_urlmetrics_stage
+        ON UrlMetrics (stage, recorded_at);
+    ''',
+
+    # 9. Session claims, so scrapers in other threads or processes never share a checked out session
+    '''
+    ALTER TABLE SessionStates ADD COLUMN lease_owner TEXT;
+    ALTER TABLE SessionStates ADD COLUMN leased_at REAL;
+    ''',
+]
+
+def apply_performance_pragmas(conn: sqlite3.Connection):
+    """Switches the connection to WAL mode and applies the tuned pragmas."""
+    for pragma in PERFORMANCE_PRAGMAS:
+        conn.execute(pragma)
+
+def migration_statements(migration: str) -> list[str]:
+    """Splits a migration script into its complete SQL statements."""
+    statements = []
+    pending = ""
+    for line in migration.splitlines(keepends=True):
+        pending += line
+        if sqlite3.complete_statement(pending):
+            statements.append(pending.strip())
+            pending = ""
+    if pending.strip():
+        raise ValueError(f"Incomplete statement in migration: {pending.strip()}")
+    return statements
+
+def migrate_database(db: dict) -> int:
+    """
+    Applies pending SCHEMA_MIGRATIONS to an existing or new database.
+    Each migration and its user_version bump run in one transaction
+    (executescript would commit statement by statement), so a crash never
+    leaves part of a migration applied under the old version.
+    Returns the resulting schema version.
+    """
+    version = db["cur"].execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(SCHEMA_MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        db["conn"].commit()
+        db["cur"].execute("BEGIN")
+        try:
+            for statement in migration_statements(migration):
+                db["cur"].execute(statement)
+            # PRAGMA does not accept bound parameters
+            db["cur"].execute(f"PRAGMA user_version = {number}")
+            db["cur"].execute("COMMIT")
+        except BaseException:
+            db["cur"].execute("ROLLBACK")
+            raise
+        version = number
+
+    return version
+
+def db_initialization(path: str, performance_profile: bool = True) -> dict:
 
     """Initializes DB connection, cursor, and sets up the corresponding tables."""
 
     conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    if performance_profile:
+        apply_performance_pragmas(conn)
     cur = conn.cursor()
         
     db = {
         "conn": conn,
         "cur": cur,
+        "path": str(path),
     }
     
     # Create tables if not exist
@@ -45,6 +281,9 @@ def db_initialization(path: str) -> dict:
 
     db["conn"].commit()
 
+    # Bring indexes (and later schema changes) up to date
+    migrate_database(db)
+
     return db
 
 def insert_url(url: str, db: dict, date: str):
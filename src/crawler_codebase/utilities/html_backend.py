@@ -0,0 +1,114 @@
+from typing import Any, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from utilities.utils import setup_loggers
+
+# Optional fast parsers
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SelectolaxParser = None
+        SELECTOLAX_AVAILABLE = False
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+# Fastest first
+BACKEND_PREFERENCE = ["selectolax", "lxml", "bs4"]
+
+def available_parser_backends() -> list[str]:
+    """
+    Returns the parser backends that can run in this environment, fastest first.
+    """
+    available = {
+        "selectolax": SELECTOLAX_AVAILABLE,
+        "lxml": LXML_AVAILABLE,
+        "bs4": True,
+    }
+    return [name for name in BACKEND_PREFERENCE if available[name]]
+
+def resolve_parser_backend(preferred: str = "auto") -> str:
+    """
+    Resolves a configured backend name to one that is installed.
+    "auto" picks the fastest available one; unavailable names fall back to bs4.
+    """
+    available = available_parser_backends()
+    if preferred == "auto":
+        return available[0]
+    if preferred not in BACKEND_PREFERENCE:
+        raise ValueError(f"Unsupported HTML parser backend: {preferred}")
+    if preferred not in available:
+        logger.info(f"HTML parser backend {preferred} not installed. Falling back to bs4")
+        return "bs4"
+    return preferred
+
+def _css_selector(name: Optional[str], class_: Optional[str], attrs: Optional[dict]) -> str:
+    """Translates BeautifulSoup find() arguments into a CSS selector."""
+    selector = name or "*"
+    if class_:
+        # BeautifulSoup matches a multi-class string against the whole attribute
+        if " " in class_:
+            selector += f'[class="{class_}"]'
+        else:
+            selector += f".{class_}"
+    for key, value in (attrs or {}).items():
+        selector += f'[{key}="{value}"]'
+    return selector
+
+class SelectolaxNode:
+    """
+    Wraps a selectolax node with the subset of the BeautifulSoup Tag API
+    used by the site adapters: find, find_all, get and get_text.
+    """
+
+    def __init__(self, node: Any):
+        self._node = node
+
+    def find(self, name: Optional[str] = None, class_: Optional[str] = None, attrs: Optional[dict] = None):
+        node = self._node.css_first(_css_selector(name, class_, attrs))
+        return SelectolaxNode(node) if node is not None else None
+
+    def find_all(self, name: Optional[str] = None, class_: Optional[str] = None, attrs: Optional[dict] = None):
+        return [SelectolaxNode(node) for node in self._node.css(_css_selector(name, class_, attrs))]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._node.attributes.get(key)
+        return default if value is None else value
+
+    def get_text(self, strip: bool = False) -> str:
+        return self._node.text(deep=True, separator="", strip=strip)
+
+def parse_html(markup, backend: str = "bs4", only: Optional[tuple] = None):
+    """
+    Builds a document tree that the site adapters can query.
+    markup may be a string or an open file object.
+    only is an adapter container declaration (tag name(s), attrs): BeautifulSoup
+    backends then build just those subtrees. selectolax always builds the full
+    tree, since its C parser is cheaper than any filtering done in Python.
+    """
+    if backend == "selectolax":
+        if hasattr(markup, "read"):
+            markup = markup.read()
+        return SelectolaxNode(SelectolaxParser(markup).root)
+
+    parse_only = SoupStrainer(only[0], attrs=only[1] or {}) if only else None
+    if backend == "lxml":
+        return BeautifulSoup(markup, "lxml", parse_only=parse_only)
+    return BeautifulSoup(markup, "html.parser", parse_only=parse_only)
+
+def has_selector(markup: str, selector: str, backend: str = "bs4") -> bool:
+    """True if the CSS selector matches anything in markup."""
+    if backend == "selectolax":
+        return SelectolaxParser(markup).css_first(selector) is not None
+    features = "lxml" if backend == "lxml" else "html.parser"
+    return BeautifulSoup(markup, features).select_one(selector) is not None
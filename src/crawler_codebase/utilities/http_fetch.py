@@ -0,0 +1,277 @@
+import gzip
+import time
+import zlib
+import asyncio
+import logging
+import threading
+import http.client
+
+from urllib.parse import urljoin, urlsplit
+from utilities.stealth import random_fingerprint
+from utilities.html_backend import has_selector, resolve_parser_backend
+from utilities.utils import setup_loggers, BLOCK_STATUSES
+
+# Optional HTTP/2 client
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = HTTPX_AVAILABLE
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+MAX_REDIRECTS = 5
+
+class _ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections per host on the standard library, used
+    when httpx is not installed. Thread-safe: a connection is only handed to
+    one request at a time and goes back to the idle list afterwards.
+    """
+
+    def __init__(self, timeout: float, max_idle_per_host: int = 4):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, scheme: str, host: str):
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, timeout=self.timeout)
+
+    def _acquire(self, scheme: str, host: str):
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop()
+        return self._connect(scheme, host)
+
+    def _release(self, scheme: str, host: str, connection):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _request_once(self, url: str, headers: dict) -> tuple[int, dict, bytes]:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        connection = self._acquire(parts.scheme, parts.netloc)
+        try:
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle connection: retry once on a new one
+                connection.close()
+                connection = self._connect(parts.scheme, parts.netloc)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            body = response.read()
+        except BaseException:
+            # A failed retry or read leaves the socket in an unknown state: never pool it
+            connection.close()
+            raise
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(parts.scheme, parts.netloc, connection)
+        return response.status, response_headers, body
+
+    def get(self, url: str, headers: dict) -> tuple[int, str, str]:
+        """GET following redirects. Returns (status, final url, decoded body)."""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, body = self._request_once(url, headers)
+            if status in (301, 302, 303, 307, 308) and "location" in response_headers:
+                url = urljoin(url, response_headers["location"])
+                continue
+            break
+
+        encoding = response_headers.get("content-encoding", "")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        charset = "utf-8"
+        content_type = response_headers.get("content-type", "")
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+        return status, url, body.decode(charset, errors="replace")
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle.clear()
+
+class HttpFetcher:
+    """
+    Browserless fetch for pages whose HTML already holds the data.
+    A pooled keep-alive client (httpx with HTTP/2 when installed, else the
+    standard library over HTTP/1.1) fetches the page, and the result is only
+    accepted if the adapter's required selector is in the raw HTML. Anything
+    else (error, non-200 status, missing selector) returns None, so the
+    caller escalates to Playwright. A block status (403/429/503) also returns
+    None but marks the fetch stats as blocked: the caller then skips the
+    browser for that URL and lets the throttle back off. After give_up_after
+    escalations in a row the fetcher stops trying for the rest of the run.
+    """
+
+    def __init__(
+        self,
+        required_selectors: dict,
+        timeout: float = 15.0,
+        http2: bool = True,
+        max_connections: int = 10,
+        give_up_after: int = 10,
+        parser_backend: str = "auto"):
+
+        self.required_selectors = required_selectors
+        self.give_up_after = give_up_after
+        self.parser_backend = resolve_parser_backend(parser_backend)
+        fingerprint = random_fingerprint()
+        self.headers = {
+            "User-Agent": fingerprint["user_agent"],
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "es-ES,es;q=0.9",
+            "Referer": fingerprint["referer"],
+        }
+
+        if HTTPX_AVAILABLE:
+            self.client = httpx.Client(
+                http2=http2 and HTTP2_AVAILABLE,
+                headers=self.headers,
+                timeout=timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            )
+            self.pool = None
+            logger.info(f"HTTP fetch over httpx ({'HTTP/2' if http2 and HTTP2_AVAILABLE else 'HTTP/1.1'})")
+        else:
+            self.client = None
+            self.headers["Accept-Encoding"] = "gzip, deflate"
+            self.pool = _ConnectionPool(timeout, max_idle_per_host=max_connections)
+            logger.info("HTTP fetch over the standard library HTTP/1.1 pool (install httpx[http2] for HTTP/2)")
+        self.escalation_streak = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.http_pages = 0
+        self.http_latency = 0.0
+        self.escalations: dict[str, int] = {}
+        self.blocks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return not self.give_up_after or self.escalation_streak < self.give_up_after
+
+    def _get(self, url: str) -> tuple[int, str, str]:
+        if self.client is not None:
+            response = self.client.get(url)
+            return response.status_code, str(response.url), response.text
+        return self.pool.get(url, self.headers)
+
+    def _escalate(self, url: str, reason: str):
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        self.escalation_streak += 1
+        logger.info(f"HTTP fetch of {url} escalated to the browser ({reason})")
+        if self.escalation_streak == self.give_up_after:
+            logger.info(f"HTTP fetch disabled after {self.give_up_after} escalations in a row")
+        return None
+
+    def fetch_page(self, url: str, kind: str, stats: dict | None = None) -> str | None:
+        """
+        Fetches url over HTTP and returns its HTML if the required selector
+        of kind ("search" or "product") is present, else None.
+        stats (new_fetch_stats) gets the status and latency of an accepted
+        page, and of a blocked one along with blocked = True.
+        """
+        selector = self.required_selectors.get(kind)
+        if selector is None or not self.enabled:
+            return None
+
+        started_at = time.monotonic()
+        try:
+            status, final_url, html = self._get(url)
+        except Exception as e:
+            return self._escalate(url, type(e).__name__)
+        latency = time.monotonic() - started_at
+
+        if status in BLOCK_STATUSES:
+            # Not escalated: rendering the URL right away would hit the host that just refused us
+            self.blocks += 1
+            logger.warning(f"Block status {status} on HTTP fetch of {url}")
+            if stats is not None:
+                stats["status"] = status
+                stats["latency"] = latency
+                stats["attempts"] += 1
+                stats["transport"] = "http"
+                stats["blocked"] = True
+            return None
+        if status != 200:
+            return self._escalate(url, f"status {status}")
+        if not has_selector(html, selector, self.parser_backend):
+            return self._escalate(url, "missing selector")
+
+        self.escalation_streak = 0
+        self.http_pages += 1
+        self.http_latency += latency
+        if stats is not None:
+            stats["status"] = status
+            stats["latency"] = latency
+            stats["attempts"] += 1
+            stats["transport"] = "http"
+        return html
+
+    async def async_fetch_page(self, url: str, kind: str, stats: dict | None = None) -> str | None:
+        """
+        Asyncio counterpart of fetch_page. Runs the pooled client in a worker
+        thread, so one pool serves every stage whatever its event loop.
+        """
+        return await asyncio.to_thread(self.fetch_page, url, kind, stats)
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs and resets the HTTP vs browser counters of one stage run."""
+        escalated = sum(self.escalations.values())
+        avg_latency = self.http_latency / self.http_pages if self.http_pages else 0.0
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(self.escalations.items()))
+        logger.info(
+            f"{stage}: {self.http_pages} pages over HTTP (avg {avg_latency:.2f}s), "
+            f"{escalated} escalated to the browser{f' ({reasons})' if reasons else ''}, "
+            f"{self.blocks} blocked")
+        self.reset_stats()
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        if self.pool is not None:
+            self.pool.close()
+
+def build_http_fetcher(
+    specific_site_config,
+    fetch_config: dict | None = None,
+    parser_backend: str = "auto") -> HttpFetcher | None:
+    """
+    Builds the HTTP fetcher from the "http_fetch" config section.
+    Returns None when disabled or when the site's fetch_strategy is
+    "browser", which keeps every page on Playwright.
+    """
+    fetch_config = dict(fetch_config or {})
+    if not fetch_config.pop("enabled", True):
+        return None
+    if getattr(specific_site_config, "fetch_strategy", "browser") != "http_first":
+        return None
+    return HttpFetcher(specific_site_config.http_required_selectors, parser_backend=parser_backend, **fetch_config)
@@ -0,0 +1,217 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+
+from utilities.utils import setup_loggers
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+DEFAULT_LEASE_SECONDS = 600
+
+# Queues layered over the Urls and ProductPages tables, in pipeline order.
+# A row is claimable when it matches ready_where, or when it is in the
+# claimed status and its lease has expired (or was never set).
+JOB_QUEUES = {
+    "search_fetch": {
+        "table": "Urls",
+        "status_column": "status",
+        "ready_where": "status = 'pending'",
+        "claimed_status": "in_progress",
+        "requeue_status": "pending",
+        "owner_column": "lease_owner",
+        "expires_column": "lease_expires_at",
+        "columns": "id, url_name",
+    },
+    "search_parse": {
+        "table": "Urls",
+        "status_column": "parse_status",
+        "ready_where": "status = 'fetched' AND parse_status IS NULL",
+        "claimed_status": "parsing",
+        "requeue_status": None,
+        "owner_column": "parse_lease_owner",
+        "expires_column": "parse_lease_expires_at",
+        "columns": "id, url_name",
+    },
+    "product_fetch": {
+        "table": "ProductPages",
+        "status_column": "fetch_status",
+        "ready_where": "fetch_status = 'pending'",
+        "claimed_status": "fetching",
+        "requeue_status": "pending",
+        "owner_column": "fetch_lease_owner",
+        "expires_column": "fetch_lease_expires_at",
+        "columns": "id, product_url, product_name",
+    },
+    "product_parse": {
+        "table": "ProductPages",
+        "status_column": "parse_status",
+        "ready_where": "fetch_status = 'fetched' AND parse_status IS NULL",
+        "claimed_status": "parsing",
+        "requeue_status": None,
+        "owner_column": "parse_lease_owner",
+        "expires_column": "parse_lease_expires_at",
+        "columns": "id, product_url, product_name, filename",
+    },
+}
+
+def make_worker_id(stage: str) -> str:
+    """Returns a worker id unique across hosts, processes and runs."""
+    return f"{socket.gethostname()}:{os.getpid()}:{stage}:{uuid.uuid4().hex[:6]}"
+
+def requeue_expired_leases(db: dict, queue_name: str) -> int:
+    """
+    Puts claimed rows whose lease expired back in the ready state.
+    Rows claimed before leases existed (no expiry) count as expired.
+    """
+    queue = JOB_QUEUES[queue_name]
+    db["cur"].execute(
+        f'''
+        UPDATE {queue["table"]}
+        SET {queue["status_column"]} = ?, {queue["owner_column"]} = NULL, {queue["expires_column"]} = NULL
+        WHERE {queue["status_column"]} = '{queue["claimed_status"]}'
+        AND ({queue["expires_column"]} IS NULL OR {queue["expires_column"]} < ?)
+        ''',
+        (queue["requeue_status"], time.time())
+    )
+    return db["cur"].rowcount
+
+def has_ready_jobs(db: dict, queue_name: str) -> bool:
+    """True if claim_jobs would find a row: a ready one or an expired lease."""
+    queue = JOB_QUEUES[queue_name]
+    row = db["cur"].execute(
+        f'''
+        SELECT EXISTS (
+            SELECT 1 FROM {queue["table"]}
+            WHERE {queue["ready_where"]}
+            OR ({queue["status_column"]} = '{queue["claimed_status"]}'
+                AND ({queue["expires_column"]} IS NULL OR {queue["expires_column"]} < ?))
+        )
+        ''',
+        (time.time(),)
+    ).fetchone()
+    return bool(row[0])
+
+def claim_jobs(
+    db: dict,
+    queue_name: str,
+    worker_id: str,
+    batch_size: int = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> list[tuple]:
+    """
+    Atomically claims up to batch_size ready rows for worker_id with
+    UPDATE ... RETURNING, leasing them for lease_seconds.
+    Returns the claimed rows (queue "columns"), ordered by id.
+    """
+    queue = JOB_QUEUES[queue_name]
+    with db["conn"]:
+        requeued = requeue_expired_leases(db, queue_name)
+        if requeued:
+            logger.info(f"Requeued {requeued} expired {queue_name} leases")
+
+        db["cur"].execute(
+            f'''
+            UPDATE {queue["table"]}
+            SET {queue["status_column"]} = ?, {queue["owner_column"]} = ?, {queue["expires_column"]} = ?
+            WHERE id IN (
+                SELECT id FROM {queue["table"]}
+                WHERE {queue["ready_where"]}
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING {queue["columns"]}
+            ''',
+            (queue["claimed_status"], worker_id, time.time() + lease_seconds, batch_size)
+        )
+        rows = db["cur"].fetchall()
+
+    return sorted(rows)
+
+def renew_leases(
+    db: dict,
+    queue_name: str,
+    worker_id: str,
+    row_ids: list[int],
+    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> int:
+    """
+    Extends the leases worker_id still holds on row_ids.
+    Returns how many were renewed; fewer than len(row_ids) means leases were lost.
+    """
+    if not row_ids:
+        return 0
+    queue = JOB_QUEUES[queue_name]
+    placeholders = ", ".join("?" for _ in row_ids)
+    with db["conn"]:
+        db["cur"].execute(
+            f'''
+            UPDATE {queue["table"]}
+            SET {queue["expires_column"]} = ?
+            WHERE {queue["owner_column"]} = ?
+            AND {queue["status_column"]} = '{queue["claimed_status"]}'
+            AND id IN ({placeholders})
+            ''',
+            (time.time() + lease_seconds, worker_id, *row_ids)
+        )
+    return db["cur"].rowcount
+
+class LeaseHeartbeat:
+    """
+    Background thread that keeps renewing the leases held by one or more
+    workers of a queue. Uses its own SQLite connection, so it is safe to run
+    next to sync and asyncio stage loops.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        queue_name: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        interval: float | None = None):
+
+        self.db_path = db_path
+        self.queue_name = queue_name
+        self.lease_seconds = lease_seconds
+        self.interval = interval or lease_seconds / 3
+        self._held: dict[str, set[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def hold(self, worker_id: str, row_ids: list[int]):
+        with self._lock:
+            self._held.setdefault(worker_id, set()).update(row_ids)
+
+    def release(self, worker_id: str, row_ids: list[int]):
+        with self._lock:
+            self._held.get(worker_id, set()).difference_update(row_ids)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        db = {"conn": conn, "cur": conn.cursor()}
+        try:
+            while not self._stop.wait(self.interval):
+                with self._lock:
+                    held = {worker_id: list(ids) for worker_id, ids in self._held.items() if ids}
+                for worker_id, row_ids in held.items():
+                    try:
+                        renewed = renew_leases(db, self.queue_name, worker_id, row_ids, self.lease_seconds)
+                        if renewed < len(row_ids):
+                            error_logger.error(
+                                f"{worker_id} lost {len(row_ids) - renewed} {self.queue_name} leases")
+                    except Exception:
+                        error_logger.error(f"Lease renewal failed for {worker_id}", exc_info=True)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
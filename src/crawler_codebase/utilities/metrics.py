@@ -0,0 +1,243 @@
+import os
+import time
+import logging
+import threading
+
+from pathlib import Path
+from contextlib import contextmanager
+from utilities.utils import setup_loggers, now_with_hours
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+# Histogram buckets in seconds, from a fast parse to a slow page load
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Phases of one URL fetch, as filled in fetch stats["phases"] (utils.timed_phase)
+# and stored as UrlMetrics columns
+URL_PHASES = (
+    "http_fetch",
+    "navigation",
+    "selector_wait",
+    "retry_sleep",
+    "scroll",
+    "readiness",
+    "settle_sleep",
+    "content",
+    "capture",
+    "write",
+    "delay",
+)
+
+METRIC_HELP = {
+    "crawler_pages_total": ("counter", "Pages fetched by a scraper stage, by transport and outcome."),
+    "crawler_fetch_seconds": ("histogram", "Time from claiming a URL to storing it, including the planned delay."),
+    "crawler_phase_seconds": ("histogram", "Time spent in each phase of a URL fetch."),
+    "crawler_parsed_pages_total": ("counter", "Pages handled by a parser stage, by outcome."),
+    "crawler_parse_seconds": ("histogram", "Time to parse one page, by source (html, json, or page where the product parser picks either)."),
+    "crawler_db_commit_seconds": ("histogram", "Time of a parser stage's database write."),
+    "crawler_stage_seconds_total": ("counter", "Wall time spent running each stage."),
+}
+
+INF_BUCKET = 'le="+Inf"'
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class MetricsRegistry:
+    """
+    Counters and histograms per stage and fetch phase, labelled like
+    Prometheus metrics (every metric also carries the site). Scrapers report
+    each URL with record_fetch(), which also stores its phase timings in the
+    UrlMetrics table; parsers time pages and commits with observe()/timer().
+    export() writes the Prometheus text format, e.g. for node_exporter's
+    textfile collector. Thread-safe, so pipelined stages share one registry.
+    """
+
+    def __init__(
+        self,
+        site: str,
+        export_path: Path | None = None,
+        per_url: bool = True,
+        buckets: tuple = DEFAULT_BUCKETS):
+
+        self.site = site
+        self.export_path = Path(export_path) if export_path else None
+        self.per_url = per_url
+        self.buckets = tuple(sorted(buckets))
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        # Held across render, write and replace, since stages export from several threads
+        self._export_lock = threading.Lock()
+
+    # ---------------------------
+    # Recording
+    # ---------------------------
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key({"site": self.site, **labels}))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key({"site": self.site, **labels}))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes the duration of the with block in histogram name."""
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started_at, **labels)
+
+    def record_fetch(self, db: dict, stage: str, url: str, row_id: int | None, stats: dict, ok: bool):
+        """
+        Counts one URL fetch of a scraper stage from its fetch stats
+        (utils.new_fetch_stats) and stores its phase timings in UrlMetrics.
+        """
+        phases = stats.get("phases", {})
+        total = time.monotonic() - stats.get("started_at", time.monotonic())
+        outcome = "ok" if ok else "blocked" if stats.get("blocked") else "failed"
+        transport = stats.get("transport", "browser")
+
+        self.inc("crawler_pages_total", stage=stage, transport=transport, outcome=outcome)
+        self.observe("crawler_fetch_seconds", total, stage=stage, transport=transport)
+        for phase, seconds in phases.items():
+            self.observe("crawler_phase_seconds", seconds, stage=stage, phase=phase)
+
+        if not self.per_url:
+            return
+        columns = ", ".join(URL_PHASES)
+        placeholders = ", ".join("?" for _ in URL_PHASES)
+        try:
+            db["cur"].execute(
+                f'''
+                INSERT INTO UrlMetrics
+                    (stage, site, row_id, url, transport, status, outcome, attempts, {columns}, total, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, {placeholders}, ?, ?)
+                ''',
+                (stage, self.site, row_id, url, transport, stats.get("status"), outcome, stats.get("attempts"),
+                 *(phases.get(phase) for phase in URL_PHASES), total, now_with_hours())
+            )
+            db["conn"].commit()
+        except Exception:
+            error_logger.error(f"UrlMetrics write failed for {url}", exc_info=True)
+
+    def record_parse(self, stage: str, source: str, seconds: float, ok: bool = True):
+        """Counts one page of a parser stage and, if parsed, its parse time."""
+        self.inc("crawler_parsed_pages_total", stage=stage, outcome="ok" if ok else "failed")
+        if ok:
+            self.observe("crawler_parse_seconds", seconds, stage=stage, source=source)
+
+    # ---------------------------
+    # Reporting
+    # ---------------------------
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._histograms.items()}
+
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    le = f'le="{bound:g}"'
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, INF_BUCKET)} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> bool:
+        """
+        Writes render_prometheus() to export_path, atomically. False when not
+        configured or when the write fails (logged, never raised, so a stage
+        is not failed by its metrics).
+        """
+        if self.export_path is None:
+            return False
+        with self._export_lock:
+            try:
+                self.export_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.export_path.with_suffix(self.export_path.suffix + ".tmp")
+                tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+                os.replace(tmp_path, self.export_path)
+            except Exception:
+                error_logger.error(f"Could not export metrics to {self.export_path}", exc_info=True)
+                return False
+        return True
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs a stage's outcome counts, success rate and time per phase (cumulative for the run)."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+
+        outcomes: dict[str, float] = {}
+        stage_seconds = 0.0
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name == "crawler_stage_seconds_total" and labels.get("stage") == stage:
+                stage_seconds += value
+            if name in ("crawler_pages_total", "crawler_parsed_pages_total") and labels.get("stage") == stage:
+                outcomes[labels["outcome"]] = outcomes.get(labels["outcome"], 0) + value
+        total = sum(outcomes.values())
+        if total:
+            split = ", ".join(f"{outcome}: {count:g}" for outcome, count in sorted(outcomes.items()))
+            logger.info(f"{stage}: {total:g} pages ({split}), {outcomes.get('ok', 0) / total * 100:.1f}% succeeded")
+        if stage_seconds:
+            logger.info(f"{stage}: ran for {stage_seconds:.1f}s")
+
+        for (name, labels), histogram in sorted(histograms.items()):
+            labels = dict(labels)
+            if labels.get("stage") != stage or not histogram["count"]:
+                continue
+            detail = labels.get("phase") or labels.get("source") or labels.get("transport") or ""
+            logger.info(
+                f"{stage}: {name}{f' [{detail}]' if detail else ''} {histogram['count']} samples, "
+                f"avg {histogram['sum'] / histogram['count']:.3f}s, total {histogram['sum']:.1f}s")
+
+def build_metrics(paths_dict: dict, site: str, metrics_config: dict | None = None) -> MetricsRegistry | None:
+    """
+    Builds the metrics registry from the "metrics" config section.
+    Returns None when disabled.
+    """
+    metrics_config = dict(metrics_config or {})
+    if not metrics_config.pop("enabled", True):
+        return None
+    export_path = metrics_config.get("export_path") or paths_dict["data_dir"] / "metrics" / "crawler.prom"
+    return MetricsRegistry(
+        site,
+        export_path=Path(export_path),
+        per_url=metrics_config.get("per_url", True),
+        buckets=tuple(metrics_config.get("buckets", DEFAULT_BUCKETS)),
+    )
@@ -0,0 +1,534 @@
+import os
+import re
+import gzip
+import mmap
+import uuid
+import hashlib
+import threading
+
+from pathlib import Path
+from datetime import datetime
+from utilities.utils import setup_loggers, write_html, list_of_html_files_compiler, now_with_hours
+
+# Optional zstd support
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+# Codec name -> file extension of stored objects
+CODEC_EXTENSIONS = {
+    "zstd": ".html.zst",
+    "gzip": ".html.gz",
+    "none": ".html",
+}
+
+def resolve_codec(preferred: str) -> str:
+    """Returns preferred if usable, falling back from zstd to gzip."""
+    if preferred not in CODEC_EXTENSIONS:
+        raise ValueError(f"Unsupported page compression: {preferred}")
+    if preferred == "zstd" and not ZSTD_AVAILABLE:
+        logger.info("zstandard not installed. Falling back to gzip page compression")
+        return "gzip"
+    return preferred
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return data
+
+class SegmentMaps:
+    """
+    Read-only mmaps of segment files, kept open by path. Segments only grow,
+    so a stale mapping is replaced by a larger one. The lock covers every
+    slice, so no thread closes a mapping another one is reading.
+    """
+
+    def __init__(self):
+        self._maps: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _view(self, path: str, needed: int) -> mmap.mmap:
+        cached = self._maps.get(path)
+        if cached is not None and len(cached[1]) >= needed:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+            cached[0].close()
+        f = open(path, "rb")
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[path] = (f, view)
+        return view
+
+    def read(self, path: str, offset: int, length: int) -> bytes:
+        with self._lock:
+            return self._view(path, offset + length)[offset:offset + length]
+
+    def close(self):
+        with self._lock:
+            for f, view in self._maps.values():
+                view.close()
+                f.close()
+            self._maps.clear()
+
+# Mappings of read_page() calls made without a store, e.g. by parser processes
+_PROCESS_SEGMENT_MAPS = SegmentMaps()
+
+def close_segment_maps():
+    """Closes the segment mappings opened by read_page() calls made without a store."""
+    _PROCESS_SEGMENT_MAPS.close()
+
+def read_page(locator: tuple, segment_maps: SegmentMaps | None = None) -> str:
+    """
+    Reads and decompresses a page from a locator returned by a page store's
+    locate(). Locators are plain tuples, so they can be sent to process pools.
+    Segment locators carry (offset, length) and are read through mmap, from
+    segment_maps or else the process-wide mappings.
+    """
+    kind, path, codec = locator[:3]
+    if kind == "segment":
+        offset, length = locator[3], locator[4]
+        data = (segment_maps or _PROCESS_SEGMENT_MAPS).read(path, offset, length)
+        return decompress(data, codec).decode("utf-8")
+    with open(path, "rb") as f:
+        return decompress(f.read(), codec).decode("utf-8")
+
+def _iter_pages(store, namespace: str, names: set[str] | None = None):
+    """Default iter_pages(): list_names() then read() for each name (of names, if given)."""
+    for name in store.list_names(namespace):
+        if names is not None and name not in names:
+            continue
+        try:
+            yield name, store.read(namespace, name)
+        except Exception:
+            error_logger.error(f"Page store reading error for {namespace}/{name}", exc_info=True)
+            yield name, None
+
+def _indexed_rows(db: dict, table: str, columns: str, namespace: str, names: list[str] | None = None) -> list[tuple]:
+    """Rows of a page index table for namespace, restricted to names if given."""
+    if names is None:
+        return db["cur"].execute(f'SELECT {columns} FROM {table} WHERE namespace = ?', (namespace,)).fetchall()
+    if not names:
+        return []
+    placeholders = ", ".join("?" for _ in names)
+    return db["cur"].execute(
+        f'SELECT {columns} FROM {table} WHERE namespace = ? AND name IN ({placeholders})',
+        (namespace, *names)
+    ).fetchall()
+
+def _page_number_key(name: str):
+    """Sorts page_N.html (and page_N.json) names numerically, everything else by name."""
+    match = re.match(r"^page_(\d+)\.(?:html|json)$", name)
+    return (0, int(match.group(1)), name) if match else (1, 0, name)
+
+class FilePageStore:
+    """
+    Legacy layout: one raw .html file per page.
+    Search pages live in data/, product pages in data/output/, and captured
+    JSON payloads (utilities/response_capture.py) in data/json/.
+    """
+
+    def __init__(self, paths_dict: dict):
+        self.directories = {
+            "search": paths_dict["data_dir"],
+            "product": paths_dict["output_dir"],
+            "search_json": paths_dict["data_dir"] / "json" / "search",
+            "product_json": paths_dict["data_dir"] / "json" / "product",
+        }
+
+    def write(self, namespace: str, name: str, html: str, **meta) -> bool:
+        self.directories[namespace].mkdir(parents=True, exist_ok=True)
+        return write_html(self.directories[namespace], name, html)
+
+    def locate(self, namespace: str, name: str) -> tuple | None:
+        path = self.directories[namespace] / name
+        if not path.exists():
+            return None
+        return ("file", str(path), "none")
+
+    def read(self, namespace: str, name: str) -> str | None:
+        locator = self.locate(namespace, name)
+        return read_page(locator) if locator else None
+
+    def list_names(self, namespace: str) -> list[str]:
+        if namespace == "search":
+            return list_of_html_files_compiler(self.directories["search"]) or []
+        if namespace.endswith("_json"):
+            return sorted(
+                (path.name for path in self.directories[namespace].glob("*.json")),
+                key=_page_number_key)
+        return sorted(path.name for path in self.directories[namespace].glob("*.html"))
+
+    def fingerprints(self, namespace: str, names: list[str] | None = None) -> dict[str, str]:
+        """Change token of each page (of names, if given): file mtime and size."""
+        fingerprints = {}
+        for name in self.list_names(namespace) if names is None else names:
+            try:
+                stat = (self.directories[namespace] / name).stat()
+            except FileNotFoundError:
+                continue
+            fingerprints[name] = f"{stat.st_mtime_ns}:{stat.st_size}"
+        return fingerprints
+
+    def iter_pages(self, namespace: str, names: set[str] | None = None):
+        """Yields (name, html or None) for every page of namespace (of names, if given)."""
+        return _iter_pages(self, namespace, names)
+
+    def close(self):
+        pass
+
+class ContentAddressedPageStore:
+    """
+    Compressed page store addressed by the SHA-256 of the page body.
+    Identical bodies are stored once under data/pages/objects/; the
+    PageObjects table maps each (namespace, name) to its object.
+    Pages saved by the legacy FilePageStore stay readable through it.
+    """
+
+    def __init__(self, db: dict, paths_dict: dict, compression: str = "zstd"):
+        self.db = db
+        self.codec = resolve_codec(compression)
+        self.objects_dir = paths_dict["data_dir"] / "pages" / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.legacy = FilePageStore(paths_dict)
+
+    def _object_path(self, digest: str, codec: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}{CODEC_EXTENSIONS[codec]}"
+
+    def write(self, namespace: str, name: str, html: str, **meta) -> bool:
+        """Stores html under namespace/name. Returns False on failure."""
+        try:
+            body = html.encode("utf-8")
+            digest = hashlib.sha256(body).hexdigest()
+            object_path = self._object_path(digest, self.codec)
+
+            stored_size = 0
+            deduplicated = object_path.exists()
+            if not deduplicated:
+                object_path.parent.mkdir(exist_ok=True)
+                data = compress(body, self.codec)
+                tmp_path = object_path.with_suffix(object_path.suffix + ".tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                tmp_path.replace(object_path)
+                stored_size = len(data)
+
+            with self.db["conn"]:
+                self.db["cur"].execute(
+                    '''
+                    INSERT OR REPLACE INTO PageObjects
+                        (namespace, name, digest, codec, size, stored_size, stored_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (namespace, name, digest, self.codec, len(body), stored_size, now_with_hours())
+                )
+
+            if deduplicated:
+                logger.info(f"Stored {namespace}/{name}: {len(body)} bytes, deduplicated")
+            else:
+                logger.info(f"Stored {namespace}/{name}: {len(body)} -> {stored_size} bytes ({self.codec})")
+            return True
+        except Exception:
+            error_logger.error(f"Page store writing error for {namespace}/{name}", exc_info=True)
+            return False
+
+    def locate(self, namespace: str, name: str) -> tuple | None:
+        self.db["cur"].execute(
+            'SELECT digest, codec FROM PageObjects WHERE namespace = ? AND name = ?',
+            (namespace, name)
+        )
+        row = self.db["cur"].fetchone()
+        if row is None:
+            return self.legacy.locate(namespace, name)
+        digest, codec = row
+        return ("object", str(self._object_path(digest, codec)), codec)
+
+    def read(self, namespace: str, name: str) -> str | None:
+        locator = self.locate(namespace, name)
+        return read_page(locator) if locator else None
+
+    def list_names(self, namespace: str) -> list[str]:
+        self.db["cur"].execute('SELECT name FROM PageObjects WHERE namespace = ?', (namespace,))
+        names = {row[0] for row in self.db["cur"].fetchall()}
+        names.update(self.legacy.list_names(namespace))
+        return sorted(names, key=_page_number_key)
+
+    def fingerprints(self, namespace: str, names: list[str] | None = None) -> dict[str, str]:
+        """Change token of each page (of names, if given): its content hash."""
+        fingerprints = self.legacy.fingerprints(namespace, names)
+        fingerprints.update(_indexed_rows(self.db, "PageObjects", "name, digest", namespace, names))
+        return fingerprints
+
+    def iter_pages(self, namespace: str, names: set[str] | None = None):
+        """Yields (name, html or None) for every page of namespace (of names, if given)."""
+        return _iter_pages(self, namespace, names)
+
+    def close(self):
+        pass
+
+# Segment record layout (WARC-like):
+#   PAGE/1.0\r\n
+#   Header: value\r\n ...
+#   \r\n
+#   <Content-Length bytes of compressed body>\r\n\r\n
+SEGMENT_RECORD_MAGIC = b"PAGE/1.0\r\n"
+SEGMENT_SUFFIX = ".pages"
+
+def iter_segment_records(path: Path):
+    """
+    Scans a segment file sequentially.
+    Yields (headers dict, body offset, body length) for each complete record.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = 0
+            while view.find(SEGMENT_RECORD_MAGIC, position, position + len(SEGMENT_RECORD_MAGIC)) == position:
+                header_end = view.find(b"\r\n\r\n", position)
+                if header_end < 0:
+                    break
+                header_block = view[position + len(SEGMENT_RECORD_MAGIC):header_end].decode("utf-8")
+                headers = dict(line.split(": ", 1) for line in header_block.split("\r\n") if line)
+                offset = header_end + 4
+                length = int(headers["Content-Length"])
+                if offset + length > len(view):
+                    # Truncated record from an interrupted write
+                    break
+                yield headers, offset, length
+                position = offset + length + 4
+        finally:
+            view.close()
+
+class SegmentPageStore:
+    """
+    Append-only segmented archive. Pages are appended, compressed, to
+    data/pages/segments/*.pages files with URL, fetch time and status headers;
+    the PageSegments table maps each page (and its Urls/ProductPages row) to a
+    segment and byte offset. Reads go through memory-mapped segments, and
+    iter_pages() replays a namespace in storage order, i.e. sequentially.
+    Each store instance appends to its own segments, so several crawler
+    processes can write at once. Legacy one-file pages stay readable.
+    """
+
+    def __init__(
+        self,
+        db: dict,
+        paths_dict: dict,
+        compression: str = "zstd",
+        segment_max_bytes: int = 256 * 1024 * 1024):
+
+        self.db = db
+        self.codec = resolve_codec(compression)
+        self.segment_max_bytes = segment_max_bytes
+        self.segments_dir = paths_dict["data_dir"] / "pages" / "segments"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self.legacy = FilePageStore(paths_dict)
+        # Unique per instance: pipelined stages open one store each in the same process
+        self._writer_prefix = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self._segment_number = 0
+        self._segment_file = None
+        self._segment_path: Path | None = None
+        self._lock = threading.Lock()
+        # Mappings read by this store only, so closing it leaves other stores' mappings alone
+        self._maps = SegmentMaps()
+
+    def _open_next_segment(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment_number += 1
+        self._segment_path = self.segments_dir / f"{self._writer_prefix}-{self._segment_number:05d}{SEGMENT_SUFFIX}"
+        self._segment_file = open(self._segment_path, "ab")
+        logger.info(f"Opened page segment {self._segment_path.name}")
+
+    def close(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+        self._maps.close()
+
+    def _append_record(self, headers: dict, data: bytes) -> tuple[Path, int]:
+        """Appends one record and returns (segment path, body offset)."""
+        header_block = "".join(f"{key}: {value}\r\n" for key, value in headers.items() if value is not None)
+        record_head = SEGMENT_RECORD_MAGIC + header_block.encode("utf-8") + b"\r\n"
+
+        if self._segment_file is None or self._segment_file.tell() >= self.segment_max_bytes:
+            self._open_next_segment()
+
+        f = self._segment_file
+        offset = f.tell() + len(record_head)
+        f.write(record_head)
+        f.write(data)
+        f.write(b"\r\n\r\n")
+        f.flush()
+        return self._segment_path, offset
+
+    def write(self, namespace: str, name: str, html: str, **meta) -> bool:
+        """
+        Appends html as a record of namespace/name. Recognised meta:
+        url, row_id (Urls/ProductPages id) and status. Returns False on failure.
+        """
+        try:
+            body = html.encode("utf-8")
+            data = compress(body, self.codec)
+            fetched_at = now_with_hours()
+            status = meta.get("status", "fetched")
+            headers = {
+                "Namespace": namespace,
+                "Name": name,
+                "Row-Id": meta.get("row_id"),
+                "Url": meta.get("url"),
+                "Fetched-At": fetched_at,
+                "Status": status,
+                "Codec": self.codec,
+                "Size": len(body),
+                "Content-Length": len(data),
+            }
+
+            with self._lock:
+                segment_path, offset = self._append_record(headers, data)
+
+            with self.db["conn"]:
+                self.db["cur"].execute(
+                    '''
+                    INSERT OR REPLACE INTO PageSegments
+                        (namespace, name, row_id, url, segment, offset, length, codec, size, status, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (namespace, name, meta.get("row_id"), meta.get("url"), segment_path.name,
+                     offset, len(data), self.codec, len(body), str(status), fetched_at)
+                )
+
+            logger.info(f"Stored {namespace}/{name}: {len(body)} -> {len(data)} bytes in {segment_path.name}")
+            return True
+        except Exception:
+            error_logger.error(f"Page store writing error for {namespace}/{name}", exc_info=True)
+            return False
+
+    def locate(self, namespace: str, name: str) -> tuple | None:
+        self.db["cur"].execute(
+            'SELECT segment, codec, offset, length FROM PageSegments WHERE namespace = ? AND name = ?',
+            (namespace, name)
+        )
+        row = self.db["cur"].fetchone()
+        if row is None:
+            return self.legacy.locate(namespace, name)
+        segment, codec, offset, length = row
+        return ("segment", str(self.segments_dir / segment), codec, offset, length)
+
+    def read(self, namespace: str, name: str) -> str | None:
+        locator = self.locate(namespace, name)
+        return read_page(locator, self._maps) if locator else None
+
+    def list_names(self, namespace: str) -> list[str]:
+        """Indexed names in storage order, then legacy file names."""
+        self.db["cur"].execute(
+            'SELECT name FROM PageSegments WHERE namespace = ? ORDER BY segment, offset',
+            (namespace,)
+        )
+        names = [row[0] for row in self.db["cur"].fetchall()]
+        indexed = set(names)
+        names.extend(name for name in self.legacy.list_names(namespace) if name not in indexed)
+        return names
+
+    def fingerprints(self, namespace: str, names: list[str] | None = None) -> dict[str, str]:
+        """
+        Change token of each page (of names, if given): the segment and offset
+        of its record, since a rewritten page is appended as a new record.
+        """
+        fingerprints = self.legacy.fingerprints(namespace, names)
+        rows = _indexed_rows(self.db, "PageSegments", "name, segment, offset", namespace, names)
+        fingerprints.update((name, f"{segment}:{offset}") for name, segment, offset in rows)
+        return fingerprints
+
+    def iter_pages(self, namespace: str, names: set[str] | None = None):
+        """
+        Yields (name, html or None) for every page of namespace (of names, if
+        given), walking the segments in order so a full replay is one
+        sequential pass per segment.
+        """
+        rows = self.db["cur"].execute(
+            '''
+            SELECT name, segment, codec, offset, length FROM PageSegments
+            WHERE namespace = ?
+            ORDER BY segment, offset
+            ''',
+            (namespace,)
+        ).fetchall()
+
+        indexed = set()
+        for name, segment, codec, offset, length in rows:
+            indexed.add(name)
+            if names is not None and name not in names:
+                continue
+            try:
+                yield name, read_page(("segment", str(self.segments_dir / segment), codec, offset, length), self._maps)
+            except Exception:
+                error_logger.error(f"Page store reading error for {namespace}/{name}", exc_info=True)
+                yield name, None
+
+        for name in self.legacy.list_names(namespace):
+            if name not in indexed and (names is None or name in names):
+                yield name, self.legacy.read(namespace, name)
+
+    def rebuild_index(self) -> int:
+        """
+        Rebuilds PageSegments by scanning every segment file, e.g. after the
+        database was lost. Later records of the same page win.
+        Returns the number of records indexed.
+        """
+        records = []
+        for segment_path in sorted(self.segments_dir.glob(f"*{SEGMENT_SUFFIX}")):
+            for headers, offset, length in iter_segment_records(segment_path):
+                row_id = headers.get("Row-Id")
+                records.append((
+                    headers["Namespace"], headers["Name"], int(row_id) if row_id else None,
+                    headers.get("Url"), segment_path.name, offset, length, headers["Codec"],
+                    int(headers.get("Size", 0)), headers.get("Status"), headers.get("Fetched-At")
+                ))
+
+        with self.db["conn"]:
+            self.db["cur"].executemany(
+                '''
+                INSERT OR REPLACE INTO PageSegments
+                    (namespace, name, row_id, url, segment, offset, length, codec, size, status, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                records
+            )
+        logger.info(f"Rebuilt page segment index: {len(records)} records")
+        return len(records)
+
+def open_page_store(db: dict, paths_dict: dict, store_config: dict | None = None):
+    """
+    Builds the page store selected in config.json ("page_store" section).
+    """
+    store_config = store_config or {}
+    backend = store_config.get("backend", "files")
+    if backend == "files":
+        return FilePageStore(paths_dict)
+    if backend == "cas":
+        return ContentAddressedPageStore(db, paths_dict, store_config.get("compression", "zstd"))
+    if backend == "segments":
+        return SegmentPageStore(
+            db,
+            paths_dict,
+            store_config.get("compression", "zstd"),
+            int(store_config.get("segment_max_mb", 256) * 1024 * 1024)
+        )
+    raise ValueError(f"Unsupported page store backend: {backend}")
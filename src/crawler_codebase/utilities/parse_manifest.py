@@ -0,0 +1,57 @@
+from utilities.utils import now_with_hours
+
+# Manifest of the pages a parser stage already processed (ParseManifest
+# table): per page store namespace and page name, the page's fingerprint
+# (page store change token), the parser version and the product count.
+# A page is parsed again only when its fingerprint or the parser changed.
+
+def parser_version(specific_site_config) -> str:
+    """Version of the adapter's parsers, as recorded in the manifest."""
+    return f"{specific_site_config.SITE_NAME}/{getattr(specific_site_config, 'parser_version', 1)}"
+
+def load_manifest(db: dict, namespace: str) -> dict[str, tuple[str, str, int]]:
+    """{page name: (fingerprint, parser version, products)} of a namespace."""
+    rows = db["cur"].execute(
+        'SELECT name, fingerprint, parser_version, products FROM ParseManifest WHERE namespace = ?',
+        (namespace,)
+    ).fetchall()
+    return {name: (fingerprint, version, products) for name, fingerprint, version, products in rows}
+
+def changed_pages(
+    db: dict,
+    namespace: str,
+    fingerprints: dict[str, str],
+    version: str,
+    reparse: bool = False) -> tuple[set[str], dict[str, int]]:
+    """
+    Splits the pages of namespace (page store fingerprints) into the names to
+    parse (new, changed, or parsed by another parser version) and the
+    unchanged ones with their recorded product counts. reparse parses all.
+    """
+    if reparse:
+        return set(fingerprints), {}
+    manifest = load_manifest(db, namespace)
+    to_parse = set()
+    unchanged = {}
+    for name, fingerprint in fingerprints.items():
+        entry = manifest.get(name)
+        if entry is not None and entry[0] == fingerprint and entry[1] == version:
+            unchanged[name] = entry[2]
+        else:
+            to_parse.add(name)
+    return to_parse, unchanged
+
+def record_parsed_pages(db: dict, entries: list[tuple[str, str, str, int]], version: str):
+    """Records parsed pages as (namespace, name, fingerprint, products) in one transaction."""
+    if not entries:
+        return
+    parsed_at = now_with_hours()
+    with db["conn"]:
+        db["cur"].executemany(
+            '''
+            INSERT OR REPLACE INTO ParseManifest (namespace, name, fingerprint, parser_version, products, parsed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''',
+            [(namespace, name, fingerprint, version, products, parsed_at)
+             for namespace, name, fingerprint, products in entries]
+        )
@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+
+from utilities.job_queue import has_ready_jobs
+from utilities.utils import setup_loggers
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+class PipelineStage:
+    """
+    One stage of the pipelined run mode: run(resources) drains the stage's
+    job queue (queue_name in JOB_QUEUES) once and returns, as the stage
+    functions already do in sequential mode. upstream names the stage that
+    feeds the queue, if any.
+    """
+
+    def __init__(self, name: str, run, queue_name: str, upstream: str | None = None):
+        self.name = name
+        self.run = run
+        self.queue_name = queue_name
+        self.upstream = upstream
+        self.done = threading.Event()
+        self.drains = 0
+        self.busy = 0.0
+        self.elapsed = 0.0
+        self.error: BaseException | None = None
+
+def _consume(stage: PipelineStage, upstream: PipelineStage | None, open_resources, close_resources,
+             poll_interval: float, stop_event: threading.Event):
+    """
+    Stage thread: drains the queue whenever it has ready jobs and waits for
+    more while the upstream stage runs. The upstream state is read before
+    looking at the queue, so the last jobs it produces are always drained.
+    The stop event, also handed to the stage as resources["stop_event"] so it
+    can leave between jobs, ends the thread before its next drain.
+    """
+    started_at = time.monotonic()
+    resources = None
+    try:
+        resources = open_resources(stage.name)
+        resources["stop_event"] = stop_event
+        while not stop_event.is_set():
+            upstream_done = upstream is None or upstream.done.is_set()
+            if has_ready_jobs(resources["db"], stage.queue_name):
+                drain_started_at = time.monotonic()
+                stage.run(resources)
+                stage.drains += 1
+                stage.busy += time.monotonic() - drain_started_at
+            elif not upstream_done:
+                upstream.done.wait(poll_interval)
+                continue
+            if upstream_done:
+                break
+    except BaseException as e:
+        stage.error = e
+        error_logger.error(f"Pipeline stage {stage.name} failed", exc_info=True)
+    finally:
+        if resources is not None:
+            try:
+                close_resources(resources)
+            except Exception:
+                error_logger.error(f"Error closing resources of pipeline stage {stage.name}", exc_info=True)
+        stage.elapsed = time.monotonic() - started_at
+        # A failed stage still releases its downstream, which drains what it got
+        stage.done.set()
+
+def run_pipeline(
+    stages: list[PipelineStage],
+    open_resources,
+    close_resources,
+    logger: logging.Logger,
+    poll_interval: float = DEFAULT_POLL_INTERVAL) -> dict:
+    """
+    Runs the stages concurrently, one thread each, connected by the table
+    backed job queues: a stage works as soon as its queue has jobs and stops
+    once its upstream stage is done and nothing is left for it.
+    open_resources(stage name) returns the thread's own resources (at least
+    its "db" connection; SQLite connections and sync Playwright objects are
+    not shared across threads) and close_resources releases them.
+    On KeyboardInterrupt the stages are asked to stop, and the interrupt is
+    re-raised only once every stage thread has finished, so the caller can
+    then release what the stages shared.
+    Returns per-stage timings: {name: {"elapsed", "busy", "drains"}}.
+    Raises RuntimeError when a stage failed.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    stop_event = threading.Event()
+    started_at = time.monotonic()
+    threads = [
+        threading.Thread(
+            target=_consume,
+            args=(stage, by_name.get(stage.upstream), open_resources, close_resources, poll_interval, stop_event),
+            name=f"pipeline-{stage.name}"
+        )
+        for stage in stages
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        logger.info("Pipeline interrupted with KeyboardInterrupt, waiting for stages to finish their current job")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        raise
+
+    elapsed = time.monotonic() - started_at
+    timings = {}
+    for stage in stages:
+        timings[stage.name] = {"elapsed": stage.elapsed, "busy": stage.busy, "drains": stage.drains}
+        logger.info(
+            f"Pipeline stage {stage.name}: busy {stage.busy:.1f}s over {stage.drains} drains, "
+            f"finished after {stage.elapsed:.1f}s{' (failed)' if stage.error else ''}")
+    slowest = max((stage.busy for stage in stages), default=0.0)
+    serial = sum(stage.busy for stage in stages)
+    logger.info(
+        f"Pipeline finished in {elapsed:.1f}s: slowest stage busy {slowest:.1f}s, "
+        f"stages busy {serial:.1f}s in total")
+
+    failed = [stage for stage in stages if stage.error is not None]
+    if failed:
+        raise RuntimeError(
+            f"Pipeline stages failed: {', '.join(stage.name for stage in failed)}") from failed[0].error
+    return timings
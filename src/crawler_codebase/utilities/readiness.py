@@ -0,0 +1,155 @@
+import time
+import asyncio
+
+from playwright.sync_api import Page
+from playwright.async_api import Page as AsyncPage
+
+# Installs (once per document) a MutationObserver that timestamps the last
+# DOM change, then returns the container count and the DOM quiet time in ms
+READINESS_SNAPSHOT_JS = """
+(selector) => {
+    let state = window.__crawlerReadiness;
+    if (!state) {
+        state = window.__crawlerReadiness = { lastMutation: performance.now() };
+        new MutationObserver(() => { state.lastMutation = performance.now(); })
+            .observe(document.documentElement, {
+                childList: true, subtree: true, attributes: true, characterData: true
+            });
+    }
+    return {
+        count: document.querySelectorAll(selector).length,
+        domQuietMs: performance.now() - state.lastMutation,
+    };
+}
+"""
+
+class _NetworkTracker:
+    """Counts the page's in-flight requests through Playwright request events."""
+
+    def __init__(self):
+        self.pending = set()
+        self.idle_since = time.monotonic()
+
+    def on_request(self, request):
+        self.pending.add(request)
+
+    def on_done(self, request):
+        self.pending.discard(request)
+        if not self.pending:
+            self.idle_since = time.monotonic()
+
+    def idle_ms(self) -> float:
+        if self.pending:
+            return 0.0
+        return (time.monotonic() - self.idle_since) * 1000
+
+    def attach(self, page):
+        page.on("request", self.on_request)
+        page.on("requestfinished", self.on_done)
+        page.on("requestfailed", self.on_done)
+
+    def detach(self, page):
+        page.remove_listener("request", self.on_request)
+        page.remove_listener("requestfinished", self.on_done)
+        page.remove_listener("requestfailed", self.on_done)
+
+class PageReadiness:
+    """
+    Decides when a rendered page is done instead of sleeping a fixed time.
+    A page is ready once the adapter's container selector matches at least
+    min_count elements, that count has not changed for stable_ms, and either
+    the DOM (MutationObserver) or the network (no pending requests) has been
+    quiet for quiet_ms. Gives up after timeout seconds so callers can fall
+    back to the fixed waits.
+    """
+
+    def __init__(
+        self,
+        stable_ms: int = 800,
+        quiet_ms: int = 500,
+        min_count: int = 1,
+        timeout: float = 15.0,
+        poll_ms: int = 100,
+        skip_scroll_when_ready: bool = True):
+
+        self.stable_ms = stable_ms
+        self.quiet_ms = quiet_ms
+        self.min_count = min_count
+        self.timeout = timeout
+        self.poll_ms = poll_ms
+        self.skip_scroll_when_ready = skip_scroll_when_ready
+
+    def _check(self, state: dict, snapshot: dict, network_idle_ms: float) -> str | None:
+        """Updates the count history and returns the ready reason, if any."""
+        now = time.monotonic()
+        if snapshot["count"] != state["count"]:
+            state["count"] = snapshot["count"]
+            state["count_changed_at"] = now
+
+        if state["count"] < self.min_count:
+            return None
+        if (now - state["count_changed_at"]) * 1000 < self.stable_ms:
+            return None
+        if snapshot["domQuietMs"] >= self.quiet_ms:
+            return "dom_quiet"
+        if network_idle_ms >= self.quiet_ms:
+            return "network_idle"
+        return None
+
+    def _result(self, started_at: float, state: dict, reason: str | None) -> dict:
+        return {
+            "ready": reason is not None,
+            "reason": reason or "timeout",
+            "elapsed": time.monotonic() - started_at,
+            "count": state["count"],
+        }
+
+    def wait(self, page: Page, selector: str) -> dict:
+        """
+        Polls the page until it is ready or the timeout expires.
+        Returns {"ready", "reason", "elapsed", "count"}.
+        """
+        started_at = time.monotonic()
+        state = {"count": -1, "count_changed_at": started_at}
+        reason = None
+        tracker = _NetworkTracker()
+        tracker.attach(page)
+        try:
+            while time.monotonic() - started_at < self.timeout:
+                snapshot = page.evaluate(READINESS_SNAPSHOT_JS, selector)
+                reason = self._check(state, snapshot, tracker.idle_ms())
+                if reason:
+                    break
+                # Lets Playwright dispatch the request events meanwhile
+                page.wait_for_timeout(self.poll_ms)
+        finally:
+            tracker.detach(page)
+        return self._result(started_at, state, reason)
+
+    async def async_wait(self, page: AsyncPage, selector: str) -> dict:
+        """Async API counterpart of wait."""
+        started_at = time.monotonic()
+        state = {"count": -1, "count_changed_at": started_at}
+        reason = None
+        tracker = _NetworkTracker()
+        tracker.attach(page)
+        try:
+            while time.monotonic() - started_at < self.timeout:
+                snapshot = await page.evaluate(READINESS_SNAPSHOT_JS, selector)
+                reason = self._check(state, snapshot, tracker.idle_ms())
+                if reason:
+                    break
+                await asyncio.sleep(self.poll_ms / 1000)
+        finally:
+            tracker.detach(page)
+        return self._result(started_at, state, reason)
+
+def build_readiness(readiness_config: dict | None = None) -> PageReadiness | None:
+    """
+    Builds the readiness engine from the "readiness" config section.
+    Returns None when disabled, which keeps the scroll + fixed sleep flow.
+    """
+    readiness_config = dict(readiness_config or {})
+    if not readiness_config.pop("enabled", True):
+        return None
+    return PageReadiness(**readiness_config)
@@ -0,0 +1,142 @@
+import re
+import logging
+
+from urllib.parse import urlsplit
+from playwright.sync_api import BrowserContext, Route
+from playwright.async_api import BrowserContext as AsyncBrowserContext
+from playwright.async_api import Route as AsyncRoute
+
+# Resource types we never need: only page.content() is kept, and image URLs
+# are read from src/data-src attributes, not from the image bytes
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+# Third-party trackers and ad networks blocked on every site
+DEFAULT_BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "newrelic.com",
+    "nr-data.net",
+    "criteo.com",
+    "taboola.com",
+]
+
+# Rough transfer size per blocked request (bytes). Aborted requests never
+# report a size, so avoided bandwidth can only be estimated.
+ESTIMATED_RESOURCE_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+class ResourceBlocker:
+    """
+    Aborts requests for heavy or useless resources on a browser context.
+    Rules, in order:
+      1. URLs matching an allow pattern always load.
+      2. URLs matching a deny pattern, or on a blocked domain, are aborted.
+      3. Requests of a blocked resource type are aborted.
+    Counts blocked requests and estimated avoided bytes per resource type.
+    """
+
+    def __init__(
+        self,
+        resource_types: list[str] | None = None,
+        deny_patterns: list[str] | None = None,
+        allow_patterns: list[str] | None = None,
+        blocked_domains: list[str] | None = None):
+
+        self.resource_types = set(DEFAULT_BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.deny_patterns = [re.compile(pattern) for pattern in deny_patterns or []]
+        self.allow_patterns = [re.compile(pattern) for pattern in allow_patterns or []]
+        self.blocked_domains = tuple(DEFAULT_BLOCKED_DOMAINS if blocked_domains is None else blocked_domains)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.allowed_requests = 0
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.blocked_by_type: dict[str, int] = {}
+
+    def _on_blocked_domain(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.blocked_domains)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if url.startswith("data:"):
+            return False
+        if any(pattern.search(url) for pattern in self.allow_patterns):
+            return False
+        if any(pattern.search(url) for pattern in self.deny_patterns):
+            return True
+        if self._on_blocked_domain(url):
+            return True
+        return resource_type in self.resource_types
+
+    def _record(self, resource_type: str, url: str) -> bool:
+        """Decides on one request and updates the counters."""
+        if not self.should_block(resource_type, url):
+            self.allowed_requests += 1
+            return False
+        self.blocked_requests += 1
+        self.blocked_bytes += ESTIMATED_RESOURCE_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        return True
+
+    def _handle(self, route: Route):
+        request = route.request
+        if self._record(request.resource_type, request.url):
+            route.abort("blockedbyclient")
+        else:
+            route.fallback()
+
+    async def _async_handle(self, route: AsyncRoute):
+        request = route.request
+        if self._record(request.resource_type, request.url):
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    def install(self, context: BrowserContext):
+        """Routes every request of a sync context through the blocker."""
+        context.route("**/*", self._handle)
+
+    async def async_install(self, context: AsyncBrowserContext):
+        """Async API counterpart of install."""
+        await context.route("**/*", self._async_handle)
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs and resets the counters of one stage run."""
+        by_type = ", ".join(f"{resource_type}={count}" for resource_type, count in sorted(self.blocked_by_type.items()))
+        logger.info(
+            f"{stage}: blocked {self.blocked_requests} requests "
+            f"(~{self.blocked_bytes / 1_048_576:.1f} MB avoided, {by_type or 'none'}), "
+            f"allowed {self.allowed_requests}")
+        self.reset_stats()
+
+def build_resource_blocker(specific_site_config, blocking_config: dict | None = None) -> ResourceBlocker | None:
+    """
+    Builds the blocker from the "resource_blocking" config section and the
+    site's blocked_url_patterns / allowed_url_patterns.
+    Returns None when blocking is disabled.
+    """
+    blocking_config = blocking_config or {}
+    if not blocking_config.get("enabled", True):
+        return None
+
+    return ResourceBlocker(
+        resource_types=blocking_config.get("resource_types"),
+        deny_patterns=getattr(specific_site_config, "blocked_url_patterns", []) + blocking_config.get("deny_patterns", []),
+        allow_patterns=getattr(specific_site_config, "allowed_url_patterns", []) + blocking_config.get("allow_patterns", []),
+        blocked_domains=blocking_config.get("blocked_domains"),
+    )
@@ -0,0 +1,181 @@
+import re
+import json
+import logging
+
+from playwright.sync_api import Page, Response
+from playwright.async_api import Page as AsyncPage
+from utilities.utils import setup_loggers
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+# Page store namespace of each page namespace's captured payloads
+JSON_NAMESPACES = {
+    "search": "search_json",
+    "product": "product_json",
+}
+
+DEFAULT_CAPTURED_CONTENT_TYPES = ["application/json"]
+
+class ResponseCapture:
+    """
+    Captures a site's structured data while a page loads in Playwright:
+      - JSON responses (XHR/fetch) whose URL matches one of the adapter's
+        capture_url_patterns and whose content type is in content_types;
+      - the page's embedded state, read with the adapter's embedded_state_js.
+    attach() starts listening on page.on("response") before navigation and
+    collect() decodes the matching bodies once the page is ready (bodies are
+    not read inside the event handler, which the sync API does not allow).
+    Payloads are dicts: {"source": "xhr" | "embedded", "url", "data"}.
+    """
+
+    def __init__(
+        self,
+        url_patterns: list[str],
+        embedded_state_js: str | None = None,
+        content_types: list[str] | None = None,
+        max_bytes: int = 5 * 1024 * 1024,
+        keep_html: bool = True):
+
+        self.url_patterns = [re.compile(pattern) for pattern in url_patterns]
+        self.embedded_state_js = embedded_state_js
+        self.content_types = tuple(DEFAULT_CAPTURED_CONTENT_TYPES if content_types is None else content_types)
+        self.max_bytes = max_bytes
+        self.keep_html = keep_html
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.pages = 0
+        self.payloads = 0
+        self.payload_bytes = 0
+        self.skipped = 0
+
+    def _matches(self, response) -> bool:
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return False
+        content_type = response.headers.get("content-type", "")
+        if not content_type.startswith(self.content_types):
+            return False
+        return any(pattern.search(response.url) for pattern in self.url_patterns)
+
+    def attach(self, page: Page | AsyncPage) -> dict:
+        """Starts capturing matching responses of page. Returns the handle for collect()."""
+        handle = {"page": page, "responses": []}
+
+        def on_response(response: Response):
+            if self._matches(response):
+                handle["responses"].append(response)
+
+        handle["handler"] = on_response
+        page.on("response", on_response)
+        return handle
+
+    def _decode(self, response, body: bytes) -> dict | None:
+        if len(body) > self.max_bytes:
+            self.skipped += 1
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            self.skipped += 1
+            return None
+        self.payload_bytes += len(body)
+        return {"source": "xhr", "url": response.url, "data": data}
+
+    def _finish(self, payloads: list[dict], url: str) -> list[dict]:
+        self.pages += 1
+        self.payloads += len(payloads)
+        if payloads:
+            logger.info(f"Captured {len(payloads)} JSON payloads for {url}")
+        return payloads
+
+    def collect(self, handle: dict) -> list[dict]:
+        """Stops capturing and returns the decoded payloads of the page."""
+        page = handle["page"]
+        page.remove_listener("response", handle["handler"])
+        payloads = []
+        for response in handle["responses"]:
+            try:
+                payload = self._decode(response, response.body())
+            except Exception:
+                # Bodies of redirects or evicted responses are not available
+                self.skipped += 1
+                continue
+            if payload is not None:
+                payloads.append(payload)
+        if self.embedded_state_js:
+            try:
+                state = page.evaluate(self.embedded_state_js)
+                if state:
+                    payloads.append({"source": "embedded", "url": page.url, "data": state})
+            except Exception:
+                error_logger.error(f"Embedded state capture error for {page.url}", exc_info=True)
+        return self._finish(payloads, page.url)
+
+    async def async_collect(self, handle: dict) -> list[dict]:
+        """Async API counterpart of collect."""
+        page = handle["page"]
+        page.remove_listener("response", handle["handler"])
+        payloads = []
+        for response in handle["responses"]:
+            try:
+                payload = self._decode(response, await response.body())
+            except Exception:
+                self.skipped += 1
+                continue
+            if payload is not None:
+                payloads.append(payload)
+        if self.embedded_state_js:
+            try:
+                state = await page.evaluate(self.embedded_state_js)
+                if state:
+                    payloads.append({"source": "embedded", "url": page.url, "data": state})
+            except Exception:
+                error_logger.error(f"Embedded state capture error for {page.url}", exc_info=True)
+        return self._finish(payloads, page.url)
+
+    def store(self, page_store, namespace: str, name: str, payloads: list[dict], **meta) -> bool:
+        """Writes the payloads of one page to the JSON namespace matching namespace."""
+        if not payloads:
+            return False
+        return page_store.write(JSON_NAMESPACES[namespace], name, json.dumps(payloads), **meta)
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs and resets the capture counters of one stage run."""
+        logger.info(
+            f"{stage}: captured {self.payloads} JSON payloads on {self.pages} pages "
+            f"({self.payload_bytes / 1_048_576:.1f} MB), {self.skipped} skipped")
+        self.reset_stats()
+
+def json_page_name(namespace: str, row_id: int) -> str:
+    """Page store name of the captured payloads of a Urls (search) or ProductPages (product) row."""
+    return f"page_{row_id}.json" if namespace == "search" else f"product_{row_id}.json"
+
+def load_payloads(text: str | None) -> list[dict]:
+    """Decodes a stored payload list (empty on missing or corrupt data)."""
+    if not text:
+        return []
+    try:
+        return json.loads(text)
+    except ValueError:
+        return []
+
+def build_response_capture(specific_site_config, capture_config: dict | None = None) -> ResponseCapture | None:
+    """
+    Builds the response capture from the "response_capture" config section.
+    Returns None when disabled or when the adapter declares nothing to capture.
+    """
+    capture_config = dict(capture_config or {})
+    if not capture_config.pop("enabled", True):
+        return None
+    url_patterns = getattr(specific_site_config, "capture_url_patterns", [])
+    embedded_state_js = getattr(specific_site_config, "embedded_state_js", None)
+    if not url_patterns and not embedded_state_js:
+        return None
+    return ResponseCapture(
+        url_patterns,
+        embedded_state_js=embedded_state_js,
+        content_types=capture_config.get("content_types"),
+        max_bytes=int(capture_config.get("max_mb", 5) * 1024 * 1024),
+        keep_html=capture_config.get("keep_html", True),
+    )
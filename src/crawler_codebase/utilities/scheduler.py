@@ -0,0 +1,55 @@
+import random
+import asyncio
+
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+class HostScheduler:
+    """
+    Per-host politeness scheduler for the asyncio crawlers.
+    Limits how many requests run at once against a host and enforces a
+    minimum spacing between consecutive request starts on that host.
+    Different hosts are scheduled independently.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 30.0,
+        max_in_flight: int = 1,
+        jitter: float = 0.0):
+
+        self.min_interval = min_interval
+        self.max_in_flight = max_in_flight
+        self.jitter = jitter
+        self._hosts: dict[str, dict] = {}
+
+    def _host_state(self, host: str) -> dict:
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                "semaphore": asyncio.Semaphore(self.max_in_flight),
+                "lock": asyncio.Lock(),
+                "next_start": 0.0,
+            }
+            self._hosts[host] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Waits until a request to the URL's host is allowed, then holds
+        one in-flight slot for that host until the block exits.
+        """
+        host = urlsplit(url).netloc
+        state = self._host_state(host)
+        loop = asyncio.get_running_loop()
+
+        async with state["semaphore"]:
+            # Serialize start times per host
+            async with state["lock"]:
+                wait_time = state["next_start"] - loop.time()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                spacing = self.min_interval + random.uniform(0, self.jitter)
+                state["next_start"] = loop.time() + spacing
+            yield
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+from pathlib import Path
+from playwright.sync_api import BrowserContext
+from playwright.async_api import BrowserContext as AsyncBrowserContext
+from utilities.stealth import random_fingerprint
+from utilities.job_queue import make_worker_id
+
+def fingerprint_id(fingerprint: dict) -> str:
+    """Short stable id of a fingerprint, used to name its saved state."""
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def _new_run_stats() -> dict:
+    return {
+        kind: {"sessions": 0, "pages": 0, "failures": 0, "latency": 0.0, "timed": 0,
+               "first_latency": 0.0, "first_timed": 0}
+        for kind in ("warm", "cold")
+    }
+
+class SessionStateStore:
+    """
+    Saves and restores Playwright storage_state (cookies + localStorage) per
+    site and fingerprint, so scrapers start as returning visitors instead of
+    fresh ones. Each saved state keeps the fingerprint it was built with.
+    - checkout() hands out the least recently used saved session not in use,
+      or a new cold one (fresh fingerprint, no state).
+    - Sessions expire after max_age_hours or max_uses stage runs, and are
+      retired right away on a block signal or after max_failures failed
+      pages in a row. At most max_sessions stay active per site; creating
+      one more retires the least recently used (rotation).
+    Pages are counted as warm or cold by how their session started, so the
+    logged summary compares load latency and failure rate of both.
+    Checked out sessions are claimed in SessionStates (lease_owner), so
+    stores of other threads or processes never hand out the same one. A
+    claim older than max_age_hours is taken as abandoned.
+    """
+
+    def __init__(
+        self,
+        db: dict,
+        sessions_dir: Path,
+        site: str,
+        max_age_hours: float = 24.0,
+        max_uses: int = 50,
+        max_failures: int = 3,
+        max_sessions: int = 4):
+
+        self.db = db
+        self.site = site
+        self.state_dir = Path(sessions_dir) / site
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_hours * 3600
+        self.max_uses = max_uses
+        self.max_failures = max_failures
+        self.max_sessions = max_sessions
+        self.owner = make_worker_id("session_state")
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.run_stats = _new_run_stats()
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+
+    def _claim(self, session_id: int, now: float) -> bool:
+        """Claims a session for this store. False if another store holds it."""
+        self.db["cur"].execute(
+            '''
+            UPDATE SessionStates SET lease_owner = ?, leased_at = ?
+            WHERE id = ? AND retired_at IS NULL AND (lease_owner IS NULL OR leased_at < ?)
+            ''',
+            (self.owner, now, session_id, now - self.max_age)
+        )
+        self.db["conn"].commit()
+        return self.db["cur"].rowcount == 1
+
+    def _release(self, session_id: int):
+        self.db["cur"].execute(
+            'UPDATE SessionStates SET lease_owner = NULL, leased_at = NULL WHERE id = ? AND lease_owner = ?',
+            (session_id, self.owner)
+        )
+        self.db["conn"].commit()
+
+    def _retire(self, session_id: int, state_path: str, reason: str):
+        (self.state_dir / state_path).unlink(missing_ok=True)
+        self.db["cur"].execute(
+            'UPDATE SessionStates SET retired_at = ?, retired_reason = ? WHERE id = ?',
+            (time.time(), reason, session_id)
+        )
+        self.db["conn"].commit()
+
+    def _expire(self, now: float):
+        """Retires unclaimed sessions that are too old or were used too many times."""
+        rows = self.db["cur"].execute(
+            '''
+            SELECT id, state_path, created_at, uses FROM SessionStates
+            WHERE site = ? AND retired_at IS NULL AND (lease_owner IS NULL OR leased_at < ?)
+            ''',
+            (self.site, now - self.max_age)
+        ).fetchall()
+        for session_id, state_path, created_at, uses in rows:
+            if now - created_at > self.max_age:
+                reason = "expired"
+            elif uses >= self.max_uses:
+                reason = "max_uses"
+            else:
+                continue
+            # Claimed first, so a session another store just checked out is left alone
+            if self._claim(session_id, now):
+                self._retire(session_id, state_path, reason)
+
+    def _active_sessions(self, now: float) -> list[tuple]:
+        """(id, fingerprint, state_path, free) of the site's sessions, never used ones (NULL last_used_at) first."""
+        return self.db["cur"].execute(
+            '''
+            SELECT id, fingerprint, state_path, lease_owner IS NULL OR leased_at < ? FROM SessionStates
+            WHERE site = ? AND retired_at IS NULL
+            ORDER BY last_used_at
+            ''',
+            (now - self.max_age, self.site)
+        ).fetchall()
+
+    def checkout(self) -> dict:
+        """
+        Returns a session for one browser context:
+        {"id", "fingerprint", "storage_state" (path or None), "warm", ...}.
+        Hand it to stealth_context(session=...) and give it back with save().
+        """
+        now = time.time()
+        self._expire(now)
+        active = self._active_sessions(now)
+
+        for session_id, fingerprint, state_path, free in active:
+            # Another store may claim it between the query and the claim
+            if not free or not self._claim(session_id, now):
+                continue
+            path = self.state_dir / state_path
+            warm = path.exists()
+            return self._lease(session_id, json.loads(fingerprint), path if warm else None, warm)
+
+        #Rotation: make room for the new session
+        if len(active) >= self.max_sessions:
+            for session_id, _, state_path, free in active:
+                if free and self._claim(session_id, now):
+                    self._retire(session_id, state_path, "rotated")
+                    break
+
+        fingerprint = random_fingerprint()
+        fp_id = fingerprint_id(fingerprint)
+        self.db["cur"].execute(
+            '''
+            INSERT INTO SessionStates (site, fingerprint_id, fingerprint, state_path, created_at, lease_owner, leased_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (self.site, fp_id, json.dumps(fingerprint), f"{fp_id}.json", now, self.owner, now)
+        )
+        self.db["conn"].commit()
+        return self._lease(self.db["cur"].lastrowid, fingerprint, None, False)
+
+    def _lease(self, session_id: int, fingerprint: dict, path: Path | None, warm: bool) -> dict:
+        self.run_stats["warm" if warm else "cold"]["sessions"] += 1
+        return {
+            "id": session_id,
+            "fingerprint": fingerprint,
+            "fingerprint_id": fingerprint_id(fingerprint),
+            "storage_state": str(path) if path is not None else None,
+            "warm": warm,
+            "pages": 0,
+            "consecutive_failures": 0,
+            "retired": False,
+        }
+
+    # ---------------------------
+    # Feedback
+    # ---------------------------
+
+    def record(self, session: dict, stats: dict, ok: bool):
+        """
+        Counts one page load of session, with the stats filled by
+        process_single_url(stats=...). ok is False for a failed load.
+        """
+        run = self.run_stats["warm" if session["warm"] else "cold"]
+        latency = stats.get("latency")
+        run["pages"] += 1
+        if ok and latency is not None:
+            run["latency"] += latency
+            run["timed"] += 1
+            if session["pages"] == 0:
+                run["first_latency"] += latency
+                run["first_timed"] += 1
+        if ok:
+            session["consecutive_failures"] = 0
+        else:
+            run["failures"] += 1
+            session["consecutive_failures"] += 1
+        session["pages"] += 1
+
+        self.db["cur"].execute(
+            '''
+            UPDATE SessionStates
+            SET pages = pages + 1, failures = failures + ?, latency_total = latency_total + ?, last_used_at = ?
+            WHERE id = ?
+            ''',
+            (0 if ok else 1, latency if ok and latency is not None else 0.0, time.time(), session["id"])
+        )
+        self.db["conn"].commit()
+
+        # A challenged session is not worth saving
+        if session["retired"]:
+            return
+        if stats.get("blocked"):
+            session["retired"] = True
+            self._retire(session["id"], f"{session['fingerprint_id']}.json", "blocked")
+        elif session["consecutive_failures"] >= self.max_failures:
+            session["retired"] = True
+            self._retire(session["id"], f"{session['fingerprint_id']}.json", "failures")
+
+    # ---------------------------
+    # Saving
+    # ---------------------------
+
+    def _saved(self, session: dict):
+        now = time.time()
+        self.db["cur"].execute(
+            'UPDATE SessionStates SET saved_at = ?, last_used_at = ?, uses = uses + 1 WHERE id = ?',
+            (now, now, session["id"])
+        )
+        self.db["conn"].commit()
+
+    def save(self, session: dict, context: BrowserContext):
+        """Saves the context's storage state (unless the session was retired) and releases it."""
+        try:
+            if not session["retired"]:
+                path = self.state_dir / f"{session['fingerprint_id']}.json"
+                tmp_path = path.with_suffix(".tmp")
+                context.storage_state(path=str(tmp_path))
+                os.replace(tmp_path, path)
+                self._saved(session)
+        finally:
+            self._release(session["id"])
+
+    async def async_save(self, session: dict, context: AsyncBrowserContext):
+        """Async API counterpart of save."""
+        try:
+            if not session["retired"]:
+                path = self.state_dir / f"{session['fingerprint_id']}.json"
+                tmp_path = path.with_suffix(".tmp")
+                await context.storage_state(path=str(tmp_path))
+                os.replace(tmp_path, path)
+                self._saved(session)
+        finally:
+            self._release(session["id"])
+
+    def log_summary(self, logger: logging.Logger, stage: str):
+        """Logs warm vs cold load latency and failure rate, then resets the counters."""
+        for kind in ("warm", "cold"):
+            run = self.run_stats[kind]
+            if not run["sessions"]:
+                continue
+            failure_rate = run["failures"] / run["pages"] * 100 if run["pages"] else 0.0
+            avg_latency = run["latency"] / run["timed"] if run["timed"] else 0.0
+            first_latency = run["first_latency"] / run["first_timed"] if run["first_timed"] else 0.0
+            logger.info(
+                f"{stage}: {run['sessions']} {kind} sessions, {run['pages']} pages, "
+                f"{failure_rate:.1f}% failed, avg load {avg_latency:.2f}s, "
+                f"first load {first_latency:.2f}s")
+        self.reset_stats()
+
+def open_session_state_store(
+    db: dict,
+    paths_dict: dict,
+    site: str,
+    session_config: dict | None = None) -> SessionStateStore | None:
+    """
+    Builds the session state store from the "session_state" config section.
+    Returns None when disabled, which keeps a fresh context per stage.
+    """
+    session_config = dict(session_config or {})
+    if not session_config.pop("enabled", True):
+        return None
+    return SessionStateStore(db, paths_dict["data_dir"] / "sessions", site, **session_config)
@@ -4,7 +4,7 @@ import random
 
 from playwright.sync_api import sync_playwright
 from utilities.stealth import stealth_context, human_scroll
-from utilities.utils import setup_loggers, slugify
+from utilities.utils import setup_loggers, slugify, scaled_delay
 from typing import Optional, Tuple, Any
 from bs4.element import Tag
 
@@ -32,6 +32,25 @@ def specific_site_setup(SITE_REGISTRY: dict, site_name: str) -> tuple:
 
     return specific_site_config, seed_url
 
+def resolve_extraction(specific_site_config, extraction_config: dict | None = None) -> dict | None:
+    """
+    Settings of the in-browser extraction mode from the "extraction" config
+    section. Returns None for mode "html" (default) or when the adapter has
+    no JS extractors, which keeps the page.content() + parser flow.
+    """
+    extraction_config = extraction_config or {}
+    if extraction_config.get("mode", "html") != "browser":
+        return None
+    if not (specific_site_config.search_extractor_js and specific_site_config.product_extractor_js):
+        logger.info(f"{specific_site_config.SITE_NAME} has no in-browser extractors. Keeping HTML extraction")
+        return None
+    return {
+        "site": specific_site_config,
+        "search_js": specific_site_config.search_extractor_js,
+        "product_js": specific_site_config.product_extractor_js,
+        "archive_html": extraction_config.get("archive_html", True),
+    }
+
 class AmazonConfig:
     """
     Amazon-specific configuration class.
@@ -40,6 +59,9 @@ class AmazonConfig:
     
     SITE_NAME = "Amazon"
     pagination_mode = "algorithmic"
+    # Bump when the parsers' output changes: the parse manifest then
+    # re-parses pages parsed by an older version (utilities/parse_manifest.py)
+    parser_version = 1
 
     def __init__(self):
         
@@ -54,6 +76,42 @@ class AmazonConfig:
         self.price_selector = ("span", "a-price-whole")
         self.currency_selector = ("span", "a-price-symbol")
 
+        # Subtrees the parsers need to build (tag name, attrs)
+        self.search_results_container = ("div", {"data-component-type": "s-search-result"})
+        self.product_page_container = None
+
+        # Resource blocking rules (regex on request URLs). Allow wins over deny
+        self.blocked_url_patterns = [
+            r"amazon-adsystem\.com",
+            r"fls-na\.amazon\.com",
+            r"unagi(-na)?\.amazon\.com",
+            r"/uedata",
+            r"/rd/uedata",
+        ]
+        self.allowed_url_patterns = [
+            # Captcha challenges must render to be noticed
+            r"/captcha/",
+        ]
+
+        # Fetch strategy: "http_first" tries a plain HTTP client and only
+        # renders in Playwright when the required selector is missing from the
+        # raw HTML; "browser" always renders. Amazon answers plain clients
+        # with bot checks, so it stays on the browser
+        self.fetch_strategy = "browser"
+        self.http_required_selectors = {
+            "search": self.selector_to_start_process,
+            "product": None,
+        }
+
+        # In-browser extractors (extraction mode "browser"). Not available:
+        # Amazon search results carry no product links for the product stages
+        self.search_extractor_js = None
+        self.product_extractor_js = None
+
+        # Response capture (utilities/response_capture.py): nothing to capture
+        self.capture_url_patterns = []
+        self.embedded_state_js = None
+
     # ---------------------------
     # URL Construction
     # ---------------------------
@@ -114,7 +172,10 @@ class AmazonConfig:
     # ---------------------------
     def product_extraction(self, soup: Tag) -> list[dict]:
 
-        containers = soup.find_all("div", attrs={"data-component-type": "s-search-result"})
+        containers = soup.find_all(
+            self.search_results_container[0],
+            attrs=self.search_results_container[1]
+        )
 
         products_of_page = list()
 
@@ -157,6 +218,96 @@ class AmazonConfig:
 
 ####################################################
 
+# In-browser extractors (page.evaluate). They mirror product_extraction and
+# individual_product_data_extraction selector for selector and return the
+# same fields, minus the slug, which is computed in Python with slugify.
+# textOf matches BeautifulSoup's get_text(strip=True): every text node
+# stripped, then joined.
+MERCADOLIBRE_SEARCH_EXTRACTOR_JS = """
+() => {
+    const textOf = (el) => {
+        if (!el) return null;
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        let text = "";
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            text += node.nodeValue.trim();
+        }
+        return text;
+    };
+    const imageOf = (img) => {
+        if (!img) return null;
+        const dataSrc = img.getAttribute("data-src");
+        if (dataSrc) return dataSrc;
+        const src = img.getAttribute("src");
+        return src && !src.startsWith("data:image") ? src : null;
+    };
+    const seenImages = new Set();
+
+    return Array.from(document.querySelectorAll("li.ui-search-layout__item")).map((container) => {
+        const priceText = textOf(container.querySelector("span.andes-money-amount__fraction"));
+        const price = priceText ? parseInt(priceText.replace(/\\./g, ""), 10) : NaN;
+
+        let image = imageOf(container.querySelector("img"));
+        if (image && seenImages.has(image)) image = null;
+        if (image) seenImages.add(image);
+        const idMatch = image ? image.match(/MLA(\\d+)/) : null;
+
+        const linkTag = container.querySelector("a.poly-component__title");
+        let link = linkTag ? linkTag.getAttribute("href") || null : null;
+        if (link && link.startsWith("https://click")) link = null;
+
+        return {
+            name: textOf(container.querySelector("h3.poly-component__title-wrapper")),
+            product_id: idMatch ? `MLA${idMatch[1]}` : null,
+            currency: "ARS",
+            price: Number.isNaN(price) ? null : price,
+            link: link,
+            images: [image],
+        };
+    });
+}
+"""
+
+MERCADOLIBRE_PRODUCT_EXTRACTOR_JS = """
+() => {
+    const textOf = (el) => {
+        if (!el) return null;
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        let text = "";
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            text += node.nodeValue.trim();
+        }
+        return text;
+    };
+    const img = document.querySelector("img");
+    let image = null;
+    if (img) {
+        const src = img.getAttribute("src");
+        image = img.getAttribute("data-src") || (src && !src.startsWith("data:image") ? src : null);
+    }
+    const idMatch = image ? image.match(/MLA(\\d+)/) : null;
+
+    const priceText = textOf(document.querySelector("span.andes-money-amount__fraction"));
+    const price = priceText ? parseInt(priceText.replace(/\\./g, ""), 10) : NaN;
+
+    const linkTag = document.querySelector("a.poly-component__title");
+    let link = linkTag ? linkTag.getAttribute("href") || null : null;
+    if (link && link.startsWith("https://click")) link = null;
+
+    return {
+        name: textOf(document.querySelector("h1.ui-pdp-title")),
+        price: Number.isNaN(price) ? null : price,
+        currency: "ARS",
+        product_code: idMatch ? `MLA${idMatch[1]}` : null,
+        product_url: link,
+        reviews: textOf(document.querySelector("p.andes-visually-hidden")),
+        images: [image],
+    };
+}
+"""
+
+####################################################
+
 class MercadoLibreConfig:
     """
     Mercado Libre-specific configuration class.
@@ -165,6 +316,7 @@ class MercadoLibreConfig:
 
     SITE_NAME = "MercadoLibre"
     pagination_mode = "dynamic"
+    parser_version = 1
 
     def __init__(self):
 
@@ -190,67 +342,110 @@ class MercadoLibreConfig:
         self.selector_to_start_process_in_individual_product_pages = "a.poly-component__title"
         self.individual_product_name_selector = ("h1", "ui-pdp-title")
 
+        # Subtrees the parsers need to build (tag name, attrs)
+        self.search_results_container = ("li", {"class": self.product_container_selector[1]})
+        self.product_page_container = (["h1", "span", "img", "a", "p"], None)
+
+        # Resource blocking rules (regex on request URLs). Allow wins over deny
+        self.blocked_url_patterns = [
+            r"/tracks\b",
+            r"melidata",
+            r"mercadoclics\.com",
+            r"adservices?\.mercadolibre",
+            r"/recommendations/",
+        ]
+        self.allowed_url_patterns = []
+
+        # Fetch strategy (see AmazonConfig). Listing and product pages are
+        # server-rendered, so the plain HTTP response usually has the data
+        self.fetch_strategy = "http_first"
+        self.http_required_selectors = {
+            "search": self.selector_to_start_process,
+            "product": "h1.ui-pdp-title",
+        }
+
+        # In-browser extractors (extraction mode "browser")
+        self.search_extractor_js = MERCADOLIBRE_SEARCH_EXTRACTOR_JS
+        self.product_extractor_js = MERCADOLIBRE_PRODUCT_EXTRACTOR_JS
+
+        # Response capture (utilities/response_capture.py): listing/item API
+        # responses and the state the page is rendered from
+        self.capture_url_patterns = [
+            r"api\.mercadolibre\.com/(sites/[A-Z]+/search|items)",
+            r"mercadolibre\.com\.ar/.*/api/",
+        ]
+        self.embedded_state_js = "() => window.__PRELOADED_STATE__ || null"
+
     # ---------------------------
     # URL Construction
     # ---------------------------
-    def discover_first_paginated_url(self, seed_url: str) -> str | None:
+    def discover_first_paginated_url(self, seed_url: str, browser = None) -> str | None:
         """
         Fetch the first MercadoLibre canonical URL.
+        Uses the given (shared) browser when provided, else launches its own.
         """
+        if browser is not None:
+            return self._discover_first_paginated_url(browser, seed_url)
 
         with sync_playwright() as p:
-
-            loaded = False
-            seed_url = self.seed_urls[0]
             browser = p.chromium.launch(
             headless=False
             )
             try:
-                context = stealth_context(browser)
-                page = context.new_page()
+                return self._discover_first_paginated_url(browser, seed_url)
+            finally:
+                browser.close()
+
+    def _discover_first_paginated_url(self, browser, seed_url: str) -> str | None:
 
-                # Fetch page 1 of ML
+        loaded = False
+        seed_url = self.seed_urls[0]
+        context = stealth_context(browser)
+        try:
+            page = context.new_page()
+
+            # Fetch page 1 of ML
+            try:
+                page.goto(seed_url, timeout=30000)
+                loaded = True
+            except Exception:
+                error_logger.warning(f"First failure on {seed_url}", exc_info=True)
+                time.sleep(scaled_delay(random.uniform(15, 25)))
+
+            # Second try
+            if not loaded:
                 try:
-                    page.goto(seed_url, timeout=30000)
+                    time.sleep(scaled_delay(random.uniform(11, 14)))
+                    page.reload(timeout=30000)
                     loaded = True
+                    logger.info(f"URL: {seed_url} succesfully loaded")
                 except Exception:
-                    error_logger.warning(f"First failure on {seed_url}", exc_info=True)
-                    time.sleep(random.uniform(15, 25))
-
-                # Second try
-                if not loaded:
-                    try:
-                        time.sleep(random.uniform(11, 14))
-                        page.reload(timeout=30000)
-                        loaded = True
-                        logger.info(f"URL: {seed_url} succesfully loaded")
-                    except Exception:
-                        error_logger.warning(f"Second failure on {seed_url}", exc_info=True) 
-                        return None  
-                
-                # If page loaded, proceed and scroll
-                if loaded:
-                    try:
-                        print(f"Scrolling for {seed_url}")
-                        human_scroll(page, min_increment=200, max_increment=450,  timeout=15.0)
-                    except Exception:
-                        error_logger.error(f"Scrolling error on {seed_url}", exc_info=True)
-
-                # Go to the end
-                page.locator("body").press("End")
-
-                # Click "Siguiente"
-                page.click("li.andes-pagination__button--next a")
-
-                # This is the first canonical paginated URL
-                time.sleep(random.uniform(4, 6))
-                canonical_url = page.url
-                if not canonical_url:
-                    print("Could not fetch canonical url")
-                    return None
-                return canonical_url
-            finally:
-                browser.close()
+                    error_logger.warning(f"Second failure on {seed_url}", exc_info=True) 
+                    return None  
+            
+            # If page loaded, proceed and scroll
+            if loaded:
+                try:
+                    print(f"Scrolling for {seed_url}")
+                    human_scroll(page, min_increment=200, max_increment=450,  timeout=scaled_delay(15.0))
+                except Exception:
+                    error_logger.error(f"Scrolling error on {seed_url}", exc_info=True)
+
+            # Go to the end
+            page.locator("body").press("End")
+
+            # Click "Siguiente"
+            page.click("li.andes-pagination__button--next a")
+
+            # This is the first canonical paginated URL
+            time.sleep(scaled_delay(random.uniform(4, 6)))
+            canonical_url = page.url
+            if not canonical_url:
+                print("Could not fetch canonical url")
+                return None
+            return canonical_url
+        finally:
+            context.close()
 
     def build_pagination_url(self, canonical_url: str, page_number: int) -> str:
         "Algorithmic Mercado libre URL generator."
@@ -453,4 +648,168 @@ class MercadoLibreConfig:
 
         })
 
-        return product
\ No newline at end of file
+        return product
+
+    # ---------------------------
+    # Captured JSON parsing
+    # ---------------------------
+    @staticmethod
+    def _json_objects(data: Any, *keys: str):
+        """Yields every dict nested in data that has all of keys."""
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if all(key in node for key in keys):
+                    yield node
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+
+    @staticmethod
+    def _absolute_link(link: Optional[str]) -> Optional[str]:
+        if not link or link.startswith("https://click"):
+            return None
+        return link if link.startswith("http") else f"https://{link}"
+
+    @staticmethod
+    def _item_code(text: Optional[str]) -> Optional[str]:
+        """MLA code of an item id or URL (MLA-123 and MLA123 both give MLA123)."""
+        if not text:
+            return None
+        m = re.search(r'MLA-?(\d+)', str(text))
+        return f"MLA{m.group(1)}" if m else None
+
+    @staticmethod
+    def _same_page(link: Optional[str], product_url: str) -> bool:
+        if not link:
+            return False
+        return link.split("?")[0].split("#")[0].rstrip("/") == product_url.split("?")[0].split("#")[0].rstrip("/")
+
+    def json_product_extraction(self, payloads: list[dict]) -> list[dict]:
+        """
+        Search results from captured payloads, in product_extraction's shape.
+        Only the "results" list of a search API response or of the embedded
+        search state is read (item results with id, title, price, permalink,
+        or polycards), so ads, carousels and recommendations are left out.
+        Empty when no payload has results.
+        """
+        products = []
+        seen_links = set()
+
+        def add(name, product_id, price, currency, link, img):
+            link = self._absolute_link(link)
+            if link is None or link in seen_links:
+                return
+            seen_links.add(link)
+            products.append({
+                "name": name,
+                "slug": slugify(name) if name else None,
+                "product_id": product_id,
+                "currency": currency or 'ARS',
+                "price": int(price) if price is not None else None,
+                "link": link,
+                "images": [img],
+            })
+
+        for payload in payloads:
+            for container in self._json_objects(payload.get("data"), "results"):
+                results = container["results"]
+                if not isinstance(results, list):
+                    continue
+                for item in results:
+                    if not isinstance(item, dict):
+                        continue
+                    if all(key in item for key in ("id", "title", "price", "permalink")):
+                        add(item["title"], item["id"], item["price"], item.get("currency_id"),
+                            item["permalink"], item.get("thumbnail"))
+                    elif isinstance(item.get("polycard"), dict):
+                        polycard = item["polycard"]
+                        metadata = polycard.get("metadata") or {}
+                        components = {c.get("type"): c for c in polycard.get("components") or [] if isinstance(c, dict)}
+                        title = (components.get("title") or {}).get("title") or {}
+                        price = ((components.get("price") or {}).get("price") or {}).get("current_price") or {}
+                        pictures = (polycard.get("pictures") or {}).get("pictures") or [{}]
+                        add(title.get("text"), metadata.get("id"), price.get("value"), price.get("currency"),
+                            metadata.get("url"), pictures[0].get("url"))
+
+        return products
+
+    def json_individual_product_extraction(self, payloads: list[dict], product_url: Optional[str] = None) -> dict | None:
+        """
+        Product data from captured payloads, in individual_product_data_extraction's
+        shape. Reads the item API response or embedded product state whose id
+        or permalink matches product_url, so carousels and recommendations
+        in the same payloads are never taken for the product. Reviews are not
+        in the payloads (None). None when no payload describes this product.
+        """
+        if not product_url:
+            return None
+        code = self._item_code(product_url)
+
+        for payload in payloads:
+            data = payload.get("data")
+            for item in self._json_objects(data, "id", "title", "price", "permalink"):
+                if self._item_code(item["id"]) != code and not self._same_page(self._absolute_link(item["permalink"]), product_url):
+                    continue
+                pictures = item.get("pictures") or [{}]
+                return {
+                    "name": item["title"],
+                    "slug": slugify(item["title"]) if item["title"] else None,
+                    "price": int(item["price"]) if item["price"] is not None else None,
+                    "currency": item.get("currency_id") or 'ARS',
+                    "product_code": item["id"],
+                    "product_url": self._absolute_link(item["permalink"]),
+                    "reviews": None,
+                    "images": [pictures[0].get("secure_url") or item.get("thumbnail")],
+                }
+            for state in self._json_objects(data, "id", "components"):
+                if code is None or self._item_code(state["id"]) != code:
+                    continue
+                components = state["components"] if isinstance(state["components"], dict) else {}
+                name = (components.get("header") or {}).get("title")
+                price = ((components.get("price") or {}).get("price") or {})
+                if not name:
+                    continue
+                return {
+                    "name": name,
+                    "slug": slugify(name),
+                    "price": int(price["value"]) if price.get("value") is not None else None,
+                    "currency": price.get("currency_id") or 'ARS',
+                    "product_code": state["id"],
+                    "product_url": None,
+                    "reviews": None,
+                    "images": [None],
+                }
+        return None
+
+    # ---------------------------
+    # In-browser extraction results
+    # ---------------------------
+    def products_from_extractor(self, rows: list[dict]) -> list[dict]:
+        """Completes search_extractor_js results into product_extraction's shape."""
+        return [
+            {
+                "name": row["name"],
+                "slug": slugify(row["name"]) if row["name"] else None,
+                "product_id": row["product_id"],
+                "currency": row["currency"],
+                "price": row["price"],
+                "link": row["link"],
+                "images": row["images"],
+            }
+            for row in rows
+        ]
+
+    def product_from_extractor(self, data: dict) -> dict:
+        """Completes a product_extractor_js result into individual_product_data_extraction's shape."""
+        return {
+            "name": data["name"],
+            "slug": slugify(data["name"]) if data["name"] else None,
+            "price": data["price"],
+            "currency": data["currency"],
+            "product_code": data["product_code"],
+            "product_url": data["product_url"],
+            "reviews": data["reviews"],
+            "images": data["images"],
+        }
\ No newline at end of file
@@ -2,10 +2,47 @@ import time
 import random
 
 from playwright.sync_api import Browser, BrowserContext, ViewportSize, Page
+from playwright.async_api import Browser as AsyncBrowser
+from playwright.async_api import BrowserContext as AsyncBrowserContext
+from playwright.async_api import Page as AsyncPage
 
-def stealth_context(browser: Browser) -> BrowserContext:
+# Init scripts applied to every stealth context (sync and async)
+STEALTH_INIT_SCRIPTS = [
+    #Set language for whole context
+    """
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['es-ES', 'es']
+    });
+    """,
+
+    # Hide webdriver
+    "Object.defineProperty(navigator, 'webdriver', { get: () => false })",
+
+    #Add plugins
+    """Object.defineProperty(navigator, 'plugins', { get: () => [1,2,3,4,5] });
+    """,
+
+    #Hardware concurrency
+    "Object.defineProperty(navigator, 'hardwareConcurrency', { get: () => 4 })",
+
+    #Permissions API
+    """
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications'
+            ? Promise.resolve({ state: 'denied' })
+            : originalQuery(parameters)
+    );
+    """,
+]
 
-    ua = random.choice([
+def random_fingerprint() -> dict:
+    """
+    Draws the randomized parts of a stealth context: user agent, viewport,
+    device scale factor and referer. JSON-serializable, so a fingerprint can
+    be saved next to the session state it was used with.
+    """
+    user_agent = random.choice([
         # Desktop Chrome-like UAs
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
         "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -20,59 +57,208 @@ def stealth_context(browser: Browser) -> BrowserContext:
         "height": random.randint(720, 1080)
     }
 
-    context = browser.new_context(
-        user_agent=ua,
-        viewport=viewport,
+    return {
+        "user_agent": user_agent,
+        "viewport": viewport,
+        "device_scale_factor": random.choice([1, 1.25, 1.5]),
+        "referer": random.choice([
+            "https://www.google.com",
+            "https://www.bing.com",
+            "https://www.yahoo.com",
+            "https://www.duckduckgo.com",
+        ]),
+    }
+
+def stealth_context_options(fingerprint: dict | None = None) -> dict:
+    """
+    Returns keyword arguments for browser.new_context() built from
+    fingerprint (a fresh random_fingerprint() when not given).
+    """
+    fingerprint = fingerprint or random_fingerprint()
+
+    return dict(
+        user_agent=fingerprint["user_agent"],
+        viewport=fingerprint["viewport"],
         locale="en-US",
         color_scheme="dark",
         java_script_enabled=True,
-        device_scale_factor=random.choice([1, 1.25, 1.5]),
+        device_scale_factor=fingerprint["device_scale_factor"],
         is_mobile=False,
         has_touch=False,
         extra_http_headers={
             "Accept-Language": "es-ES,es;q=0.9",
             "DNT": "1",
-            "Referer": random.choice([
-                "https://www.google.com",
-                "https://www.bing.com",
-                "https://www.yahoo.com",
-                "https://www.duckduckgo.com",
-            ])
+            "Referer": fingerprint["referer"]
         })
-    
-    
-    #Set language for whole context
-    context.add_init_script("""
-    Object.defineProperty(navigator, 'languages', {
-        get: () => ['es-ES', 'es']
-    });
-    """)
 
-    # Hide webdriver
-    context.add_init_script(
-        "Object.defineProperty(navigator, 'webdriver', { get: () => false })"
-    )
+def _session_context_options(session: dict | None) -> dict:
+    """Context options for a session checked out of a SessionStateStore."""
+    if session is None:
+        return stealth_context_options()
+    options = stealth_context_options(session["fingerprint"])
+    if session["storage_state"] is not None:
+        options["storage_state"] = session["storage_state"]
+    return options
 
-    #Add plugins
-    context.add_init_script("""Object.defineProperty(navigator, 'plugins', { get: () => [1,2,3,4,5] });
-    """)
+def stealth_context(browser: Browser, resource_blocker=None, asset_cache=None, session=None) -> BrowserContext:
+    """
+    Builds a randomized stealth context.
+    session (from utilities.session_state.SessionStateStore.checkout), when
+    given, fixes the fingerprint and restores its saved cookies/localStorage.
+    resource_blocker (utilities.resource_blocking.ResourceBlocker), when given,
+    aborts heavy resource requests on the whole context.
+    asset_cache (utilities.asset_cache.AssetCache), when given, serves static
+    assets from disk. Routes run last-installed first, so blocked requests
+    never reach the cache.
+    """
 
-    #Hardware concurrency
-    context.add_init_script("Object.defineProperty(navigator, 'hardwareConcurrency', { get: () => 4 })")
+    context = browser.new_context(**_session_context_options(session))
 
-    #Permissions API
-    context.add_init_script("""
-    const originalQuery = window.navigator.permissions.query;
-    window.navigator.permissions.query = (parameters) => (
-        parameters.name === 'notifications'
-            ? Promise.resolve({ state: 'denied' })
-            : originalQuery(parameters)
-    );
-    """)
+    for script in STEALTH_INIT_SCRIPTS:
+        context.add_init_script(script)
+
+    if asset_cache is not None:
+        asset_cache.install(context)
+    if resource_blocker is not None:
+        resource_blocker.install(context)
+
+    return context
+
+async def async_stealth_context(
+    browser: AsyncBrowser,
+    resource_blocker=None,
+    asset_cache=None,
+    session=None) -> AsyncBrowserContext:
+    """Async API counterpart of stealth_context."""
+
+    context = await browser.new_context(**_session_context_options(session))
+
+    for script in STEALTH_INIT_SCRIPTS:
+        await context.add_init_script(script)
+
+    if asset_cache is not None:
+        await asset_cache.async_install(context)
+    if resource_blocker is not None:
+        await resource_blocker.async_install(context)
 
     return context
 
 
+# Scroll profiles for in_page_scroll. Increments in px, pauses in ms.
+# stop_after_idle_steps: stop once the item count has not grown for that
+# many steps (0 disables the early stop).
+SCROLL_PROFILES = {
+    # Same rhythm as human_scroll
+    "human": {
+        "min_increment": 200, "max_increment": 450,
+        "min_pause": 880, "max_pause": 1900,
+        "long_pause_chance": 0.05, "min_long_pause": 700, "max_long_pause": 1300,
+        "stop_after_idle_steps": 4,
+    },
+    "careful": {
+        "min_increment": 150, "max_increment": 350,
+        "min_pause": 1200, "max_pause": 2600,
+        "long_pause_chance": 0.10, "min_long_pause": 1000, "max_long_pause": 2500,
+        "stop_after_idle_steps": 6,
+    },
+    "fast": {
+        "min_increment": 600, "max_increment": 1000,
+        "min_pause": 120, "max_pause": 350,
+        "long_pause_chance": 0.0, "min_long_pause": 0, "max_long_pause": 0,
+        "stop_after_idle_steps": 3,
+    },
+}
+
+# Whole scroll loop in one page.evaluate call: no per-step IPC round trips
+IN_PAGE_SCROLL_JS = """
+async ({ itemSelector, profile, timeoutMs }) => {
+    const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+    const between = (low, high) => low + Math.random() * (high - low);
+    const countItems = () => itemSelector ? document.querySelectorAll(itemSelector).length : null;
+
+    const startedAt = performance.now();
+    let height = document.body.scrollHeight;
+    let position = 0;
+    let steps = 0;
+    let itemsSeen = countItems();
+    let lastGrowthStep = 0;
+    let stopReason = "bottom";
+
+    while (position < height) {
+        if (performance.now() - startedAt > timeoutMs) {
+            stopReason = "timeout";
+            break;
+        }
+        position = Math.min(position + between(profile.min_increment, profile.max_increment), height);
+        window.scrollTo(0, position);
+        steps += 1;
+
+        await sleep(between(profile.min_pause, profile.max_pause));
+        if (Math.random() < profile.long_pause_chance) {
+            await sleep(between(profile.min_long_pause, profile.max_long_pause));
+        }
+
+        // More products may have been appended
+        height = document.body.scrollHeight;
+
+        if (itemSelector) {
+            const current = countItems();
+            if (current > itemsSeen) {
+                itemsSeen = current;
+                lastGrowthStep = steps;
+            } else if (profile.stop_after_idle_steps && steps - lastGrowthStep >= profile.stop_after_idle_steps) {
+                stopReason = "items_stable";
+                break;
+            }
+        }
+    }
+
+    return {
+        steps: steps,
+        final_height: height,
+        position: Math.round(position),
+        items_seen: itemsSeen,
+        stop_reason: stopReason,
+        elapsed_ms: Math.round(performance.now() - startedAt),
+    };
+}
+"""
+
+def resolve_scroll_profile(scroll_config: dict | None = None) -> dict:
+    """
+    Builds the scroll settings from the "scroll" config section: a named
+    profile, optional per-key overrides and the timeout in seconds.
+    """
+    scroll_config = dict(scroll_config or {})
+    name = scroll_config.pop("profile", "human")
+    if name not in SCROLL_PROFILES:
+        raise ValueError(f"Unsupported scroll profile: {name}")
+    timeout = scroll_config.pop("timeout", 15.0)
+    profile = {**SCROLL_PROFILES[name], **scroll_config}
+    return {"name": name, "profile": profile, "timeout": timeout}
+
+def in_page_scroll(page: Page, item_selector: str | None = None, scroll_settings: dict | None = None) -> dict:
+    """
+    Scrolls down the page like a human, entirely inside the page.
+    Stops at the bottom, on timeout, or once the item_selector count stops
+    growing. Returns steps, final_height, items_seen, stop_reason, elapsed_ms.
+    """
+    scroll_settings = scroll_settings or resolve_scroll_profile()
+    return page.evaluate(IN_PAGE_SCROLL_JS, {
+        "itemSelector": item_selector,
+        "profile": scroll_settings["profile"],
+        "timeoutMs": scroll_settings["timeout"] * 1000,
+    })
+
+async def async_in_page_scroll(page: AsyncPage, item_selector: str | None = None, scroll_settings: dict | None = None) -> dict:
+    """Async API counterpart of in_page_scroll."""
+    scroll_settings = scroll_settings or resolve_scroll_profile()
+    return await page.evaluate(IN_PAGE_SCROLL_JS, {
+        "itemSelector": item_selector,
+        "profile": scroll_settings["profile"],
+        "timeoutMs": scroll_settings["timeout"] * 1000,
+    })
+
 def human_scroll(page: Page, min_increment=200, max_increment=450,  timeout=15.0):
     """Scrolls down the page like a human."""
     
@@ -0,0 +1,179 @@
+import time
+import random
+import asyncio
+import threading
+
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from utilities.utils import setup_loggers, BLOCK_STATUSES
+
+#Logging setup
+logger, error_logger = setup_loggers()
+
+# Seconds between checks for a free slot while a host is at its concurrency
+SLOT_POLL_INTERVAL = 0.05
+
+class AdaptiveThrottle:
+    """
+    AutoThrottle-style per-host rate limiter.
+    Each fetch reports its stats (status, latency, timeouts, blocked) and the
+    throttle tunes that host's delay and allowed concurrency:
+      - healthy responses move the delay towards latency / target_concurrency
+        and, after increase_after in a row, allow one more request in flight;
+      - timeouts and failures multiply the delay by backoff_factor;
+      - block signals (403/429/503, captcha) also halve the concurrency.
+    Delay stays within [min_delay, max_delay] and concurrency within
+    [min_concurrency, max_concurrency].
+    Host state is shared by every thread and event loop of the run (pipelined
+    stages run their own loops in their own threads) and guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        start_delay: float = 30.0,
+        min_delay: float = 5.0,
+        max_delay: float = 120.0,
+        target_concurrency: float = 1.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 4,
+        backoff_factor: float = 2.0,
+        increase_after: int = 5,
+        jitter: float = 0.2,
+        long_pause_every: int = 5,
+        long_pause_factor: float = 2.0):
+
+        self.start_delay = start_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_concurrency = target_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.backoff_factor = backoff_factor
+        self.increase_after = increase_after
+        self.jitter = jitter
+        self.long_pause_every = long_pause_every
+        self.long_pause_factor = long_pause_factor
+        self._hosts: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _clamp_delay(self, delay: float) -> float:
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def _host_state(self, url: str) -> dict:
+        host = urlsplit(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = {
+                    "host": host,
+                    "delay": self._clamp_delay(self.start_delay),
+                    "concurrency": self.min_concurrency,
+                    "healthy_streak": 0,
+                    "in_flight": 0,
+                    "next_start": 0.0,
+                }
+                self._hosts[host] = state
+            return state
+
+    # ---------------------------
+    # Feedback
+    # ---------------------------
+
+    def record(self, url: str, stats: dict):
+        """
+        Updates the host's delay and concurrency from one fetch's stats,
+        as filled by process_single_url(stats=...).
+        """
+        state = self._host_state(url)
+        status = stats.get("status")
+        latency = stats.get("latency")
+        blocked = stats.get("blocked") or status in BLOCK_STATUSES
+
+        with self._lock:
+            old_delay, old_concurrency = state["delay"], state["concurrency"]
+            if blocked:
+                state["delay"] = self._clamp_delay(old_delay * self.backoff_factor)
+                state["concurrency"] = max(self.min_concurrency, old_concurrency // 2)
+                state["healthy_streak"] = 0
+            elif latency is None or stats.get("timeouts") or (status is not None and status >= 400):
+                state["delay"] = self._clamp_delay(old_delay * self.backoff_factor)
+                state["healthy_streak"] = 0
+            else:
+                target_delay = latency / self.target_concurrency
+                state["delay"] = self._clamp_delay(max(target_delay, (old_delay + target_delay) / 2))
+                state["healthy_streak"] += 1
+                if state["healthy_streak"] >= self.increase_after:
+                    state["concurrency"] = min(self.max_concurrency, old_concurrency + 1)
+                    state["healthy_streak"] = 0
+
+            # A longer delay applies to the next start right away
+            if state["delay"] > old_delay:
+                state["next_start"] = max(state["next_start"], time.monotonic() + state["delay"])
+
+        if blocked or state["concurrency"] != old_concurrency:
+            logger.info(
+                f"Throttle {state['host']}: delay {old_delay:.1f}s -> {state['delay']:.1f}s, "
+                f"concurrency {old_concurrency} -> {state['concurrency']}"
+                f"{' (block signal)' if blocked else ''}")
+
+    # ---------------------------
+    # Delays
+    # ---------------------------
+
+    def delay_for(self, url: str, page_number: int | None = None) -> float:
+        """
+        Jittered delay to wait after a request to url's host. Every
+        long_pause_every pages the delay is stretched to mimic a browsing pause.
+        """
+        return self._jittered(self._host_state(url)["delay"], page_number)
+
+    def _jittered(self, delay: float, page_number: int | None = None) -> float:
+        if page_number and self.long_pause_every and page_number % self.long_pause_every == 0:
+            delay *= self.long_pause_factor
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Asyncio counterpart of HostScheduler.slot with adaptive limits:
+        waits for a free in-flight slot under the host's current concurrency
+        and for the host's current delay since the previous start.
+        Slots and start times are reserved under the thread lock, so the
+        host's limits hold across the event loops of pipelined stages; each
+        loop then sleeps until its reserved start.
+        """
+        state = self._host_state(url)
+        while True:
+            with self._lock:
+                if state["in_flight"] < state["concurrency"]:
+                    state["in_flight"] += 1
+                    start_at = max(state["next_start"], time.monotonic())
+                    state["next_start"] = start_at + self._jittered(state["delay"])
+                    break
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            wait_time = start_at - time.monotonic()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+            yield
+        finally:
+            with self._lock:
+                state["in_flight"] -= 1
+
+    def snapshot(self) -> dict:
+        """Current delay and concurrency per host."""
+        with self._lock:
+            return {
+                host: {"delay": round(state["delay"], 2), "concurrency": state["concurrency"]}
+                for host, state in self._hosts.items()
+            }
+
+def build_throttle(throttle_config: dict | None = None) -> AdaptiveThrottle | None:
+    """
+    Builds the throttle from the "throttle" config section.
+    Returns None when disabled, which keeps the fixed random sleeps.
+    """
+    throttle_config = dict(throttle_config or {})
+    if not throttle_config.pop("enabled", True):
+        return None
+    return AdaptiveThrottle(**throttle_config)
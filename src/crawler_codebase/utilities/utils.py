@@ -8,7 +8,8 @@ import unicodedata
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import Page
 from pathlib import Path
-from utilities.stealth import human_scroll
+from contextlib import contextmanager
+from utilities.stealth import in_page_scroll
 
 #Def Now
 def now_with_hours() -> str:
@@ -91,8 +92,23 @@ def setup_directories_pathlib() -> dict:
 
     return paths_dict
 
+# Factor applied to the crawler's fixed sleeps. 1.0 in real runs; the local
+# end-to-end harness (benchmarks/bench_end_to_end.py) shrinks it so a full
+# crawl against the mock shop takes seconds
+_delay_scale = 1.0
+
+def set_delay_scale(scale: float):
+    global _delay_scale
+    _delay_scale = scale
+
+def scaled_delay(seconds: float) -> float:
+    """seconds of a fixed sleep, scaled by set_delay_scale()."""
+    return seconds * _delay_scale
+
 def countdown_sleep_timer(waiting_time: float):
     remaining = int(waiting_time)
+    # The fraction of a second is slept too (short throttle delays, scaled sleeps)
+    time.sleep(max(0.0, waiting_time - remaining))
 
     while remaining > 0:
         print(f"Waiting… {remaining} seconds remaining".ljust(40), end="\r", flush=True)
@@ -101,29 +117,132 @@ def countdown_sleep_timer(waiting_time: float):
     print() # move to clean line
     print("Waiting… done.            ")
 
-def load_page(page: Page, url: str, wait_selector: str, max_attempts: int=2) -> bool:
+# HTTP statuses that mean the site is pushing back
+BLOCK_STATUSES = {403, 429, 503}
+
+# Selectors whose presence means a captcha or block page was served
+BLOCK_SIGNAL_SELECTORS = [
+    "form[action*='validateCaptcha']",
+    "iframe[src*='captcha']",
+    "iframe[src*='recaptcha']",
+    "#captcha",
+    "[class*='captcha']",
+]
+
+def new_fetch_stats() -> dict:
+    """
+    Per-URL fetch stats filled by load_page/process_single_url and read by
+    the adaptive throttle (utilities/throttle.py) and the metrics registry
+    (utilities/metrics.py). "phases" maps each timed phase to its seconds.
+    """
+    return {
+        "started_at": time.monotonic(),
+        "phases": {},
+        "status": None,
+        "latency": None,
+        "attempts": 0,
+        "timeouts": 0,
+        "blocked": False,
+        "ready_time": None,
+        "ready_reason": None,
+        "scroll": None,
+        "transport": "browser",
+    }
+
+@contextmanager
+def timed_phase(stats: dict, phase: str):
+    """Adds the duration of the with block to stats["phases"][phase]."""
+    started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        phases = stats.setdefault("phases", {})
+        phases[phase] = phases.get(phase, 0.0) + time.monotonic() - started_at
+
+def block_signal_detected(page: Page) -> bool:
+    """True if the current page shows a captcha or block page."""
+    try:
+        return any(page.query_selector(selector) for selector in BLOCK_SIGNAL_SELECTORS)
+    except Exception:
+        return False
+
+#Bookkeeping shared by the sync helpers below and their async_utils counterparts
+def note_response(stats: dict, response, url: str) -> bool:
+    """Records a navigation response's status. True if it is a block status."""
+    if response is not None:
+        stats["status"] = response.status
+    if stats["status"] in BLOCK_STATUSES:
+        stats["blocked"] = True
+        error_logger.warning(f"Block status {stats['status']} on {url}")
+        return True
+    return False
+
+def note_loaded(stats: dict, started_at: float, url: str, attempt: int):
+    stats["latency"] = time.monotonic() - started_at
+    logger.info(f"URL: {url} succesfully loaded on attempt {attempt}")
+
+def note_timeout(stats: dict, url: str, attempt: int):
+    stats["timeouts"] += 1
+    error_logger.warning(f"Load timeout on {url} on attempt {attempt}")
+
+def note_block_signal(stats: dict, url: str):
+    stats["blocked"] = True
+    error_logger.warning(f"Block signal (captcha) detected on {url}")
+
+def retry_delay() -> float:
+    """Seconds to wait before reloading a page that failed to load."""
+    return scaled_delay(random.uniform(15, 25))
+
+def settle_delay() -> float:
+    """Seconds to let JS finish loading after the scroll."""
+    return scaled_delay(random.uniform(3, 5))
+
+def log_scroll(url: str, scroll_stats: dict):
+    logger.info(
+        f"Scrolled {url}: {scroll_stats['steps']} steps, {scroll_stats['items_seen']} items, "
+        f"height {scroll_stats['final_height']}, {scroll_stats['elapsed_ms']} ms ({scroll_stats['stop_reason']})")
+
+def scroll_needed(readiness, result: dict) -> bool:
+    """False when the containers settled and the readiness policy skips the scroll."""
+    return not (result["ready"] and readiness.skip_scroll_when_ready)
+
+def load_page(page: Page, url: str, wait_selector: str, max_attempts: int=2, stats: dict | None = None) -> bool:
     """
     Tries to load the URL and waits for the required selector.
     Returns True if the page is ready for processing.
+    stats, when given, receives status, latency, attempts, timeouts and blocked.
     """
+    stats = stats if stats is not None else new_fetch_stats()
     #Navigation block
     success = False
     for attempt in range(1, max_attempts + 3):
+        stats["attempts"] = attempt
         try:
             #1st try
             if attempt == 1:
-                page.goto(url, timeout=30000)
+                started_at = time.monotonic()
+                with timed_phase(stats, "navigation"):
+                    response = page.goto(url, timeout=30000)
             #2nd (or n) retries
             else:
-                time.sleep(random.uniform(15, 25))
-                page.reload(timeout=30000)
+                with timed_phase(stats, "retry_sleep"):
+                    time.sleep(retry_delay())
+                started_at = time.monotonic()
+                with timed_phase(stats, "navigation"):
+                    response = page.reload(timeout=30000)
+            if note_response(stats, response, url):
+                break
             #Page loaded, wait for selector
-            page.wait_for_selector(wait_selector, timeout=8000)
+            with timed_phase(stats, "selector_wait"):
+                page.wait_for_selector(wait_selector, timeout=8000)
+            note_loaded(stats, started_at, url, attempt)
             success = True
-            logger.info(f"URL: {url} succesfully loaded on attempt {attempt}")
             break
         except PlaywrightTimeoutError:
-            error_logger.warning(f"Load timeout on {url} on attempt {attempt}")
+            note_timeout(stats, url, attempt)
+            if block_signal_detected(page):
+                note_block_signal(stats, url)
+                break
             continue
         except Exception:
             error_logger.error(f"Navigation failure on {url} on attempt {attempt}", exc_info=True)
@@ -134,24 +253,25 @@ def load_page(page: Page, url: str, wait_selector: str, max_attempts: int=2) ->
     else:
         return False
     
-def perform_scroll(page: Page, url: str) -> bool:
+def perform_scroll(page: Page, url: str, item_selector: str | None = None, scroll_settings: dict | None = None) -> dict | None:
     """
-    Scrolls the page to trigger JS loading.
-    Returns False if scrolling fails or times out.
+    Scrolls the page to trigger JS loading, in a single in-page call.
+    Returns the scroll stats, or None if scrolling fails or times out.
     """
     try:
         print(f"Scrolling for {url}")
-        human_scroll(page, min_increment=200, max_increment=450,  timeout=15.0)
-        return True
+        scroll_stats = in_page_scroll(page, item_selector, scroll_settings)
+        log_scroll(url, scroll_stats)
+        return scroll_stats
     except PlaywrightTimeoutError:
         error_logger.warning(f"Scroll timeout on {url}")
-        return False
+        return None
     except Exception:
         error_logger.error(
             f"Unexpected scroll error on {url}",
             exc_info=True
         )
-        return False
+        return None
     
 def extract_html(page: Page, url: str) -> str | None:
     """
@@ -169,27 +289,130 @@ def extract_html(page: Page, url: str) -> str | None:
             exc_info=True)
         return None
 
-def process_single_url(page: Page, url: str, logger: logging.Logger, wait_selector: str) -> str | None:
+def record_readiness(stats: dict, result: dict, ready_started_at: float, url: str):
+    """Stores and logs how long the page took to become ready."""
+    stats["ready_time"] = time.monotonic() - ready_started_at
+    stats["ready_reason"] = result["reason"]
+    logger.info(
+        f"Page ready after {stats['ready_time']:.2f}s ({result['reason']}, "
+        f"{result['count']} containers) for {url}")
 
-    #Navigation phase
-    if not load_page(page, url, wait_selector, max_attempts=2):
+def extract_structured(page: Page, url: str, extractor_js: str):
+    """
+    Runs an adapter's in-browser extractor and returns its result
+    (product dicts), or None if the extractor fails.
+    """
+    try:
+        data = page.evaluate(extractor_js)
+        logger.info(f"Extracted structured data in the browser for {url}")
+        return data
+    except Exception:
+        error_logger.error(
+            f"In-browser extraction error for {url}",
+            exc_info=True)
         return None
+
+def prepare_page(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        stats: dict,
+        readiness = None,
+        scroll_settings: dict | None = None) -> bool:
+    """
+    Loads and scrolls one URL until its content is ready. False on failure.
+    """
+    #Navigation phase
+    if not load_page(page, url, wait_selector, max_attempts=2, stats=stats):
+        return False
     logger.info(f"Target JavaScript selector detected in URL: {url}")
 
-    #Scrolling phase
-    if not perform_scroll(page, url):
-        return None
+    if readiness is None:
+        #Scrolling phase
+        with timed_phase(stats, "scroll"):
+            stats["scroll"] = perform_scroll(page, url, wait_selector, scroll_settings)
+        if not stats["scroll"]:
+            return False
 
-    #Extra delay to let JS finish loading
-    time.sleep(random.uniform(3, 5))
+        #Extra delay to let JS finish loading
+        with timed_phase(stats, "settle_sleep"):
+            time.sleep(settle_delay())
+    else:
+        #Readiness phase: scroll only when the containers are still changing
+        ready_started_at = time.monotonic()
+        with timed_phase(stats, "readiness"):
+            result = readiness.wait(page, wait_selector)
+        if scroll_needed(readiness, result):
+            with timed_phase(stats, "scroll"):
+                stats["scroll"] = perform_scroll(page, url, wait_selector, scroll_settings)
+            if not stats["scroll"]:
+                return False
+            with timed_phase(stats, "readiness"):
+                result = readiness.wait(page, wait_selector)
+            if not result["ready"]:
+                #Fallback to the fixed delay
+                with timed_phase(stats, "settle_sleep"):
+                    time.sleep(settle_delay())
+        record_readiness(stats, result, ready_started_at, url)
+
+    return True
+
+def process_single_url(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        stats: dict | None = None,
+        readiness = None,
+        scroll_settings: dict | None = None) -> str | None:
+    """
+    Loads, scrolls and returns the HTML of one URL (None on failure).
+    stats, when given, is filled with the fetch's status, latency, block
+    signals, readiness time and scroll stats.
+    readiness (utilities.readiness.PageReadiness), when given, replaces the
+    fixed post-scroll sleep with event-driven readiness detection.
+    scroll_settings comes from stealth.resolve_scroll_profile (default "human").
+    """
+    stats = stats if stats is not None else new_fetch_stats()
+    if not prepare_page(page, url, logger, wait_selector, stats, readiness, scroll_settings):
+        return None
 
     #HTML extraction phase
-    html = extract_html(page, url)
+    with timed_phase(stats, "content"):
+        html = extract_html(page, url)
     if html is None:
         return None
 
     return html
 
+def process_single_url_structured(
+        page: Page,
+        url: str,
+        logger: logging.Logger,
+        wait_selector: str,
+        extractor_js: str,
+        keep_html: bool = True,
+        stats: dict | None = None,
+        readiness = None,
+        scroll_settings: dict | None = None) -> tuple:
+    """
+    Like process_single_url, but extracts the adapter's fields in the page
+    instead of serializing the DOM. Returns (data, html): data is None on
+    failure, html is only fetched when keep_html is set.
+    """
+    stats = stats if stats is not None else new_fetch_stats()
+    if not prepare_page(page, url, logger, wait_selector, stats, readiness, scroll_settings):
+        return None, None
+
+    #Structured extraction phase
+    with timed_phase(stats, "content"):
+        data = extract_structured(page, url, extractor_js)
+        html = extract_html(page, url) if keep_html and data is not None else None
+    if data is None:
+        return None, None
+    return data, html
+
 def write_html(output_directory: Path, filename: str, html: str) -> bool:
     """
     Writes HTML to disk.